@@ -16,21 +16,46 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
+import collections
 import logging
 
-from typing import List, Optional
+from typing import Deque, Dict, List, Optional, Tuple
 
-from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL_MESSAGE_SIZE,
-                       ERROR_MESSAGE, ERROR_MESSAGE_SIZE, HEDGE_MESSAGE, HEDGE_MESSAGE_SIZE,
+from .messages import (ALL_SIDES, AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_ALL_MESSAGE, CANCEL_ALL_MESSAGE_SIZE,
+                       CANCEL_ALL_STATUS_MESSAGE, CANCEL_ALL_STATUS_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL_MESSAGE_SIZE,
+                       ERROR_MESSAGE_SIZE, HEDGE_MESSAGE, HEDGE_MESSAGE_SIZE,
                        HEDGE_FILLED_MESSAGE, HEDGE_FILLED_MESSAGE_SIZE, INSERT_MESSAGE, INSERT_MESSAGE_SIZE,
-                       LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE, ORDER_BOOK_HEADER, ORDER_BOOK_HEADER_SIZE,
-                       ORDER_BOOK_MESSAGE_SIZE, BOOK_PART, ORDER_FILLED_MESSAGE, ORDER_FILLED_MESSAGE_SIZE,
-                       ORDER_STATUS_MESSAGE, ORDER_STATUS_MESSAGE_SIZE, TRADE_TICKS_HEADER,
-                       TRADE_TICKS_HEADER_SIZE, TRADE_TICKS_MESSAGE_SIZE, TICKS_PART,
-                       Connection, MessageType, Subscription)
+                       LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE, MAXIMUM_ORDER_BATCH_SIZE, MESSAGE_BUDGET_MESSAGE,
+                       MESSAGE_BUDGET_MESSAGE_SIZE, ORDER_BATCH_ENTRY,
+                       ORDER_BATCH_HEADER, ORDER_BATCH_HEADER_SIZE, ORDER_BOOK_MESSAGE_SIZE, ORDER_FILLED_MESSAGE,
+                       ORDER_FILLED_MESSAGE_SIZE, ORDER_STATUS_MESSAGE, ORDER_STATUS_MESSAGE_SIZE, REPLACE_MESSAGE,
+                       REPLACE_MESSAGE_SIZE, SNAPSHOT_REQUEST_MESSAGE_SIZE, TRADE_TICKS_MESSAGE_SIZE, Connection,
+                       MessageHandler, MessageTable, MessageType, Subscription, has_valid_length,
+                       unpack_book_message, unpack_error_message)
+from .send_scheduler import SendScheduler
 from .types import Lifespan, Side
 
 
+# Messages received from the matching engine on the execution channel
+EXECUTION_MESSAGES = MessageTable((
+    (MessageType.CANCEL_ALL_STATUS, CANCEL_ALL_STATUS_MESSAGE_SIZE, CANCEL_ALL_STATUS_MESSAGE.unpack_from,
+     "on_cancel_all_status_message"),
+    (MessageType.ERROR, ERROR_MESSAGE_SIZE, unpack_error_message, "on_error_message"),
+    (MessageType.HEDGE_FILLED, HEDGE_FILLED_MESSAGE_SIZE, HEDGE_FILLED_MESSAGE.unpack_from, "on_hedge_filled_message"),
+    (MessageType.MESSAGE_BUDGET, MESSAGE_BUDGET_MESSAGE_SIZE, MESSAGE_BUDGET_MESSAGE.unpack_from,
+     "_on_message_budget_message"),
+    (MessageType.ORDER_BOOK_UPDATE, ORDER_BOOK_MESSAGE_SIZE, unpack_book_message, "on_order_book_update_message"),
+    (MessageType.ORDER_FILLED, ORDER_FILLED_MESSAGE_SIZE, ORDER_FILLED_MESSAGE.unpack_from, "on_order_filled_message"),
+    (MessageType.ORDER_STATUS, ORDER_STATUS_MESSAGE_SIZE, ORDER_STATUS_MESSAGE.unpack_from, "on_order_status_message"),
+))
+
+# Messages received from the matching engine on the information channel
+INFORMATION_MESSAGES = MessageTable((
+    (MessageType.ORDER_BOOK_UPDATE, ORDER_BOOK_MESSAGE_SIZE, unpack_book_message, "on_order_book_update_message"),
+    (MessageType.TRADE_TICKS, TRADE_TICKS_MESSAGE_SIZE, unpack_book_message, "on_trade_ticks_message"),
+))
+
+
 class BaseAutoTrader(Connection, Subscription):
     """Base class for an auto-trader."""
 
@@ -44,6 +69,56 @@ class BaseAutoTrader(Connection, Subscription):
         self.team_name: bytes = team_name.encode()
         self.secret: bytes = secret.encode()
 
+        # Count of messages handled by type
+        self.message_counts: Dict[int, int] = collections.Counter()
+
+        self.__batch: Optional[List[bytes]] = None
+        self.__budget_counted: int = 0
+        self.__budget_expiry: float = 0.0
+        self.__budget_limit: Optional[int] = None
+        self.__budget_reset: float = 0.0
+        self.__in_flight: Deque[Tuple[int, int]] = collections.deque()
+        self.__in_flight_cost: int = 0
+        self.__messages_sent: int = 0
+        self.__scheduler: Optional[SendScheduler] = None
+        self.__execution_handlers: Dict[int, MessageHandler] = EXECUTION_MESSAGES.bind(self)
+        self.__information_handlers: Dict[int, MessageHandler] = INFORMATION_MESSAGES.bind(self)
+
+    def budget(self) -> Optional[int]:
+        """Return how many more messages could be sent now without breaching the message frequency limit.
+
+        This is worked out from the message budget messages the matching
+        engine sends, if it is configured to, taking into account messages
+        sent since then, and is None until the first one is received. Each
+        request in an order batch counts as a message.
+
+        The estimate is only approximate. The matching engine reports how
+        many messages it counted and when the oldest of them leaves the
+        window, but not when the others do. So, between the reset time and
+        the end of the window, only the oldest message is taken to have left
+        it, and the estimate may be lower than the true budget until the
+        next report arrives.
+        """
+        if self.__budget_limit is None:
+            return None
+
+        counted: int = self.__budget_counted
+        now: float = self.event_loop.time()
+        if now >= self.__budget_expiry:
+            counted = 0
+        elif now >= self.__budget_reset:
+            # At least the oldest message counted has left the window
+            counted -= 1
+        return self.__budget_limit - counted - self.__in_flight_cost
+
+    def can_send(self, count: int = 1) -> bool:
+        """Return True if the given number of messages could be sent now without breaching the limit.
+
+        If the budget is not known, this always returns True.
+        """
+        budget = self.budget()
+        return budget is None or budget >= count
+
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         """Called twice, when the execution connection and the information channel are established."""
         if transport.get_extra_info("peername") is not None:
@@ -62,14 +137,53 @@ class BaseAutoTrader(Connection, Subscription):
             Connection.close(self)
         self.event_loop.stop()
 
+    def datagrams_lost(self, count: int) -> None:
+        """Called when messages on the information channel were overwritten before they could be read."""
+        Subscription.datagrams_lost(self, count)
+        self.on_information_gap(count)
+
+    def on_cancel_all_status_message(self, side: int, order_count: int, volume: int) -> None:
+        """Called when a request to cancel all of your orders has been processed.
+
+        The side is the side given in the request, or ALL_SIDES. An order
+        status message will already have been received for each of the
+        order_count orders that were cancelled, and volume is the total
+        number of lots that were yet to be traded in those orders.
+        """
+
+    def on_message_budget_message(self, counted: int, limit: int, reset_in: float) -> None:
+        """Called when the matching engine reports how much of the message frequency limit you have used.
+
+        The counted messages are those within the current window, up to
+        and including the last message the matching engine had received
+        from you, limit is the message frequency limit and reset_in is the
+        number of seconds until the oldest counted message leaves the window.
+        Times are in seconds of event loop time, as measured by
+        self.event_loop.time(), rather than match time. See also the budget
+        and can_send methods.
+        """
+
+    def _on_message_budget_message(self, received: int, counted: int, limit: int, reset_in: float,
+                                   interval: float) -> None:
+        """Update the message budget and pass the report on to on_message_budget_message."""
+        now: float = self.event_loop.time()
+        self.__budget_counted = counted
+        self.__budget_expiry = now + interval
+        self.__budget_limit = limit
+        self.__budget_reset = now + reset_in
+
+        in_flight = self.__in_flight
+        while in_flight and in_flight[0][0] <= received:
+            self.__in_flight_cost -= in_flight.popleft()[1]
+
+        self.on_message_budget_message(counted, limit, reset_in)
+
     def on_datagram(self, typ: int, data: bytes, start: int, length: int) -> None:
         """Called when an information message is received from the matching engine."""
-        if typ == MessageType.ORDER_BOOK_UPDATE and length == ORDER_BOOK_MESSAGE_SIZE:
-            inst, seq = ORDER_BOOK_HEADER.unpack_from(data, start)
-            self.on_order_book_update_message(inst, seq, *BOOK_PART.iter_unpack(data[ORDER_BOOK_HEADER_SIZE:]))
-        elif typ == MessageType.TRADE_TICKS and length == TRADE_TICKS_MESSAGE_SIZE:
-            inst, seq = TRADE_TICKS_HEADER.unpack_from(data, start)
-            self.on_trade_ticks_message(inst, seq, *TICKS_PART.iter_unpack(data[TRADE_TICKS_HEADER_SIZE:]))
+        handler = self.__information_handlers.get(typ)
+        if handler is not None and has_valid_length(handler, data, start, length):
+            self.message_counts[typ] += 1
+            handler[2](*handler[1](data, start))
         else:
             self.logger.error("received invalid information message: length=%d type=%d", length, typ)
             self.event_loop.stop()
@@ -82,17 +196,22 @@ class BaseAutoTrader(Connection, Subscription):
         the number of lots filled at that price.
         """
 
+    def on_information_gap(self, dropped: int) -> None:
+        """Called when you have missed messages on the information channel.
+
+        The dropped messages were overwritten before they could be read and
+        will never be received; the next message received is the newest one
+        published. Since trade ticks missed are gone for good, and the next
+        order book update may be some time away, you may want to call
+        send_snapshot_request to receive the latest order book updates now.
+        """
+
     def on_message(self, typ: int, data: bytes, start: int, length: int) -> None:
         """Called when an execution message is received from the matching engine."""
-        if typ == MessageType.ERROR and length == ERROR_MESSAGE_SIZE:
-            client_order_id, error_message = ERROR_MESSAGE.unpack_from(data, start)
-            self.on_error_message(client_order_id, error_message.rstrip(b"\x00"))
-        elif typ == MessageType.HEDGE_FILLED and length == HEDGE_FILLED_MESSAGE_SIZE:
-            self.on_hedge_filled_message(*HEDGE_FILLED_MESSAGE.unpack_from(data, start))
-        elif typ == MessageType.ORDER_FILLED and length == ORDER_FILLED_MESSAGE_SIZE:
-            self.on_order_filled_message(*ORDER_FILLED_MESSAGE.unpack_from(data, start))
-        elif typ == MessageType.ORDER_STATUS and length == ORDER_STATUS_MESSAGE_SIZE:
-            self.on_order_status_message(*ORDER_STATUS_MESSAGE.unpack_from(data, start))
+        handler = self.__execution_handlers.get(typ)
+        if handler is not None and has_valid_length(handler, data, start, length):
+            self.message_counts[typ] += 1
+            handler[2](*handler[1](data, start))
         else:
             self.logger.error("received invalid execution message: length=%d type=%d", length, typ)
             self.event_loop.stop()
@@ -104,12 +223,13 @@ class BaseAutoTrader(Connection, Subscription):
                                      ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
         """Called periodically to report the status of the order book.
 
-        The sequence number can be used to detect missed messages. The five
-        best available ask (i.e. sell) and bid (i.e. buy) prices are reported
-        along with the volume available at each of those price levels. If
-        there are less than five prices on a side, then zeros will appear at
-        the end of both the prices and volumes lists on that side so that
-        there are always five entries in each list.
+        Also called for each order book update sent in reply to
+        send_snapshot_request. The sequence number can be used to detect
+        missed messages. The five best available ask (i.e. sell) and bid
+        (i.e. buy) prices are reported along with the volume available at
+        each of those price levels. If there are less than five prices on a
+        side, then zeros will appear at the end of both the prices and volumes
+        lists on that side so that there are always five entries in each list.
         """
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -150,7 +270,15 @@ class BaseAutoTrader(Connection, Subscription):
         cancelled this request has no effect and no order status message will
         be received.
         """
-        self.send_message(MessageType.AMEND_ORDER, AMEND_MESSAGE.pack(client_order_id, volume), AMEND_MESSAGE_SIZE)
+        self.__request(MessageType.AMEND_ORDER, client_order_id, 0, 0, volume, 0)
+
+    def send_cancel_all_orders(self, side: Optional[Side] = None) -> None:
+        """Cancel all of your orders on the given side, or on both sides if no side is given.
+
+        An order status message will be received for each order that is
+        cancelled, followed by a cancel all status message.
+        """
+        self.__request(MessageType.CANCEL_ALL_ORDERS, 0, ALL_SIDES if side is None else side, 0, 0, 0)
 
     def send_cancel_order(self, client_order_id: int) -> None:
         """Cancel the specified order.
@@ -158,16 +286,130 @@ class BaseAutoTrader(Connection, Subscription):
         If the order has already completely filled or been cancelled this
         request has no effect and no order status message will be received.
         """
-        self.send_message(MessageType.CANCEL_ORDER, CANCEL_MESSAGE.pack(client_order_id), CANCEL_MESSAGE_SIZE)
+        self.__request(MessageType.CANCEL_ORDER, client_order_id, 0, 0, 0, 0)
 
     def send_hedge_order(self, client_order_id: int, side: Side, price: int, volume: int) -> None:
-        """Order lots in the future to hedge a position."""
-        self.send_message(MessageType.HEDGE_ORDER,
-                          HEDGE_MESSAGE.pack(client_order_id, side, price, volume),
-                          HEDGE_MESSAGE_SIZE)
+        """Order lots in the future to hedge a position.
+
+        Hedge orders are never batched. If an order batch has been started,
+        the requests batched so far are sent first.
+        """
+        self.__request(MessageType.HEDGE_ORDER, client_order_id, side, price, volume, 0)
 
     def send_insert_order(self, client_order_id: int, side: Side, price: int, volume: int, lifespan: Lifespan) -> None:
         """Insert a new order into the market."""
-        self.send_message(MessageType.INSERT_ORDER,
-                          INSERT_MESSAGE.pack(client_order_id, side, price, volume, lifespan),
-                          INSERT_MESSAGE_SIZE)
+        self.__request(MessageType.INSERT_ORDER, client_order_id, side, price, volume, lifespan)
+
+    def send_replace_order(self, client_order_id: int, price: int, volume: int) -> None:
+        """Give an existing order a new price and volume.
+
+        The new volume includes any volume that has already been filled, as
+        for send_amend_order. If the price is unchanged and the volume is
+        not increased, the order keeps its priority; otherwise it goes to the
+        back of the queue at its new price and may trade straight away. A
+        single order status message is received for the replaced order.
+        """
+        self.__request(MessageType.REPLACE_ORDER, client_order_id, 0, price, volume, 0)
+
+    def send_snapshot_request(self) -> None:
+        """Ask for the latest order book update for each instrument.
+
+        The order book updates last published on the information channel
+        are sent again, to you alone, on the execution channel and are
+        received by on_order_book_update_message as usual. The request counts
+        towards the message frequency limit and is never batched or queued.
+        """
+        self.send_message(MessageType.SNAPSHOT_REQUEST, b"", SNAPSHOT_REQUEST_MESSAGE_SIZE)
+
+    def send_message(self, typ: int, data: bytes, length: int, cost: int = 1) -> None:
+        """Send a message, which counts as the given number of messages towards the message budget."""
+        self.__messages_sent += 1
+        if self.__budget_limit is not None:
+            self.__in_flight.append((self.__messages_sent, cost))
+            self.__in_flight_cost += cost
+        Connection.send_message(self, typ, data, length)
+
+    def send_order_batch(self) -> None:
+        """Send the requests batched since start_order_batch was called."""
+        if self.__batch:
+            self.__send_batch()
+        self.__batch = None
+
+    def start_order_batch(self) -> None:
+        """Start batching amend, cancel, insert and replace requests.
+
+        Until send_order_batch is called, calls to send_amend_order,
+        send_cancel_all_orders, send_cancel_order, send_insert_order and
+        send_replace_order are collected into a single order batch message,
+        which the matching engine processes all at once. A batch that
+        reaches the maximum size is sent straight away and a new batch
+        started. Batching has no effect while the send scheduler is in use.
+        """
+        if self.__batch is None:
+            self.__batch = list()
+
+    def start_send_scheduler(self, limit: int, interval: float, burst: Optional[int] = None) -> None:
+        """Queue requests and send them at a rate that keeps within the given message frequency limit.
+
+        From now on, requests are sent at the end of the current iteration of
+        the event loop, or later if sending them straight away could breach
+        the limit, with cancels and amends going ahead of replaces and
+        replaces ahead of hedges and inserts, which are sent in client order
+        id order. Up to burst requests, half the limit by default, may be sent
+        at once, so the limit must be at least two. The interval is in seconds
+        of event loop time. If the matching engine reports the message
+        budget, requests are also held back while can_send is False. A
+        request that is superseded before it is sent is collapsed into the
+        request that superseded it. An insert that is cancelled before it is
+        sent, or that could no longer be accepted because a request with a
+        later client order id was sent before it was queued, is dropped and
+        an order status message with no remaining volume is received for it.
+        """
+        self.__scheduler = SendScheduler(self.event_loop, limit, interval, limit // 2 if burst is None else burst,
+                                         self.__send_request, self.can_send, self.__on_request_dropped)
+
+    def __add_to_batch(self, typ: int, client_order_id: int, side: int, price: int, volume: int,
+                       lifespan: int) -> None:
+        """Add a request to the current order batch."""
+        self.__batch.append(ORDER_BATCH_ENTRY.pack(typ, client_order_id, side, price, volume, lifespan))
+        if len(self.__batch) == MAXIMUM_ORDER_BATCH_SIZE:
+            self.__send_batch()
+
+    def __on_request_dropped(self, client_order_id: int) -> None:
+        """Called when the send scheduler drops an insert request rather than send it."""
+        self.on_order_status_message(client_order_id, 0, 0, 0)
+
+    def __request(self, typ: int, client_order_id: int, side: int, price: int, volume: int, lifespan: int) -> None:
+        """Schedule, batch or send a request."""
+        if self.__scheduler is not None:
+            self.__scheduler.add(typ, client_order_id, side, price, volume, lifespan)
+        elif self.__batch is not None and typ != MessageType.HEDGE_ORDER:
+            self.__add_to_batch(typ, client_order_id, side, price, volume, lifespan)
+        else:
+            if self.__batch:
+                self.__send_batch()
+            self.__send_request(typ, client_order_id, side, price, volume, lifespan)
+
+    def __send_batch(self) -> None:
+        """Send the current order batch and start a new one."""
+        count = len(self.__batch)
+        self.send_message(MessageType.ORDER_BATCH, ORDER_BATCH_HEADER.pack(count) + b"".join(self.__batch),
+                          ORDER_BATCH_HEADER_SIZE + count * ORDER_BATCH_ENTRY.size, count)
+        self.__batch = list()
+
+    def __send_request(self, typ: int, client_order_id: int, side: int, price: int, volume: int,
+                       lifespan: int) -> None:
+        """Send a request straight away."""
+        if typ == MessageType.AMEND_ORDER:
+            self.send_message(typ, AMEND_MESSAGE.pack(client_order_id, volume), AMEND_MESSAGE_SIZE)
+        elif typ == MessageType.CANCEL_ALL_ORDERS:
+            self.send_message(typ, CANCEL_ALL_MESSAGE.pack(side), CANCEL_ALL_MESSAGE_SIZE)
+        elif typ == MessageType.CANCEL_ORDER:
+            self.send_message(typ, CANCEL_MESSAGE.pack(client_order_id), CANCEL_MESSAGE_SIZE)
+        elif typ == MessageType.HEDGE_ORDER:
+            self.send_message(typ, HEDGE_MESSAGE.pack(client_order_id, side, price, volume), HEDGE_MESSAGE_SIZE)
+        elif typ == MessageType.INSERT_ORDER:
+            self.send_message(typ, INSERT_MESSAGE.pack(client_order_id, side, price, volume, lifespan),
+                              INSERT_MESSAGE_SIZE)
+        elif typ == MessageType.REPLACE_ORDER:
+            self.send_message(typ, REPLACE_MESSAGE.pack(client_order_id, price, volume), REPLACE_MESSAGE_SIZE)
@@ -18,10 +18,11 @@
 import bisect
 import logging
 
-from typing import Any, Callable, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from .account import AccountFactory, CompetitorAccount
 from .match_events import MatchEvents
+from .messages import ALL_SIDES, MessageType
 from .order_book import IOrderListener, Order, OrderBook, MINIMUM_BID, MAXIMUM_ASK
 from .score_board import ScoreBoardWriter
 from .timer import Timer
@@ -118,6 +119,23 @@ class Competitor(ICompetitor, IOrderListener):
         if order.volume == order.remaining_volume and self.exec_connection is not None:
             self.exec_connection.send_order_status(order.client_order_id, 0, order.remaining_volume, order.total_fees)
 
+    def on_order_replaced(self, now: float, order: Order, old_price: int, old_remaining_volume: int) -> None:
+        """Called when an order is given a new price or volume and loses its priority."""
+        if order.side == Side.BUY:
+            self.buy_prices.pop(bisect.bisect(self.buy_prices, old_price) - 1)
+            bisect.insort(self.buy_prices, order.price)
+        else:
+            self.sell_prices.pop(bisect.bisect(self.sell_prices, -old_price) - 1)
+            bisect.insort(self.sell_prices, -order.price)
+
+        self.active_volume += order.remaining_volume - old_remaining_volume
+        self.match_events.replace(now, self.name, order.client_order_id, order.instrument, order.side,
+                                  order.remaining_volume, order.price, order.lifespan)
+
+        if self.exec_connection is not None:
+            self.exec_connection.send_order_status(order.client_order_id, order.volume - order.remaining_volume,
+                                                   order.remaining_volume, order.total_fees)
+
     def on_order_filled(self, now: float, order: Order, price: int, volume: int, fee: int) -> None:
         """Called when an order is partially or completely filled."""
         self.active_volume -= volume
@@ -167,6 +185,28 @@ class Competitor(ICompetitor, IOrderListener):
             else:
                 self.etf_book.amend(now, order, volume)
 
+    def on_cancel_all_message(self, now: float, side: int) -> None:
+        """Called when a cancel all orders request is received from the competitor.
+
+        Every order on the given side, or on both sides, is cancelled. An order
+        status message is sent for each order followed by a single cancel all
+        status message, all of which reach the auto-trader together.
+        """
+        if side != Side.BUY and side != Side.SELL and side != ALL_SIDES:
+            self.send_error(now, 0, b"%d is not a valid side" % side)
+            return
+
+        order_count: int = 0
+        volume: int = 0
+        for order in tuple(self.orders.values()):
+            if side == ALL_SIDES or order.side == side:
+                order_count += 1
+                volume += order.remaining_volume
+                self.etf_book.cancel(now, order)
+
+        if self.exec_connection is not None:
+            self.exec_connection.send_cancel_all_status(side, order_count, volume)
+
     def on_cancel_message(self, now: float, client_order_id: int) -> None:
         """Called when a cancel order request is received from the competitor."""
         if client_order_id > self.last_client_order_id:
@@ -292,6 +332,63 @@ class Competitor(ICompetitor, IOrderListener):
         self.active_volume += volume
         self.etf_book.insert(now, order)
 
+    def on_order_batch_message(self, now: float, entries: Iterable[Tuple[int, int, int, int, int, int]]) -> None:
+        """Called when an order batch request is received from the competitor.
+
+        Each entry is an amend, cancel, cancel all, insert or replace request,
+        given as a message type, client order id, side, price, volume and
+        lifespan, and the requests are processed in order at the same time.
+        """
+        for typ, client_order_id, side, price, volume, lifespan in entries:
+            if self.status == "BREACH":
+                break
+            if typ == MessageType.INSERT_ORDER:
+                self.on_insert_message(now, client_order_id, side, price, volume, lifespan)
+            elif typ == MessageType.CANCEL_ORDER:
+                self.on_cancel_message(now, client_order_id)
+            elif typ == MessageType.AMEND_ORDER:
+                self.on_amend_message(now, client_order_id, volume)
+            elif typ == MessageType.REPLACE_ORDER:
+                self.on_replace_message(now, client_order_id, price, volume)
+            elif typ == MessageType.CANCEL_ALL_ORDERS:
+                self.on_cancel_all_message(now, side)
+            else:
+                self.send_error(now, client_order_id, b"%d is not a valid order batch request type" % typ)
+
+    def on_replace_message(self, now: float, client_order_id: int, price: int, volume: int) -> None:
+        """Called when a replace order request is received from the competitor.
+
+        The order keeps its client order id. Reducing only its volume works
+        like an amend; any other change costs the order its priority.
+        """
+        if client_order_id > self.last_client_order_id:
+            self.send_error(now, client_order_id, b"out-of-order client_order_id in replace message")
+            return
+
+        if client_order_id not in self.orders:
+            return
+
+        order = self.orders[client_order_id]
+        if not (MINIMUM_BID <= price <= MAXIMUM_ASK):
+            self.send_error(now, client_order_id, b"%d is not a valid price" % price)
+            return
+
+        if price % self.tick_size != 0:
+            self.send_error(now, client_order_id, b"price is not a multiple of tick size")
+            return
+
+        remaining_volume = volume - (order.volume - order.remaining_volume)
+        if self.active_volume + remaining_volume - order.remaining_volume > self.active_volume_limit:
+            self.send_error(now, client_order_id, b"order rejected: active order volume limit breached")
+            return
+
+        if ((order.side == Side.BUY and self.sell_prices and price >= -self.sell_prices[-1])
+                or (order.side == Side.SELL and self.buy_prices and price <= self.buy_prices[-1])):
+            self.send_error(now, client_order_id, b"order rejected: in cross with an existing order")
+            return
+
+        self.etf_book.replace(now, order, price, volume)
+
     def on_timer_tick(self, now: float, future_price: int, etf_price: int) -> None:
         """Called on each timer tick to update the auto-trader."""
         self.account.update(future_price or 0, etf_price or 0)
@@ -328,7 +425,7 @@ class CompetitorManager:
         self.__order_count_limit: int = limits_config["ActiveOrderCountLimit"]
         self.__position_limit: int = limits_config["PositionLimit"]
         self.__score_board_writer: ScoreBoardWriter = score_board_writer
-        self.__start_time: float = 0.0
+        self.__start_time: Optional[float] = None
         self.__traders: Dict[str, str] = traders_config
         self.__unhedged_lots_factory: UnhedgedLotsFactory = unhedged_lots_factory
         self.__tick_size: float = tick_size
@@ -356,7 +453,7 @@ class CompetitorManager:
                                 self.__tick_size, self.__unhedged_lots_factory, self.controller)
         self.__competitors[name] = competitor
 
-        if self.__start_time != 0.0:
+        if self.__start_time is not None:
             self.__logger.warning("competitor logged in after market open: name='%s'", name)
 
         for callback in self.competitor_logged_in:
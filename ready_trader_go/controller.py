@@ -17,6 +17,7 @@
 #     <https://www.gnu.org/licenses/>.
 import asyncio
 import logging
+import math
 
 from typing import Any, Optional
 
@@ -35,17 +36,23 @@ class Controller(IController):
 
     def __init__(self, market_open_delay: float, exec_server: ExecutionServer, info_publisher: InformationPublisher,
                  market_events_reader: MarketEventsReader, match_events_writer: MatchEventsWriter,
-                 score_board_writer: ScoreBoardWriter, market_timer: Timer, tick_timer: Timer):
-        """Initialise a new instance of the Controller class."""
+                 score_board_writer: ScoreBoardWriter, market_timer: Optional[Timer], tick_timer: Timer):
+        """Initialise a new instance of the Controller class.
+
+        If there is no market timer, each market event is processed when it
+        falls due according to the tick timer.
+        """
         self.heads_up_display_server: Optional[HeadsUpDisplayServer] = None
 
+        self.__clock: Timer = market_timer or tick_timer
         self.__done: bool = False
         self.__execution_server: ExecutionServer = exec_server
         self.__information_publisher: InformationPublisher = info_publisher
         self.__logger: logging.Logger = logging.getLogger("CONTROLLER")
         self.__market_events_reader = market_events_reader
+        self.__market_event_handle: Optional[asyncio.TimerHandle] = None
         self.__market_open_delay: float = market_open_delay
-        self.__market_timer: Timer = market_timer
+        self.__market_timer: Optional[Timer] = market_timer
         self.__match_events_writer = match_events_writer
         self.__score_board_writer = score_board_writer
         self.__tick_timer: Timer = tick_timer
@@ -53,14 +60,15 @@ class Controller(IController):
         # Connect signals
         self.__match_events_writer.task_complete.append(self.on_task_complete)
         self.__market_events_reader.task_complete.append(self.on_task_complete)
-        self.__market_timer.timer_ticked.append(self.on_market_timer_ticked)
+        if self.__market_timer:
+            self.__market_timer.timer_ticked.append(self.on_market_timer_ticked)
         self.__score_board_writer.task_complete.append(self.on_task_complete)
         self.__tick_timer.timer_stopped.append(self.on_tick_timer_stopped)
         self.__tick_timer.timer_ticked.append(self.on_tick_timer_ticked)
 
     def advance_time(self):
         """Return the current time after accounting for events."""
-        now: float = self.__market_timer.advance()
+        now: float = self.__clock.advance()
         self.__market_events_reader.process_market_events(now)
         return now
 
@@ -72,6 +80,27 @@ class Controller(IController):
         if self.__score_board_writer:
             self.__score_board_writer.finish()
 
+    def event_loop_duration(self, duration: float) -> float:
+        """Return how many seconds of event loop time the given duration of match time lasts."""
+        return self.__clock.event_loop_duration(duration)
+
+    def information_snapshot(self) -> bytes:
+        """Return the order book update message last published for each instrument."""
+        return self.__information_publisher.snapshot()
+
+    def is_complete(self) -> bool:
+        """Return True once the match is over and its results have been written."""
+        return self.__match_events_writer is None and self.__score_board_writer is None
+
+    def on_market_events_due(self, due: float) -> None:
+        """Called when the market events at the given time are due."""
+        # Rounding may bring the call slightly early, so include the events that are due regardless
+        self.__market_events_reader.process_market_events(max(self.__clock.advance(), math.nextafter(due, math.inf)))
+        next_event_time = self.__market_events_reader.next_event_time()
+        if next_event_time is not None:
+            self.__market_event_handle = self.__clock.call_at(next_event_time, self.on_market_events_due,
+                                                              next_event_time)
+
     def on_market_timer_ticked(self, timer: Timer, now: float, _: int):
         """Called when it is time to process market events."""
         self.__market_events_reader.process_market_events(now)
@@ -86,10 +115,15 @@ class Controller(IController):
             self.__done = True
 
         if self.__match_events_writer is None and self.__score_board_writer is None:
+            self.__execution_server.close()
             asyncio.get_running_loop().stop()
 
     def on_tick_timer_stopped(self, timer: Timer, now: float) -> None:
         """Shut down the match."""
+        if self.__market_event_handle:
+            self.__market_event_handle.cancel()
+        if self.__market_timer:
+            self.__market_timer.cancel()
         self.__match_events_writer.finish()
         self.__score_board_writer.finish()
 
@@ -116,6 +150,11 @@ class Controller(IController):
         await asyncio.sleep(self.__market_open_delay)
         # self.__execution_server.close()
 
+        self.__market_events_reader.fold_market_events()
+
         self.__logger.info("market open")
-        self.__market_timer.start()
+        if self.__market_timer:
+            self.__market_timer.start()
         self.__tick_timer.start()
+        if not self.__market_timer:
+            self.on_market_events_due(0.0)
@@ -15,22 +15,33 @@
 #     You should have received a copy of the GNU Affero General Public
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
+import asyncio
+import logging
+import os
+import random
 import socket
+import sys
+
+from typing import Any, Dict, List, Optional, Sequence, Type
 
 from .account import AccountFactory
 from .application import Application
+from .base_auto_trader import BaseAutoTrader
 from .competitor import CompetitorManager
 from .controller import Controller
 from .execution import ExecutionServer
 from .heads_up import HeadsUpDisplayServer
 from .information import InformationPublisher
-from .limiter import FrequencyLimiterFactory
-from .market_events import MarketEventsReader
+from .limiter import FREQUENCY_LIMITER_BUCKET_COUNT, FrequencyLimiterFactory
+from .loopback import LoopbackExecutionServer, LoopbackPublisherFactory
+from .market_data_cache import MarketDataCache
+from .market_events import MARKET_EVENT_CHUNK_SIZE, MarketEventsReader
 from .match_events import MatchEvents, MatchEventsWriter
-from .order_book import OrderBook
+from .order_book import OrderBookFactory
 from .pubsub import PublisherFactory
-from .score_board import ScoreBoardWriter
-from .timer import Timer
+from .ring import RingExecutionServer
+from .score_board import ScoreBoard, ScoreBoardWriter, ScoreRecord
+from .timer import Timer, VirtualClockEventLoop
 from .types import Instrument
 from .unhedged_lots import UnhedgedLotsFactory
 
@@ -62,18 +73,65 @@ def __exchange_config_validator(config):
     __validate_object(config, "Engine", ("MarketDataFile", "MarketEventInterval", "MarketOpenDelay", "MatchEventsFile",
                                          "ScoreBoardFile", "Speed", "TickInterval"),
                       (str, float, float, str, str, float, float))
-    __validate_object(config, "Execution", ("Host", "Port"), (str, int))
+    execution_type = config["Execution"].get("Type", "tcp") if type(config["Execution"]) is dict else "tcp"
+    if execution_type not in ("tcp", "unix", "ring"):
+        raise Exception("Type in Execution configuration should be either 'tcp', 'unix' or 'ring'")
+    if execution_type == "unix" and not hasattr(socket, "AF_UNIX"):
+        raise Exception("Unix domain sockets are not supported on this platform")
+    if execution_type == "ring" and sys.platform == "win32":
+        raise Exception("Shared memory rings are not supported on this platform")
+    if execution_type == "tcp":
+        __validate_object(config, "Execution", ("Host", "Port"), (str, int))
+        __validate_hostname(config, "Execution", "Host")
+    else:
+        __validate_object(config, "Execution", ("Path",), (str,))
     __validate_object(config, "Fees", ("Maker", "Taker"), (float, float))
     __validate_object(config, "Information", ("Type", "Name"), (str, str))
     __validate_object(config, "Instrument", ("EtfClamp", "TickSize",), (float, float))
     __validate_object(config, "Limits", ("ActiveOrderCountLimit", "ActiveVolumeLimit", "MessageFrequencyInterval",
                                          "MessageFrequencyLimit", "PositionLimit"), (int, int, float, int, int))
-    __validate_hostname(config, "Execution", "Host")
+
+    if "MarketDataStartTime" in config["Engine"] and type(config["Engine"]["MarketDataStartTime"]) is not float:
+        raise Exception("Element of inappropriate type in Engine configuration")
+
+    if "MarketDataChunkSize" in config["Engine"] and (type(config["Engine"]["MarketDataChunkSize"]) is not int
+                                                      or config["Engine"]["MarketDataChunkSize"] < 1):
+        raise Exception("MarketDataChunkSize in Engine configuration should be a positive integer")
+
+    if "MarketEventMode" in config["Engine"] and config["Engine"]["MarketEventMode"] not in ("interval", "event"):
+        raise Exception("MarketEventMode in Engine configuration should be either 'interval' or 'event'")
+
+    if "Seed" in config["Engine"] and type(config["Engine"]["Seed"]) is not int:
+        raise Exception("Element of inappropriate type in Engine configuration")
+
+    if type(config["Information"].get("Wakeup", False)) is not bool:
+        raise Exception("Wakeup in Information configuration should be either true or false")
+    if config["Information"].get("Wakeup", False) and not hasattr(os, "mkfifo"):
+        raise Exception("Waking up autotraders is not supported on this platform")
+
+    if "OrderBook" in config["Engine"] and config["Engine"]["OrderBook"] not in ("list", "ladder"):
+        raise Exception("OrderBook in Engine configuration should be either 'list' or 'ladder'")
+
+    if config["Limits"].get("OrderBatchAccounting", "order") not in ("order", "message"):
+        raise Exception("OrderBatchAccounting in Limits configuration should be either 'order' or 'message'")
+
+    if config["Limits"].get("MessageFrequencyLimiter", "exact") not in ("exact", "bucketed"):
+        raise Exception("MessageFrequencyLimiter in Limits configuration should be either 'exact' or 'bucketed'")
+
+    if type(config["Limits"].get("MessageBudgetReports", False)) is not bool:
+        raise Exception("MessageBudgetReports in Limits configuration should be either true or false")
+
+    if "MessageFrequencyBuckets" in config["Limits"] and (type(config["Limits"]["MessageFrequencyBuckets"]) is not int
+                                                          or config["Limits"]["MessageFrequencyBuckets"] < 1):
+        raise Exception("MessageFrequencyBuckets in Limits configuration should be a positive integer")
 
     if "Hud" in config:
         __validate_object(config, "Hud", ("Host", "Port"), (str, int))
         __validate_hostname(config, "Hud", "Host")
 
+    if "MarketDataCache" in config:
+        __validate_object(config, "MarketDataCache", ("Directory", "MaxAge", "MaxSize"), (str, float, int))
+
     if type(config["Traders"]) is not dict:
         raise Exception("Traders configuration should be a JSON object")
     if any(type(k) is not str for k in config["Traders"]):
@@ -84,51 +142,144 @@ def __exchange_config_validator(config):
     return True
 
 
-def setup(app: Application) -> Controller:
-    """Setup the exchange simulator."""
-    engine = app.config["Engine"]
-    exec_ = app.config["Execution"]
-    info = app.config["Information"]
-    instrument = app.config["Instrument"]
-    limits = app.config["Limits"]
+def __create_controller(config: Dict[str, Any], loop: asyncio.AbstractEventLoop,
+                        score_board_writer: ScoreBoardWriter,
+                        auto_traders: Optional[Sequence[BaseAutoTrader]] = None) -> Controller:
+    """Create the exchange simulator's components and return its controller.
+
+    If auto-traders are given, they are connected to the exchange through
+    loopback transports and the match runs on a virtual clock.
+    """
+    engine = config["Engine"]
+    exec_ = config["Execution"]
+    info = config["Information"]
+    instrument = config["Instrument"]
+    limits = config["Limits"]
+
+    order_book_factory = OrderBookFactory(engine.get("OrderBook", "list"), instrument["TickSize"])
+    future_book = order_book_factory.create(Instrument.FUTURE, 0.0, 0.0)
+    etf_book = order_book_factory.create(Instrument.ETF, config["Fees"]["Maker"], config["Fees"]["Taker"])
 
-    future_book = OrderBook(Instrument.FUTURE, 0.0, 0.0)
-    etf_book = OrderBook(Instrument.ETF, app.config["Fees"]["Maker"], app.config["Fees"]["Taker"])
+    market_data_file = engine["MarketDataFile"]
+    if "MarketDataCache" in config:
+        cache = config["MarketDataCache"]
+        market_data_file = MarketDataCache(cache["Directory"], cache["MaxAge"], cache["MaxSize"]).get(market_data_file)
 
     match_events = MatchEvents()
-    match_events_writer = MatchEventsWriter(match_events, engine["MatchEventsFile"], app.event_loop)
-    market_events_reader = MarketEventsReader(engine["MarketDataFile"], app.event_loop, future_book, etf_book,
-                                              match_events)
-    score_board_writer = ScoreBoardWriter(engine["ScoreBoardFile"], app.event_loop)
+    match_events_writer = MatchEventsWriter(match_events, engine["MatchEventsFile"], loop)
+    market_events_reader = MarketEventsReader(market_data_file, loop, future_book, etf_book,
+                                              match_events, engine.get("MarketDataStartTime", 0.0),
+                                              engine.get("MarketDataChunkSize", MARKET_EVENT_CHUNK_SIZE))
 
-    tick_timer = Timer(engine["TickInterval"], engine["Speed"])
+    # Log the seed for the timers' jitter so that the match can be reproduced
+    seed = engine["Seed"] if "Seed" in engine else random.getrandbits(32)
+    logging.getLogger("EXCHANGE").info("timer jitter seed=%d", seed)
+    rng = random.Random(seed)
+
+    tick_timer = Timer(engine["TickInterval"], engine["Speed"], rng)
     account_factory = AccountFactory(instrument["EtfClamp"], instrument["TickSize"])
     unhedged_lots_factory = UnhedgedLotsFactory()
-    competitor_manager = CompetitorManager(app.config["Limits"], app.config["Traders"], account_factory, etf_book,
+    competitor_manager = CompetitorManager(config["Limits"], config["Traders"], account_factory, etf_book,
                                            future_book, match_events, score_board_writer, instrument["TickSize"],
                                            tick_timer, unhedged_lots_factory)
 
     limiter_factory = FrequencyLimiterFactory(limits["MessageFrequencyInterval"] / engine["Speed"],
-                                              limits["MessageFrequencyLimit"])
-    exec_server = ExecutionServer(exec_["Host"], exec_["Port"], competitor_manager, limiter_factory)
-    info_publisher = InformationPublisher(app.event_loop, PublisherFactory(info["Type"], info["Name"]),
-                                          (future_book, etf_book), tick_timer)
-
-    market_timer = Timer(engine["MarketEventInterval"], engine["Speed"])
-    controller = Controller(engine["MarketOpenDelay"], exec_server, info_publisher, market_events_reader,
-                            match_events_writer, score_board_writer, market_timer, tick_timer)
+                                              limits["MessageFrequencyLimit"],
+                                              limits.get("OrderBatchAccounting", "order") == "order",
+                                              limits.get("MessageFrequencyLimiter", "exact"),
+                                              limits.get("MessageFrequencyBuckets", FREQUENCY_LIMITER_BUCKET_COUNT),
+                                              limits.get("MessageBudgetReports", False))
+    if auto_traders is None:
+        if exec_.get("Type", "tcp") == "unix":
+            exec_server = ExecutionServer("", 0, competitor_manager, limiter_factory, exec_["Path"])
+        elif exec_.get("Type", "tcp") == "ring":
+            exec_server = RingExecutionServer(exec_["Path"], len(config["Traders"]), competitor_manager,
+                                              limiter_factory)
+        else:
+            exec_server = ExecutionServer(exec_["Host"], exec_["Port"], competitor_manager, limiter_factory)
+        publisher_factory = PublisherFactory(info["Type"], info["Name"], info.get("Wakeup", False))
+    else:
+        exec_server = LoopbackExecutionServer(auto_traders, competitor_manager, limiter_factory)
+        publisher_factory = LoopbackPublisherFactory(auto_traders)
+    info_publisher = InformationPublisher(loop, publisher_factory, (future_book, etf_book), tick_timer)
+
+    market_timer: Optional[Timer] = None
+    if engine.get("MarketEventMode", "interval") == "interval":
+        market_timer = Timer(engine["MarketEventInterval"], engine["Speed"], rng)
+    controller = Controller(engine["MarketOpenDelay"] if auto_traders is None else 0.0, exec_server,
+                            info_publisher, market_events_reader, match_events_writer, score_board_writer,
+                            market_timer, tick_timer)
     competitor_manager.controller = controller
     exec_server.controller = controller
 
-    if "Hud" in app.config:
-        hud_server = HeadsUpDisplayServer(app.config["Hud"]["Host"], app.config["Hud"]["Port"], match_events,
+    if "Hud" in config and auto_traders is None:
+        hud_server = HeadsUpDisplayServer(config["Hud"]["Host"], config["Hud"]["Port"], match_events,
                                           competitor_manager, controller)
         controller.heads_up_display_server = hud_server
 
+    return controller
+
+
+def setup(app: Application) -> Controller:
+    """Setup the exchange simulator."""
+    score_board_writer = ScoreBoardWriter(app.config["Engine"]["ScoreBoardFile"], app.event_loop)
+    controller = __create_controller(app.config, app.event_loop, score_board_writer)
     app.event_loop.create_task(controller.start())
     return controller
 
 
+def simulate(config: Dict[str, Any], auto_traders: Sequence[Type[BaseAutoTrader]]) -> List[ScoreRecord]:
+    """Run a match in this process and return the score board.
+
+    The exchange and the auto-traders share one event loop, exchange their
+    messages through loopback transports rather than sockets and shared
+    memory, and run on a virtual clock, so the match is over as soon as
+    they can all keep up. Each auto-trader class is instantiated with the
+    name and secret of the corresponding team in the Traders section of
+    the configuration. The match events file is written as usual. If a
+    callback of the exchange or of an auto-trader raises an exception, the
+    match is abandoned and the exception is raised again here.
+    """
+    __exchange_config_validator(config)
+    if len(auto_traders) > len(config["Traders"]):
+        raise Exception("There are more auto-traders than teams in the Traders configuration")
+
+    loop = VirtualClockEventLoop()
+    score_board = ScoreBoard(loop)
+    controller: Optional[Controller] = None
+    errors: List[BaseException] = list()
+
+    def on_exception(_: asyncio.AbstractEventLoop, context: Dict[str, Any]) -> None:
+        loop.default_exception_handler(context)
+        if "exception" in context:
+            errors.append(context["exception"])
+            loop.stop()
+
+    loop.set_exception_handler(on_exception)
+    try:
+        traders = [auto_trader(loop, name, secret)
+                   for auto_trader, (name, secret) in zip(auto_traders, config["Traders"].items())]
+        controller = __create_controller(config, loop, score_board, traders)
+
+        # Auto-traders stop the event loop when they are disconnected, so
+        # keep it running until the match is complete
+        start = loop.create_task(controller.start())
+        start.add_done_callback(lambda _: loop.stop())
+        while not controller.is_complete():
+            loop.run_forever()
+            if errors:
+                raise errors[0]
+            if start.done() and start.exception() is not None:
+                raise start.exception()
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        if controller is not None:
+            controller.cleanup()
+        loop.close()
+
+    return score_board.records
+
+
 def main():
     app = Application("exchange", __exchange_config_validator)
     controller: Controller = setup(app)
@@ -16,21 +16,42 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
+import collections
 import logging
+import os
 
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 
 from .competitor import Competitor, CompetitorManager
 from .limiter import FrequencyLimiter, FrequencyLimiterFactory
-from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL_MESSAGE_SIZE,
+from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_ALL_MESSAGE, CANCEL_ALL_MESSAGE_SIZE,
+                       CANCEL_ALL_STATUS_MESSAGE, CANCEL_ALL_STATUS_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL_MESSAGE_SIZE,
                        ERROR_MESSAGE, ERROR_MESSAGE_SIZE, HEADER, HEADER_SIZE, HEDGE_FILLED_MESSAGE,
                        HEDGE_FILLED_MESSAGE_SIZE, HEDGE_MESSAGE, HEDGE_MESSAGE_SIZE, INSERT_MESSAGE,
-                       INSERT_MESSAGE_SIZE, LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE, ORDER_FILLED_MESSAGE,
-                       ORDER_FILLED_MESSAGE_SIZE, ORDER_STATUS_MESSAGE, ORDER_STATUS_MESSAGE_SIZE,
-                       Connection, MessageType)
+                       INSERT_MESSAGE_SIZE, LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE, MESSAGE_BUDGET_MESSAGE,
+                       MESSAGE_BUDGET_MESSAGE_SIZE, ORDER_FILLED_MESSAGE, ORDER_FILLED_MESSAGE_SIZE,
+                       ORDER_STATUS_MESSAGE, ORDER_STATUS_MESSAGE_SIZE, REPLACE_MESSAGE, REPLACE_MESSAGE_SIZE,
+                       SNAPSHOT_REQUEST_MESSAGE, SNAPSHOT_REQUEST_MESSAGE_SIZE, Connection, MessageHandler,
+                       MessageTable, MessageType, has_valid_length, unpack_order_batch_message,
+                       valid_order_batch_length)
 from .types import IController, IExecutionConnection
 
 
+# Messages an auto-trader may send once it has logged in, mostly handled by its competitor
+ORDER_MESSAGES = MessageTable((
+    (MessageType.AMEND_ORDER, AMEND_MESSAGE_SIZE, AMEND_MESSAGE.unpack_from, "competitor.on_amend_message"),
+    (MessageType.CANCEL_ORDER, CANCEL_MESSAGE_SIZE, CANCEL_MESSAGE.unpack_from, "competitor.on_cancel_message"),
+    (MessageType.CANCEL_ALL_ORDERS, CANCEL_ALL_MESSAGE_SIZE, CANCEL_ALL_MESSAGE.unpack_from,
+     "competitor.on_cancel_all_message"),
+    (MessageType.HEDGE_ORDER, HEDGE_MESSAGE_SIZE, HEDGE_MESSAGE.unpack_from, "competitor.on_hedge_message"),
+    (MessageType.INSERT_ORDER, INSERT_MESSAGE_SIZE, INSERT_MESSAGE.unpack_from, "competitor.on_insert_message"),
+    (MessageType.ORDER_BATCH, valid_order_batch_length, unpack_order_batch_message, "on_order_batch_message"),
+    (MessageType.REPLACE_ORDER, REPLACE_MESSAGE_SIZE, REPLACE_MESSAGE.unpack_from, "competitor.on_replace_message"),
+    (MessageType.SNAPSHOT_REQUEST, SNAPSHOT_REQUEST_MESSAGE_SIZE, SNAPSHOT_REQUEST_MESSAGE.unpack_from,
+     "on_snapshot_request_message"),
+))
+
+
 class ExecutionConnection(Connection, IExecutionConnection):
     def __init__(self, competitor_manager: CompetitorManager, frequency_limiter: FrequencyLimiter,
                  controller: IController):
@@ -43,15 +64,25 @@ class ExecutionConnection(Connection, IExecutionConnection):
         self.closing: bool = False
         self.frequency_limiter: FrequencyLimiter = frequency_limiter
         self.logger: logging.Logger = logging.getLogger("EXECUTION")
+        self.message_counts: Dict[int, int] = collections.Counter()
+        self.messages_received: int = 0
         self.login_timeout: asyncio.Handle = asyncio.get_running_loop().call_later(1.0, self.close)
 
+        self.__budget_report_pending: bool = False
+        self.__handlers: Dict[int, MessageHandler] = dict()
+
+        self.__cancel_all_status_message = bytearray(CANCEL_ALL_STATUS_MESSAGE_SIZE)
         self.__error_message = bytearray(ERROR_MESSAGE_SIZE)
         self.__hedge_filled_message = bytearray(HEDGE_FILLED_MESSAGE_SIZE)
+        self.__message_budget_message = bytearray(MESSAGE_BUDGET_MESSAGE_SIZE)
         self.__order_status_message = bytearray(ORDER_STATUS_MESSAGE_SIZE)
         self.__order_filled_message = bytearray(ORDER_FILLED_MESSAGE_SIZE)
 
+        HEADER.pack_into(self.__cancel_all_status_message, 0, CANCEL_ALL_STATUS_MESSAGE_SIZE,
+                         MessageType.CANCEL_ALL_STATUS)
         HEADER.pack_into(self.__error_message, 0, ERROR_MESSAGE_SIZE, MessageType.ERROR)
         HEADER.pack_into(self.__hedge_filled_message, 0, HEDGE_FILLED_MESSAGE_SIZE, MessageType.HEDGE_FILLED)
+        HEADER.pack_into(self.__message_budget_message, 0, MESSAGE_BUDGET_MESSAGE_SIZE, MessageType.MESSAGE_BUDGET)
         HEADER.pack_into(self.__order_status_message, 0, ORDER_STATUS_MESSAGE_SIZE, MessageType.ORDER_STATUS)
         HEADER.pack_into(self.__order_filled_message, 0, ORDER_FILLED_MESSAGE_SIZE, MessageType.ORDER_FILLED)
 
@@ -75,6 +106,8 @@ class ExecutionConnection(Connection, IExecutionConnection):
         if self.competitor is not None:
             self.competitor.on_connection_lost(self.controller.advance_time())
         self.competitor_manager.on_competitor_disconnect()
+        self.logger.info("fd=%d messages handled: %s", self._file_number,
+                         " ".join("%s=%d" % (MessageType(t).name, n) for t, n in sorted(self.message_counts.items())))
         if not self.closing:
             self.logger.warning("fd=%d lost connection to auto-trader:", self._file_number, exc_info=exc)
 
@@ -86,18 +119,20 @@ class ExecutionConnection(Connection, IExecutionConnection):
     def on_message(self, typ: int, data: bytes, start: int, length: int) -> None:
         """Called when a message is received from the auto-trader."""
         now: float = self.controller.advance_time()
+        self.messages_received += 1
 
         if self.frequency_limiter.check_event(now):
-            self.logger.info("fd=%d message frequency limit breached: now=%.6f value=%d limit=%d",
-                             self._file_number, now, self.frequency_limiter.value, self.frequency_limiter.limit)
-            if self.competitor is not None:
-                self.competitor.hard_breach(now, 0, b"message frequency limit breached")
-            else:
-                self.close()
+            self.on_frequency_limit_breached(now)
             return
 
+        if self.frequency_limiter.report_budget and not self.__budget_report_pending:
+            # Scheduled before any reply is written, so that the report goes out with the replies
+            self.__budget_report_pending = True
+            asyncio.get_running_loop().call_soon(self.send_message_budget)
+
         if self.competitor is None:
             if typ == MessageType.LOGIN and length == LOGIN_MESSAGE_SIZE:
+                self.message_counts[typ] += 1
                 raw_name, raw_secret = LOGIN_MESSAGE.unpack_from(data, start)
                 self.on_login(raw_name.rstrip(b"\x00").decode(), raw_secret.rstrip(b"\x00").decode())
             else:
@@ -105,14 +140,10 @@ class ExecutionConnection(Connection, IExecutionConnection):
                 self.close()
             return
 
-        if typ == MessageType.AMEND_ORDER and length == AMEND_MESSAGE_SIZE:
-            self.competitor.on_amend_message(now, *AMEND_MESSAGE.unpack_from(data, start))
-        elif typ == MessageType.CANCEL_ORDER and length == CANCEL_MESSAGE_SIZE:
-            self.competitor.on_cancel_message(now, *CANCEL_MESSAGE.unpack_from(data, start))
-        elif typ == MessageType.HEDGE_ORDER and length == HEDGE_MESSAGE_SIZE:
-            self.competitor.on_hedge_message(now, *HEDGE_MESSAGE.unpack_from(data, start))
-        elif typ == MessageType.INSERT_ORDER and length == INSERT_MESSAGE_SIZE:
-            self.competitor.on_insert_message(now, *INSERT_MESSAGE.unpack_from(data, start))
+        handler = self.__handlers.get(typ)
+        if handler is not None and has_valid_length(handler, data, start, length):
+            self.message_counts[typ] += 1
+            handler[2](now, *handler[1](data, start))
         else:
             if typ == MessageType.LOGIN:
                 self.logger.info("fd=%d received second login message: time=%.6f name='%s'", self._file_number,
@@ -122,6 +153,15 @@ class ExecutionConnection(Connection, IExecutionConnection):
                                  self._file_number, self.competitor.name, now, length, typ)
             self.close()
 
+    def on_frequency_limit_breached(self, now: float) -> None:
+        """Called when the auto-trader breaches the message frequency limit."""
+        self.logger.info("fd=%d message frequency limit breached: now=%.6f value=%d limit=%d",
+                         self._file_number, now, self.frequency_limiter.value, self.frequency_limiter.limit)
+        if self.competitor is not None:
+            self.competitor.hard_breach(now, 0, b"message frequency limit breached")
+        else:
+            self.close()
+
     def on_login(self, name: str, secret: str) -> None:
         """Called when a login message is received."""
         self.login_timeout.cancel()
@@ -132,38 +172,88 @@ class ExecutionConnection(Connection, IExecutionConnection):
             self.close()
             return
 
+        self.__handlers = ORDER_MESSAGES.bind(self)
         self.logger.info("fd=%d '%s' is ready!", self._file_number, name)
 
+    def on_order_batch_message(self, now: float, count: int,
+                               entries: Iterable[Tuple[int, int, int, int, int, int]]) -> None:
+        """Called when an order batch message is received from the auto-trader."""
+        # The message itself has been counted, so only the requests after the first remain
+        if (self.frequency_limiter.count_batched_orders and count > 1
+                and self.frequency_limiter.check_event(now, count - 1)):
+            self.on_frequency_limit_breached(now)
+            return
+        self.competitor.on_order_batch_message(now, entries)
+
+    def on_snapshot_request_message(self, now: float) -> None:
+        """Called when a snapshot request message is received from the auto-trader."""
+        # Only this auto-trader receives the snapshot, on its execution channel
+        snapshot = self.controller.information_snapshot()
+        if snapshot:
+            self.write(snapshot)
+
+    def send_cancel_all_status(self, side: int, order_count: int, volume: int) -> None:
+        """Send a cancel all orders status message to the auto-trader."""
+        CANCEL_ALL_STATUS_MESSAGE.pack_into(self.__cancel_all_status_message, HEADER_SIZE, side, order_count, volume)
+        self.write(self.__cancel_all_status_message)
+
     def send_error(self, client_order_id: int, error_message: bytes) -> None:
         """Send an error message to the auto-trader."""
         ERROR_MESSAGE.pack_into(self.__error_message, HEADER_SIZE, client_order_id, error_message)
-        self._connection_transport.write(self.__error_message)
+        self.write(self.__error_message)
 
     def send_hedge_filled(self, client_order_id: int, average_price: int, volume: int) -> None:
         """Send a hedge filled message to the auto-trader."""
         HEDGE_FILLED_MESSAGE.pack_into(self.__hedge_filled_message, HEADER_SIZE, client_order_id, average_price,
                                        volume)
-        self._connection_transport.write(self.__hedge_filled_message)
+        self.write(self.__hedge_filled_message)
+
+    def send_message_budget(self) -> None:
+        """Send a message budget message to the auto-trader.
+
+        This reports the number of messages received so far, the number
+        counted towards the message frequency limit, the limit itself, how
+        long it will be until the oldest message counted leaves the window
+        and the length of the window. The limiter works in match time, but
+        both durations are sent in seconds of event loop time, which is what
+        the auto-trader measures time in.
+        """
+        self.__budget_report_pending = False
+        if self._closing:
+            return
+        controller = self.controller
+        limiter = self.frequency_limiter
+        reset_time: float = limiter.reset_time()
+        reset_in: float = max(0.0, reset_time - controller.advance_time()) if reset_time else 0.0
+        MESSAGE_BUDGET_MESSAGE.pack_into(self.__message_budget_message, HEADER_SIZE, self.messages_received,
+                                         limiter.value, limiter.limit, controller.event_loop_duration(reset_in),
+                                         controller.event_loop_duration(limiter.interval))
+        self.write(self.__message_budget_message)
 
     def send_order_filled(self, client_order_id: int, price: int, volume: int) -> None:
         """Send an order filled message to the auto-trader."""
         ORDER_FILLED_MESSAGE.pack_into(self.__order_filled_message, HEADER_SIZE, client_order_id, price, volume)
-        self._connection_transport.write(self.__order_filled_message)
+        self.write(self.__order_filled_message)
 
     def send_order_status(self, client_order_id: int, fill_volume: int, remaining_volume: int, fees: int) -> None:
         """Send an order status message to the auto-trader."""
         ORDER_STATUS_MESSAGE.pack_into(self.__order_status_message, HEADER_SIZE, client_order_id, fill_volume,
                                        remaining_volume, fees)
-        self._connection_transport.write(self.__order_status_message)
+        self.write(self.__order_status_message)
 
 
 class ExecutionServer:
     """A server for execution connections."""
     def __init__(self, host: str, port: int, competitor_manager: CompetitorManager,
-                 limiter_factory: FrequencyLimiterFactory):
-        """Initialise a new instance of the ExecutionServer class."""
+                 limiter_factory: FrequencyLimiterFactory, path: Optional[str] = None):
+        """Initialise a new instance of the ExecutionServer class.
+
+        If a path is given, the server listens on a Unix domain socket at
+        that path rather than on the given host and port.
+        """
         self.controller: Optional[IController] = None
         self.host: str = host
+        self.path: Optional[str] = path
         self.port: int = port
 
         self.__competitor_manager: CompetitorManager = competitor_manager
@@ -174,6 +264,11 @@ class ExecutionServer:
     def close(self):
         """Close the server without affecting existing connections."""
         self.__server.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
 
     def __on_new_connection(self) -> ExecutionConnection:
         """Callback for when a new connection is accepted."""
@@ -181,5 +276,10 @@ class ExecutionServer:
 
     async def start(self) -> None:
         """Start the server."""
-        self.__logger.info("starting execution server: host=%s port=%d", self.host, self.port)
-        self.__server = await asyncio.get_running_loop().create_server(self.__on_new_connection, self.host, self.port)
+        loop = asyncio.get_running_loop()
+        if self.path:
+            self.__logger.info("starting execution server: path=%s", self.path)
+            self.__server = await loop.create_unix_server(self.__on_new_connection, self.path)
+        else:
+            self.__logger.info("starting execution server: host=%s port=%d", self.host, self.port)
+            self.__server = await loop.create_server(self.__on_new_connection, self.host, self.port)
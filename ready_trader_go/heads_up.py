@@ -16,22 +16,35 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
+import collections
 import logging
 
 from typing import Dict, Optional
 
 from .competitor import CompetitorManager
 from .match_events import MatchEvent, MatchEventOperation, MatchEvents
-from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL_MESSAGE_SIZE,
+from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_ALL_MESSAGE, CANCEL_ALL_MESSAGE_SIZE,
+                       CANCEL_MESSAGE, CANCEL_MESSAGE_SIZE,
                        ERROR_MESSAGE, ERROR_MESSAGE_SIZE, HEADER, HEADER_SIZE, INSERT_MESSAGE,
-                       INSERT_MESSAGE_SIZE, LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE,
+                       INSERT_MESSAGE_SIZE, LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE, REPLACE_MESSAGE, REPLACE_MESSAGE_SIZE,
                        AMEND_EVENT_MESSAGE, AMEND_EVENT_MESSAGE_SIZE, CANCEL_EVENT_MESSAGE, CANCEL_EVENT_MESSAGE_SIZE,
                        INSERT_EVENT_MESSAGE, INSERT_EVENT_MESSAGE_SIZE, HEDGE_EVENT_MESSAGE, HEDGE_EVENT_MESSAGE_SIZE,
                        LOGIN_EVENT_MESSAGE, LOGIN_EVENT_MESSAGE_SIZE,
-                       TRADE_EVENT_MESSAGE, TRADE_EVENT_MESSAGE_SIZE, Connection, MessageType)
+                       TRADE_EVENT_MESSAGE, TRADE_EVENT_MESSAGE_SIZE, Connection, MessageHandler,
+                       MessageTable, MessageType, has_valid_length)
 from .types import ICompetitor, IController, IExecutionConnection
 
 
+# Messages the heads-up display may send once it has logged in, handled by its competitor
+ORDER_MESSAGES = MessageTable((
+    (MessageType.AMEND_ORDER, AMEND_MESSAGE_SIZE, AMEND_MESSAGE.unpack_from, "on_amend_message"),
+    (MessageType.CANCEL_ORDER, CANCEL_MESSAGE_SIZE, CANCEL_MESSAGE.unpack_from, "on_cancel_message"),
+    (MessageType.CANCEL_ALL_ORDERS, CANCEL_ALL_MESSAGE_SIZE, CANCEL_ALL_MESSAGE.unpack_from, "on_cancel_all_message"),
+    (MessageType.INSERT_ORDER, INSERT_MESSAGE_SIZE, INSERT_MESSAGE.unpack_from, "on_insert_message"),
+    (MessageType.REPLACE_ORDER, REPLACE_MESSAGE_SIZE, REPLACE_MESSAGE.unpack_from, "on_replace_message"),
+))
+
+
 class HudConnection(Connection, IExecutionConnection):
     def __init__(self, match_events: MatchEvents, competitor_manager: CompetitorManager, controller: IController):
         """Initialise a new instance of the HudConnection class."""
@@ -39,11 +52,15 @@ class HudConnection(Connection, IExecutionConnection):
 
         self.__competitor: Optional[ICompetitor] = None
         self.__competitor_ids: Dict[str, int] = {"": 0}
+        self.__handlers: Dict[int, MessageHandler] = dict()
         self.__competitor_manager: CompetitorManager = competitor_manager
         self.__controller: IController = controller
         self.__logger = logging.getLogger("HEADS_UP")
         self.__match_events: MatchEvents = match_events
 
+        # Count of messages handled by type
+        self.message_counts: Dict[int, int] = collections.Counter()
+
         # Message buffers
         self.__error_message = bytearray(ERROR_MESSAGE_SIZE)
         self.__amend_event_message = bytearray(AMEND_EVENT_MESSAGE_SIZE)
@@ -83,6 +100,7 @@ class HudConnection(Connection, IExecutionConnection):
 
         if self.__competitor is None:
             if typ == MessageType.LOGIN and length == LOGIN_MESSAGE_SIZE:
+                self.message_counts[typ] += 1
                 raw_name, raw_secret = LOGIN_MESSAGE.unpack_from(data, start)
                 self.on_login(raw_name.rstrip(b"\x00").decode(), raw_secret.rstrip(b"\x00").decode())
             else:
@@ -90,53 +108,63 @@ class HudConnection(Connection, IExecutionConnection):
                 self._connection_transport.close()
             return
 
-        if typ == MessageType.AMEND_ORDER and length == AMEND_MESSAGE_SIZE:
-            self.__competitor.on_amend_message(now, *AMEND_MESSAGE.unpack_from(data, start))
-        elif typ == MessageType.CANCEL_ORDER and length == CANCEL_MESSAGE_SIZE:
-            self.__competitor.on_cancel_message(now, *CANCEL_MESSAGE.unpack_from(data, start))
-        elif typ == MessageType.INSERT_ORDER and length == INSERT_MESSAGE_SIZE:
-            self.__competitor.on_insert_message(now, *INSERT_MESSAGE.unpack_from(data, start))
+        handler = self.__handlers.get(typ)
+        if handler is not None and has_valid_length(handler, data, start, length):
+            self.message_counts[typ] += 1
+            handler[2](now, *handler[1](data, start))
         else:
             self.__logger.warning("fd=%d '%s' received invalid message: time=%.6f length=%d type=%d",
-                                  self._file_number, length, typ)
+                                  self._file_number, self.__competitor.name, now, length, typ)
             self.close()
 
     def on_competitor_logged_in(self, name: str) -> None:
         """Called when a competitor logs in."""
         identifier = self.__competitor_ids[name] = len(self.__competitor_ids) + 1
         LOGIN_EVENT_MESSAGE.pack_into(self.__login_event_message, HEADER_SIZE, name.encode(), identifier)
-        self._connection_transport.write(self.__login_event_message)
+        self.write(self.__login_event_message)
 
     def on_login(self, name: str, secret: str) -> None:
         """Called when the heads-up display logs in."""
         self.__competitor = self.__competitor_manager.login_competitor(name, secret, self)
+        if self.__competitor is not None:
+            self.__handlers = ORDER_MESSAGES.bind(self.__competitor)
 
     def on_match_event(self, event: MatchEvent) -> None:
         """Called when a match event occurs."""
         if event.operation == MatchEventOperation.AMEND:
             AMEND_EVENT_MESSAGE.pack_into(self.__amend_event_message, HEADER_SIZE, event.time,
                                           self.__competitor_ids[event.competitor], event.order_id, event.volume)
-            self._connection_transport.write(self.__amend_event_message)
+            self.write(self.__amend_event_message)
         elif event.operation == MatchEventOperation.CANCEL:
             CANCEL_EVENT_MESSAGE.pack_into(self.__cancel_event_message, HEADER_SIZE, event.time,
                                            self.__competitor_ids[event.competitor], event.order_id)
-            self._connection_transport.write(self.__cancel_event_message)
+            self.write(self.__cancel_event_message)
         elif event.operation == MatchEventOperation.INSERT:
             INSERT_EVENT_MESSAGE.pack_into(self.__insert_event_message, HEADER_SIZE, event.time,
                                            self.__competitor_ids[event.competitor], event.order_id,
                                            event.instrument.value, event.side.value, event.volume, event.price,
                                            event.lifespan.value)
-            self._connection_transport.write(self.__insert_event_message)
+            self.write(self.__insert_event_message)
+        elif event.operation == MatchEventOperation.REPLACE:
+            # The heads-up display sees a replaced order as cancelled and inserted again
+            CANCEL_EVENT_MESSAGE.pack_into(self.__cancel_event_message, HEADER_SIZE, event.time,
+                                           self.__competitor_ids[event.competitor], event.order_id)
+            self.write(self.__cancel_event_message)
+            INSERT_EVENT_MESSAGE.pack_into(self.__insert_event_message, HEADER_SIZE, event.time,
+                                           self.__competitor_ids[event.competitor], event.order_id,
+                                           event.instrument.value, event.side.value, event.volume, event.price,
+                                           event.lifespan.value)
+            self.write(self.__insert_event_message)
         elif event.operation == MatchEventOperation.HEDGE:
             HEDGE_EVENT_MESSAGE.pack_into(self.__hedge_event_message, HEADER_SIZE, event.time,
                                           self.__competitor_ids[event.competitor], event.side, event.instrument,
                                           event.volume, event.price)
-            self._connection_transport.write(self.__hedge_event_message)
+            self.write(self.__hedge_event_message)
         elif event.operation == MatchEventOperation.TRADE:
             TRADE_EVENT_MESSAGE.pack_into(self.__trade_event_message, HEADER_SIZE, event.time,
                                           self.__competitor_ids[event.competitor], event.order_id,
                                           event.side, event.instrument, event.volume, event.price, event.fee)
-            self._connection_transport.write(self.__trade_event_message)
+            self.write(self.__trade_event_message)
 
     # IExecutionConnection overrides
 
@@ -144,10 +172,14 @@ class HudConnection(Connection, IExecutionConnection):
         """Close the connection."""
         # Do nothing since the HUD should not be disconnected.
 
+    def send_cancel_all_status(self, side: int, order_count: int, volume: int) -> None:
+        """Send a cancel all orders status message to the heads-up display."""
+        # Do nothing since the HUD will get cancel events.
+
     def send_error(self, client_order_id: int, error_message: bytes) -> None:
         """Send an error message to the heads-up display."""
         ERROR_MESSAGE.pack_into(self.__error_message, HEADER_SIZE, client_order_id, error_message)
-        self._connection_transport.write(self.__error_message)
+        self.write(self.__error_message)
 
     def send_order_filled(self, client_order_id: int, price: int, volume: int) -> None:
         """Send an order filled message to the heads-up display."""
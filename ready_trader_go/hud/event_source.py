@@ -25,10 +25,11 @@ from PySide6 import QtCore,  QtNetwork
 
 from ready_trader_go.account import AccountFactory, CompetitorAccount
 from ready_trader_go.messages import (AMEND_EVENT_MESSAGE, AMEND_EVENT_MESSAGE_SIZE, CANCEL_EVENT_MESSAGE,
-                                      CANCEL_EVENT_MESSAGE_SIZE, ERROR_MESSAGE, ERROR_MESSAGE_SIZE, HEADER_SIZE,
+                                      CANCEL_EVENT_MESSAGE_SIZE, ERROR_MESSAGE_SIZE, HEADER_SIZE,
                                       HEDGE_EVENT_MESSAGE, HEDGE_EVENT_MESSAGE_SIZE, INSERT_EVENT_MESSAGE,
-                                      INSERT_EVENT_MESSAGE_SIZE, LOGIN_EVENT_MESSAGE, LOGIN_EVENT_MESSAGE_SIZE,
-                                      TRADE_EVENT_MESSAGE, TRADE_EVENT_MESSAGE_SIZE, MessageType)
+                                      INSERT_EVENT_MESSAGE_SIZE, LOGIN_EVENT_MESSAGE_SIZE, TRADE_EVENT_MESSAGE,
+                                      TRADE_EVENT_MESSAGE_SIZE, MessageHandler, MessageTable, MessageType,
+                                      has_valid_length, unpack_error_message, unpack_login_event_message)
 from ready_trader_go.order_book import TOP_LEVEL_COUNT, Order, OrderBook
 from ready_trader_go.types import Instrument, Lifespan, Side
 
@@ -39,6 +40,17 @@ __all__ = ("EventSource", "LiveEventSource", "RecordedEventSource")
 TICK_INTERVAL_MILLISECONDS = 500
 TICK_INTERVAL_SECONDS = TICK_INTERVAL_MILLISECONDS / 1000.0
 
+# Messages received from the exchange simulator
+EVENT_MESSAGES = MessageTable((
+    (MessageType.AMEND_EVENT, AMEND_EVENT_MESSAGE_SIZE, AMEND_EVENT_MESSAGE.unpack_from, "on_amend_event_message"),
+    (MessageType.CANCEL_EVENT, CANCEL_EVENT_MESSAGE_SIZE, CANCEL_EVENT_MESSAGE.unpack_from, "on_cancel_event_message"),
+    (MessageType.INSERT_EVENT, INSERT_EVENT_MESSAGE_SIZE, INSERT_EVENT_MESSAGE.unpack_from, "on_insert_event_message"),
+    (MessageType.LOGIN_EVENT, LOGIN_EVENT_MESSAGE_SIZE, unpack_login_event_message, "on_login_event_message"),
+    (MessageType.HEDGE_EVENT, HEDGE_EVENT_MESSAGE_SIZE, HEDGE_EVENT_MESSAGE.unpack_from, "on_hedge_event_message"),
+    (MessageType.TRADE_EVENT, TRADE_EVENT_MESSAGE_SIZE, TRADE_EVENT_MESSAGE.unpack_from, "on_trade_event_message"),
+    (MessageType.ERROR, ERROR_MESSAGE_SIZE, unpack_error_message, "on_error_message"),
+))
+
 
 class EventSource(QtCore.QObject):
     """A source of events for the Ready Trader Go HUD to display."""
@@ -98,6 +110,7 @@ class LiveEventSource(EventSource):
         self.port: int = port
 
         self.__accounts: Dict[int, CompetitorAccount] = dict()
+        self.__book_versions: List[int] = [-1 for _ in Instrument]
         self.__now: float = 0.0
         self.__order_books: List[OrderBook] = list(OrderBook(i, 0.0, 0.0) for i in Instrument)
         self.__orders: Dict[int, Dict[int, Order]] = {0: dict()}
@@ -109,6 +122,10 @@ class LiveEventSource(EventSource):
         self.__bid_prices: List[int] = [0] * TOP_LEVEL_COUNT
         self.__bid_volumes: List[int] = [0] * TOP_LEVEL_COUNT
 
+        # Count of messages handled by type
+        self.message_counts: Dict[int, int] = collections.Counter()
+        self.__handlers: Dict[int, MessageHandler] = EVENT_MESSAGES.bind(self)
+
         self.__socket = QtNetwork.QTcpSocket(self)
         self.__socket.connected.connect(self.on_connected)
         self.__socket.disconnected.connect(self.on_disconnected)
@@ -146,22 +163,10 @@ class LiveEventSource(EventSource):
 
     def on_message(self, typ: int, data: bytes, length: int):
         """Process a message."""
-        if typ == MessageType.AMEND_EVENT and length == AMEND_EVENT_MESSAGE_SIZE:
-            self.on_amend_event_message(*AMEND_EVENT_MESSAGE.unpack_from(data))
-        elif typ == MessageType.CANCEL_EVENT and length == CANCEL_EVENT_MESSAGE_SIZE:
-            self.on_cancel_event_message(*CANCEL_EVENT_MESSAGE.unpack_from(data))
-        elif typ == MessageType.INSERT_EVENT and length == INSERT_EVENT_MESSAGE_SIZE:
-            self.on_insert_event_message(*INSERT_EVENT_MESSAGE.unpack_from(data))
-        elif typ == MessageType.LOGIN_EVENT and length == LOGIN_EVENT_MESSAGE_SIZE:
-            name, competitor_id = LOGIN_EVENT_MESSAGE.unpack_from(data)
-            self.on_login_event_message(name.rstrip(b"\0").decode(), competitor_id)
-        elif typ == MessageType.HEDGE_EVENT and length == HEDGE_EVENT_MESSAGE_SIZE:
-            self.on_hedge_event_message(*HEDGE_EVENT_MESSAGE.unpack_from(data))
-        elif typ == MessageType.TRADE_EVENT and length == TRADE_EVENT_MESSAGE_SIZE:
-            self.on_trade_event_message(*TRADE_EVENT_MESSAGE.unpack_from(data))
-        elif typ == MessageType.ERROR and length == ERROR_MESSAGE_SIZE:
-            client_order_id, error_message = ERROR_MESSAGE.unpack_from(data)
-            self.on_error_message(client_order_id, error_message.rstrip(b"\x00"))
+        handler = self.__handlers.get(typ)
+        if handler is not None and has_valid_length(handler, data, 0, length):
+            self.message_counts[typ] += 1
+            handler[2](*handler[1](data, 0))
         else:
             self.event_source_error_occurred.emit("received invalid message: length=%d type=%d" % (length, typ))
 
@@ -221,10 +226,13 @@ class LiveEventSource(EventSource):
             midpoint_price: float = self.__order_books[i].midpoint_price()
             if midpoint_price is not None:
                 self.midpoint_price_changed.emit(i, self.__now, midpoint_price)
-                self.__order_books[i].top_levels(self.__ask_prices, self.__ask_volumes, self.__bid_prices,
-                                                 self.__bid_volumes)
-                self.order_book_changed.emit(i, self.__now, self.__ask_prices, self.__ask_volumes,
-                                             self.__bid_prices, self.__bid_volumes)
+                version: int = self.__order_books[i].top_levels_version()
+                if version != self.__book_versions[i]:
+                    self.__book_versions[i] = version
+                    self.__order_books[i].top_levels(self.__ask_prices, self.__ask_volumes, self.__bid_prices,
+                                                     self.__bid_volumes)
+                    self.order_book_changed.emit(i, self.__now, self.__ask_prices, self.__ask_volumes,
+                                                 self.__bid_prices, self.__bid_volumes)
 
         future_price: int = self.__order_books[Instrument.FUTURE].last_traded_price()
         etf_price: int = self.__order_books[Instrument.ETF].last_traded_price()
@@ -374,6 +382,18 @@ class RecordedEventSource(EventSource):
                 if order:
                     books[order.instrument].cancel(tm, order)
                 events.append(Event(tm, source.order_cancelled.emit, (team, tm, order_id)))
+            elif operation == "Replace":
+                order = orders[team].pop(order_id, None)
+                if order:
+                    books[order.instrument].cancel(tm, order)
+                events.append(Event(tm, source.order_cancelled.emit, (team, tm, order_id)))
+                order = Order(order_id, Instrument(int(row[4])), Lifespan[row[8]], Side[row[5]],
+                              int(row[7]), int(row[6]))
+                books[order.instrument].insert(tm, order)
+                orders[team][order_id] = order
+                events.append(Event(tm, source.order_inserted.emit, (team, tm, order_id, order.instrument,
+                                                                     order.side, order.volume, order.price,
+                                                                     order.lifespan)))
             else:  # operation is "Hedge" or "Trade"
                 instrument = Instrument(int(row[4]))
                 side = Side[row[5]]
@@ -40,6 +40,7 @@ class InformationPublisher(asyncio.DatagramProtocol):
         self.__logger: logging.Logger = logging.getLogger("INFORMATION")
         self.__order_books: Tuple[OrderBook] = tuple(order_books)
         self.__publisher_factory: PublisherFactory = publisher_factory
+        self.__book_versions: List[int] = [-1 for _ in Instrument]
         self.__send_ticks_handles: List[Optional[asyncio.Handle]] = [None for _ in Instrument]
         self.__trade_ticks_sequences: List[int] = [1 for _ in Instrument]
         self.__transport: Optional[asyncio.WriteTransport] = None
@@ -55,10 +56,12 @@ class InformationPublisher(asyncio.DatagramProtocol):
         self.__bid_prices: List[int] = [0] * TOP_LEVEL_COUNT
         self.__bid_volumes: List[int] = [0] * TOP_LEVEL_COUNT
 
-        # Message buffers
-        self.__book_message = bytearray(ORDER_BOOK_MESSAGE_SIZE)
+        # Message buffers (one order book message per instrument so that the
+        # packed prices and volumes can be reused while a book is unchanged)
+        self.__book_messages: List[bytearray] = [bytearray(ORDER_BOOK_MESSAGE_SIZE) for _ in Instrument]
         self.__ticks_message = bytearray(TRADE_TICKS_MESSAGE_SIZE)
-        HEADER.pack_into(self.__book_message, 0, ORDER_BOOK_MESSAGE_SIZE, MessageType.ORDER_BOOK_UPDATE)
+        for book_message in self.__book_messages:
+            HEADER.pack_into(book_message, 0, ORDER_BOOK_MESSAGE_SIZE, MessageType.ORDER_BOOK_UPDATE)
         HEADER.pack_into(self.__ticks_message, 0, TRADE_TICKS_MESSAGE_SIZE, MessageType.TRADE_TICKS)
 
     def connection_made(self, transport: asyncio.WriteTransport) -> None:
@@ -69,11 +72,13 @@ class InformationPublisher(asyncio.DatagramProtocol):
     def on_timer_tick(self, timer: Timer, now: float, tick_number: int) -> None:
         """Called each time the timer ticks."""
         for book in self.__order_books:
-            book.top_levels(self.__ask_prices, self.__ask_volumes, self.__bid_prices, self.__bid_volumes)
-            ORDER_BOOK_HEADER.pack_into(self.__book_message, HEADER_SIZE, book.instrument, tick_number)
-            ORDER_BOOK_MESSAGE.pack_into(self.__book_message, ORDER_BOOK_HEADER_SIZE, *self.__ask_prices,
-                                         *self.__ask_volumes, *self.__bid_prices, *self.__bid_volumes)
-            self.__transport.write(self.__book_message)
+            book_message = self.__book_messages[book.instrument]
+            version = book.top_levels_version()
+            if version != self.__book_versions[book.instrument]:
+                ORDER_BOOK_MESSAGE.pack_into(book_message, ORDER_BOOK_HEADER_SIZE, *book.top_levels_snapshot())
+                self.__book_versions[book.instrument] = version
+            ORDER_BOOK_HEADER.pack_into(book_message, HEADER_SIZE, book.instrument, tick_number)
+            self.__transport.write(book_message)
 
     def on_trade(self, book: OrderBook) -> None:
         """Called when a trade occurs in one of the order books."""
@@ -92,6 +97,10 @@ class InformationPublisher(asyncio.DatagramProtocol):
                                           *self.__ask_volumes, *self.__bid_prices, *self.__bid_volumes)
             self.__transport.write(self.__ticks_message)
 
+    def snapshot(self) -> bytes:
+        """Return the order book update message last published for each instrument."""
+        return b"".join(bytes(self.__book_messages[i]) for i in Instrument if self.__book_versions[i] != -1)
+
     async def start(self) -> None:
         """Start this publisher."""
         typ = self.__publisher_factory.typ
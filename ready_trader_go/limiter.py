@@ -16,29 +16,35 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import collections
+import itertools
 import sys
 
-from typing import Deque
+from typing import Deque, List, Union
+
+# Default number of sub-intervals in a bucketed frequency limiter's window
+FREQUENCY_LIMITER_BUCKET_COUNT = 20
 
 
 class FrequencyLimiter(object):
     """Limit the frequency of events in a specified time interval."""
 
-    def __init__(self, interval: float, limit: int):
+    def __init__(self, interval: float, limit: int, count_batched_orders: bool = True, report_budget: bool = False):
         """Initialise a new instance of the FrequencyLimiter class."""
+        self.count_batched_orders: bool = count_batched_orders
         self.events: Deque[float] = collections.deque()
         self.interval: float = interval
         self.limit: int = limit
+        self.report_budget: bool = report_budget
         self.value: int = 0
 
-    def check_event(self, now: float) -> bool:
-        """Return True if the new event breaches the limit, False otherwise.
+    def check_event(self, now: float, count: int = 1) -> bool:
+        """Return True if the new event (or events) breaches the limit, False otherwise.
 
         This method should be called with a monotonically increasing sequence
         of times.
         """
-        self.value += 1
-        self.events.append(now)
+        self.value += count
+        self.events.extend(itertools.repeat(now, count))
 
         epsilon: float = sys.float_info.epsilon
         first: float = self.events[0]
@@ -51,15 +57,124 @@ class FrequencyLimiter(object):
 
         return self.value > self.limit
 
+    def reset_time(self) -> float:
+        """Return the time at which the oldest event counted will leave the window, or zero if there are none."""
+        return self.events[0] + self.interval if self.events else 0.0
+
+
+class BucketedFrequencyLimiter(object):
+    """Limit the frequency of events in a specified time interval.
+
+    Rather than remember the time of every event, the interval is divided
+    into a fixed number of sub-intervals and the events in each are counted
+    in a ring of buckets, so most checks take constant time no matter how
+    many events there are. A bucket is only emptied once all of its
+    sub-interval has left the window, so the bucketed count may include
+    events up to one sub-interval older than the window, but never misses
+    one. While it is within the limit there can be no breach; when it is
+    over the limit, the times of the most recent limit + 1 events, which are
+    all that are kept, decide exactly as a FrequencyLimiter would.
+    """
+
+    def __init__(self, interval: float, limit: int, count_batched_orders: bool = True, report_budget: bool = False,
+                 bucket_count: int = FREQUENCY_LIMITER_BUCKET_COUNT):
+        """Initialise a new instance of the BucketedFrequencyLimiter class."""
+        self.count_batched_orders: bool = count_batched_orders
+        self.interval: float = interval
+        self.limit: int = limit
+        self.report_budget: bool = report_budget
+        self.value: int = 0
+
+        # One more bucket than sub-intervals, for the sub-interval that is partly in the window
+        self.__bucket: int = 0
+        self.__bucket_width: float = interval / bucket_count
+        self.__buckets: List[int] = [0] * (bucket_count + 1)
+        self.__bucketed_value: int = 0
+        self.__recent: Deque[float] = collections.deque(maxlen=limit + 1)
+
+    def check_event(self, now: float, count: int = 1) -> bool:
+        """Return True if the new event (or events) breaches the limit, False otherwise.
+
+        This method should be called with a monotonically increasing sequence
+        of times.
+        """
+        buckets = self.__buckets
+        bucket: int = int(now / self.__bucket_width)
+
+        if bucket != self.__bucket:
+            if bucket - self.__bucket >= len(buckets):
+                buckets[:] = [0] * len(buckets)
+                self.__bucketed_value = 0
+            else:
+                for b in range(self.__bucket + 1, bucket + 1):
+                    i = b % len(buckets)
+                    self.__bucketed_value -= buckets[i]
+                    buckets[i] = 0
+            self.__bucket = bucket
+
+        buckets[bucket % len(buckets)] += count
+        self.__bucketed_value += count
+
+        recent = self.__recent
+        recent.extend(itertools.repeat(now, min(count, self.limit + 1)))
+
+        if self.__bucketed_value <= self.limit:
+            self.value = self.__bucketed_value
+            return False
+
+        # Near the limit, count exactly the recent events that are still in the window
+        epsilon: float = sys.float_info.epsilon
+        window_start: float = now - self.interval
+        while recent:
+            first: float = recent[0]
+            if (first - window_start) > ((first if first > window_start else window_start) * epsilon):
+                break
+            recent.popleft()
+
+        if len(recent) > self.limit:
+            self.value = self.__bucketed_value
+            return True
+
+        self.value = len(recent)
+        return False
+
+    def reset_time(self) -> float:
+        """Return the time at which the oldest event counted will leave the window, or zero if there are none."""
+        buckets = self.__buckets
+        for b in range(self.__bucket - len(buckets) + 1, self.__bucket + 1):
+            if buckets[b % len(buckets)]:
+                # The bucket is emptied once the window has moved a whole interval past its end
+                return (b + 1) * self.__bucket_width + self.interval
+        return 0.0
+
 
 class FrequencyLimiterFactory:
     """A factory class for FrequencyLimiters."""
 
-    def __init__(self, interval: float, limit: int):
-        """Initialise a new instance of the FrequencyLimiterFactory class."""
+    def __init__(self, interval: float, limit: int, count_batched_orders: bool = True, typ: str = "exact",
+                 bucket_count: int = FREQUENCY_LIMITER_BUCKET_COUNT, report_budget: bool = False):
+        """Initialise a new instance of the FrequencyLimiterFactory class.
+
+        If count_batched_orders is True, each request in an order batch
+        message counts as a message, otherwise the whole batch counts as one.
+        The type is either "exact", for FrequencyLimiters, or "bucketed", for
+        BucketedFrequencyLimiters with the given number of buckets. If
+        report_budget is True, auto-traders are told how much of the limit
+        they have used.
+        """
+        if typ not in ("exact", "bucketed"):
+            raise ValueError("type must be either 'exact' or 'bucketed'")
+        self.bucket_count: int = bucket_count
+        self.count_batched_orders: bool = count_batched_orders
         self.frequency_limit_interval: float = interval
         self.frequency_limit: int = limit
+        self.report_budget: bool = report_budget
+        self.typ: str = typ
 
-    def create(self) -> FrequencyLimiter:
-        """Return a new FrequencyLimiter instance."""
-        return FrequencyLimiter(self.frequency_limit_interval, self.frequency_limit)
+    def create(self) -> Union[FrequencyLimiter, BucketedFrequencyLimiter]:
+        """Return a new frequency limiter."""
+        if self.typ == "bucketed":
+            return BucketedFrequencyLimiter(self.frequency_limit_interval, self.frequency_limit,
+                                            self.count_batched_orders, self.report_budget, self.bucket_count)
+        return FrequencyLimiter(self.frequency_limit_interval, self.frequency_limit, self.count_batched_orders,
+                                self.report_budget)
@@ -0,0 +1,248 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import logging
+
+from typing import Iterable, List, Optional, Tuple, Union
+
+from .competitor import CompetitorManager
+from .execution import ExecutionConnection
+from .limiter import FrequencyLimiterFactory
+from .messages import HEADER, HEADER_SIZE, Connection, Subscription
+from .types import IController
+
+
+class LoopbackTransport(asyncio.Transport):
+    """One end of an in-process stream transport.
+
+    Data written to one end is copied into a buffer at the other end, which
+    hands the messages it holds to the on_message method of its protocol on
+    the next iteration of the event loop, so neither side ever runs inside
+    the other's callbacks.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, peer_name: Tuple[str, int]):
+        """Initialise a new instance of the LoopbackTransport class."""
+        super().__init__({"peername": peer_name})
+        self.__closed: bool = False
+        self.__delivering: bytearray = bytearray()
+        self.__event_loop: asyncio.AbstractEventLoop = loop
+        self.__incoming: bytearray = bytearray()
+        self.__peer: Optional[LoopbackTransport] = None
+        self.__protocol: Optional[Connection] = None
+
+    @staticmethod
+    def create_pair(loop: asyncio.AbstractEventLoop, first: Connection, second: Connection,
+                    peer_name: Tuple[str, int]) -> None:
+        """Connect two protocols with a pair of loopback transports."""
+        first_transport = LoopbackTransport(loop, peer_name)
+        second_transport = LoopbackTransport(loop, peer_name)
+        first_transport.__peer, first_transport.__protocol = second_transport, first
+        second_transport.__peer, second_transport.__protocol = first_transport, second
+        first.connection_made(first_transport)
+        second.connection_made(second_transport)
+
+    def abort(self) -> None:
+        """Close the transport immediately."""
+        self.close()
+
+    def can_write_eof(self) -> bool:
+        """Return False. Loopback transports don't support writing EOF."""
+        return False
+
+    def close(self) -> None:
+        """Close both ends of the transport."""
+        if not self.__closed:
+            self.__closed = True
+            self.__event_loop.call_soon(self.__protocol.connection_lost, None)
+            self.__peer.close()
+
+    def __deliver(self) -> None:
+        """Pass the messages received to this end's protocol until the transport is closed."""
+        # Swap the buffers, so that anything written to this end in the meantime waits for the next delivery
+        data: bytearray = self.__incoming
+        self.__incoming, self.__delivering = self.__delivering, data
+
+        protocol: Connection = self.__protocol
+        upto: int = 0
+        try:
+            while upto < len(data) and not self.__closed:
+                length, typ = HEADER.unpack_from(data, upto)
+                protocol.on_message(typ, data, upto + HEADER_SIZE, length)
+                upto += length
+        finally:
+            try:
+                data.clear()
+            except BufferError:
+                # The protocol still holds a view of the buffer, so leave it to the view and start a new one
+                self.__delivering = bytearray()
+
+    def get_protocol(self) -> asyncio.BaseProtocol:
+        """Return the protocol at this end of the transport."""
+        return self.__protocol
+
+    def is_closing(self) -> bool:
+        """Return True if the transport is closing or is closed."""
+        return self.__closed
+
+    def write(self, data: Union[bytearray, bytes, memoryview]) -> None:
+        """Send the messages in the provided data to the other end."""
+        if self.__closed or not data:
+            return
+
+        # Senders reuse their message buffers, so copy the data into the other end's buffer
+        peer: LoopbackTransport = self.__peer
+        if not peer.__incoming:
+            self.__event_loop.call_soon(peer.__deliver)
+        peer.__incoming += data
+
+
+class LoopbackSubscriber(asyncio.DatagramTransport):
+    """The receiving end of an in-process information channel."""
+
+    def __init__(self, publisher: "LoopbackPublisher", protocol: Subscription):
+        """Initialise a new instance of the LoopbackSubscriber class."""
+        super().__init__()
+        self.protocol: Subscription = protocol
+        self.__closed: bool = False
+        self.__publisher: LoopbackPublisher = publisher
+
+    def abort(self) -> None:
+        """Close the transport immediately."""
+        self.close()
+
+    def close(self) -> None:
+        """Stop receiving information messages."""
+        if not self.__closed:
+            self.__closed = True
+            self.__publisher.unsubscribe(self)
+            asyncio.get_running_loop().call_soon(self.protocol.connection_lost, None)
+
+    def get_protocol(self) -> asyncio.BaseProtocol:
+        """Return the current protocol."""
+        return self.protocol
+
+    def is_closing(self) -> bool:
+        """Return True if the subscriber is closing or is closed."""
+        return self.__closed
+
+    def sendto(self, data: Union[bytearray, bytes, memoryview], addr: Optional[Tuple[str, int]] = None) -> None:
+        """Send data to the transport."""
+        raise RuntimeError("Attempt to write to a Subscriber (a read-only transport)")
+
+
+class LoopbackPublisher(asyncio.WriteTransport):
+    """The sending end of an in-process information channel.
+
+    Each message is handed straight to the on_datagram method of every
+    subscriber, in the buffer it was written from.
+    """
+
+    def __init__(self, protocol: asyncio.BaseProtocol, subscribers: Iterable[Subscription]):
+        """Initialise a new instance of the LoopbackPublisher class."""
+        super().__init__()
+        self.__closed: bool = False
+        self.__event_loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        self.__subscribers: List[LoopbackSubscriber] = [LoopbackSubscriber(self, s) for s in subscribers]
+
+        self.__event_loop.call_soon(protocol.connection_made, self)
+        for subscriber in self.__subscribers:
+            self.__event_loop.call_soon(subscriber.protocol.connection_made, subscriber)
+
+    def abort(self) -> None:
+        """Close the publisher immediately."""
+        self.close()
+
+    def can_write_eof(self) -> bool:
+        """Return False. Publishers don't support writing EOF."""
+        return False
+
+    def close(self) -> None:
+        """Close the publisher."""
+        self.__closed = True
+
+    def is_closing(self) -> bool:
+        """Return True if the publisher is closing or is closed."""
+        return self.__closed
+
+    def unsubscribe(self, subscriber: LoopbackSubscriber) -> None:
+        """Stop sending information messages to the given subscriber."""
+        # Replace rather than modify the list, which may be being iterated over
+        self.__subscribers = [s for s in self.__subscribers if s is not subscriber]
+
+    def write(self, data: Union[bytearray, bytes, memoryview]) -> None:
+        """Publish the provided data."""
+        if self.__closed:
+            return
+
+        length, typ = HEADER.unpack_from(data)
+        for subscriber in self.__subscribers:
+            try:
+                subscriber.protocol.on_datagram(typ, data, HEADER_SIZE, length)
+            except Exception as e:
+                # Report it as the event loop would, but let the other subscribers have the message
+                self.__event_loop.call_exception_handler({"message": "subscriber raised an exception",
+                                                          "exception": e, "protocol": subscriber.protocol})
+
+
+class LoopbackPublisherFactory:
+    """A factory class for LoopbackPublisher instances."""
+
+    def __init__(self, subscribers: Iterable[Subscription]):
+        """Initialise a new instance of the LoopbackPublisherFactory class."""
+        self.__subscribers: Tuple[Subscription, ...] = tuple(subscribers)
+
+    @property
+    def name(self):
+        """Return the name for this publisher factory."""
+        return "loopback"
+
+    @property
+    def typ(self):
+        """Return the type for this publisher factory."""
+        return "loopback"
+
+    def create(self, protocol: asyncio.BaseProtocol) -> LoopbackPublisher:
+        """Create a new LoopbackPublisher instance."""
+        return LoopbackPublisher(protocol, self.__subscribers)
+
+
+class LoopbackExecutionServer:
+    """An execution server for auto-traders running on the exchange's own event loop."""
+
+    def __init__(self, auto_traders: Iterable[Connection], competitor_manager: CompetitorManager,
+                 limiter_factory: FrequencyLimiterFactory):
+        """Initialise a new instance of the LoopbackExecutionServer class."""
+        self.auto_traders: Tuple[Connection, ...] = tuple(auto_traders)
+        self.controller: Optional[IController] = None
+
+        self.__competitor_manager: CompetitorManager = competitor_manager
+        self.__limiter_factory: FrequencyLimiterFactory = limiter_factory
+        self.__logger = logging.getLogger("EXECUTION")
+
+    def close(self) -> None:
+        """Close the server without affecting existing connections."""
+
+    async def start(self) -> None:
+        """Connect each of the auto-traders to the exchange."""
+        loop = asyncio.get_running_loop()
+        self.__logger.info("starting loopback execution server: auto_traders=%d", len(self.auto_traders))
+        for i, auto_trader in enumerate(self.auto_traders):
+            connection = ExecutionConnection(self.__competitor_manager, self.__limiter_factory.create(),
+                                              self.controller)
+            LoopbackTransport.create_pair(loop, connection, auto_trader, ("loopback", i + 1))
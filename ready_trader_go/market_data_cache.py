@@ -0,0 +1,169 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import glob
+import hashlib
+import logging
+import os
+import pathlib
+import re
+import time
+
+from typing import List, Optional, Tuple
+
+from .market_events import COMPILED_MARKET_DATA_MAGIC, COMPILED_MARKET_DATA_SUFFIX, compile_market_data
+
+HASH_CHUNK_SIZE = 1 << 20
+HASH_PREFIX_LENGTH = 16
+
+# Subdirectory of the market data file's directory used when no cache directory is given
+DEFAULT_CACHE_SUBDIRECTORY = "market_data_cache"
+
+# Cache entries are named <stem>-<size>-<mtime in ns>-<content hash prefix>.bin
+ENTRY_PATTERN = re.compile(r"^.+-\d+-\d+-[0-9a-f]{%d}%s$"
+                           % (HASH_PREFIX_LENGTH, re.escape(COMPILED_MARKET_DATA_SUFFIX)))
+
+
+class MarketDataCache:
+    """A cache of compiled market data files.
+
+    Entries are keyed by the size, modification time and content hash of
+    the market data file they were compiled from. They are stored in the
+    cache directory or, if no directory is given, in a subdirectory of the
+    market data file's directory that is kept for the cache. Entries that
+    have not been used for longer than the maximum age are evicted, as are
+    the least recently used entries whenever the total size of the cache
+    exceeds the maximum size.
+    """
+
+    def __init__(self, directory: Optional[str], max_age: float, max_size: int):
+        """Initialise a new instance of the MarketDataCache class."""
+        self.directory: Optional[pathlib.Path] = pathlib.Path(directory) if directory else None
+        self.logger: logging.Logger = logging.getLogger("MARKET_DATA_CACHE")
+        self.max_age: float = max_age
+        self.max_size: int = max_size
+
+    def evict(self, directory: pathlib.Path, keep: pathlib.Path) -> None:
+        """Remove stale entries from the given cache directory, except for the one to keep."""
+        entries: List[Tuple[float, int, str]] = list()
+        for e in os.scandir(directory):
+            if ENTRY_PATTERN.match(e.name) and e.is_file() and e.path != str(keep):
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    # Another process sharing the cache has renamed or evicted the entry
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+
+        total_size: int = keep.stat().st_size + sum(e[1] for e in entries)
+        oldest: float = time.time() - self.max_age
+        for mtime, size, path in entries:
+            if mtime >= oldest and total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                total_size -= size
+            except OSError as e:
+                self.logger.warning("failed to evict cache entry: filename='%s' error='%s'", path, e)
+            else:
+                self.logger.info("evicted cache entry: filename='%s'", path)
+                total_size -= size
+
+    def __find_or_add(self, filename: str, source: pathlib.Path, directory: pathlib.Path,
+                      stat: os.stat_result) -> pathlib.Path:
+        """Return the cache entry for the given market data file, compiling it if there is none."""
+        stem = glob.escape(source.stem)
+        entry = next(directory.glob("%s-%d-%d-*%s" % (stem, stat.st_size, stat.st_mtime_ns,
+                                                       COMPILED_MARKET_DATA_SUFFIX)), None)
+        # Entries compiled by an earlier version have a different magic and are recompiled in place
+        if entry is not None and self.is_compiled(entry):
+            self.logger.info("found cache entry: filename='%s' entry='%s'", filename, entry)
+            return entry
+
+        digest = self.hash_file(source)
+        entry = directory / ("%s-%d-%d-%s%s" % (source.stem, stat.st_size, stat.st_mtime_ns, digest,
+                                                 COMPILED_MARKET_DATA_SUFFIX))
+        # The source file may have been touched without its contents changing
+        same_content = next(directory.glob("%s-%d-*-%s%s" % (stem, stat.st_size, digest,
+                                                              COMPILED_MARKET_DATA_SUFFIX)), None)
+        if same_content is not None and self.is_compiled(same_content):
+            try:
+                os.replace(same_content, entry)
+            except FileNotFoundError:
+                # Another process sharing the cache got there first, and may have renamed it to the same entry
+                if entry.exists():
+                    self.logger.info("found cache entry: filename='%s' entry='%s'", filename, entry)
+                    return entry
+            else:
+                self.logger.info("renamed cache entry: filename='%s' entry='%s'", filename, entry)
+                return entry
+
+        temporary = entry.with_name("%s.%d.tmp" % (entry.name, os.getpid()))
+        count = compile_market_data(filename, str(temporary))
+        os.replace(temporary, entry)
+        self.logger.info("added cache entry: filename='%s' entry='%s' events=%d", filename, entry, count)
+        return entry
+
+    def get(self, filename: str) -> str:
+        """Return the name of a compiled copy of the given market data file.
+
+        The market data file is compiled and stored in the cache if there is
+        no entry for it already.
+        """
+        source = pathlib.Path(filename)
+        if self.is_compiled(source):
+            return filename
+
+        directory: pathlib.Path = self.directory or source.parent / DEFAULT_CACHE_SUBDIRECTORY
+        directory.mkdir(parents=True, exist_ok=True)
+        stat = source.stat()
+
+        entry = self.__find_or_add(filename, source, directory, stat)
+        while True:
+            try:
+                os.utime(entry)
+            except FileNotFoundError:
+                # Another process sharing the cache renamed or evicted the entry, so look it up again
+                self.logger.info("cache entry has gone: filename='%s' entry='%s'", filename, entry)
+                entry = self.__find_or_add(filename, source, directory, stat)
+            else:
+                break
+
+        self.evict(directory, entry)
+        return str(entry)
+
+    @staticmethod
+    def is_compiled(path: pathlib.Path) -> bool:
+        """Return True if the given file holds market data compiled by this version."""
+        try:
+            with path.open("rb") as market_data:
+                return market_data.read(len(COMPILED_MARKET_DATA_MAGIC)) == COMPILED_MARKET_DATA_MAGIC
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def hash_file(path: pathlib.Path) -> str:
+        """Return a prefix of the SHA-256 hash of the given file's contents."""
+        sha = hashlib.sha256()
+        with path.open("rb") as f:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            while chunk:
+                sha.update(chunk)
+                chunk = f.read(HASH_CHUNK_SIZE)
+        return sha.hexdigest()[:HASH_PREFIX_LENGTH]
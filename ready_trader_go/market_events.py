@@ -15,22 +15,49 @@
 #     You should have received a copy of the GNU Affero General Public
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
+"""Reading market events from market data files.
+
+Market data files are either CSV files or compiled market data files. A
+compiled file is a 16 byte header, holding a magic number and the number of
+records, followed by fixed-width little-endian records laid out as
+MARKET_DATA_RECORD describes. The records are laid out exactly as a packed
+NumPy structured array with the dtype
+
+    [("time", "<f8"), ("instrument", "u1"), ("operation", "u1"), ("order_id", "<u4"),
+     ("side", "u1"), ("volume", "<i4"), ("price", "<i4"), ("lifespan", "u1")]
+
+would be, so numpy.frombuffer can read them from offset 16. They are
+written and read with the struct module, however, so that the exchange
+does not depend on NumPy. Each record unpacks straight into a market event
+tuple, so reading a compiled file builds no other object per event.
+"""
 import asyncio
 import csv
 import enum
 import logging
+import mmap
 import queue
+import struct
 import threading
 
-from typing import Callable, Dict, List, Optional, TextIO
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
 
 from .match_events import MatchEvents
 from .order_book import IOrderListener, Order, OrderBook
 from .types import Instrument, Lifespan, Side
 
-MARKET_EVENT_QUEUE_SIZE = 1024
+MARKET_EVENT_CHUNK_SIZE = 4096
+MARKET_EVENT_QUEUE_SIZE = 16  # Chunks of market events
 INPUT_SCALING = 100
 
+# Compiled market data: a header followed by fixed-width records
+COMPILED_MARKET_DATA_MAGIC = b"RTGMD002"
+COMPILED_MARKET_DATA_SUFFIX = ".bin"
+MARKET_DATA_HEADER = struct.Struct("<8sQ")  # Magic and record count
+MARKET_DATA_RECORD = struct.Struct("<dBBIBiiB")  # Time, inst, operation, order id, side, volume, price, lifespan
+NO_SIDE = 2  # Stored in place of a missing side
+NO_LIFESPAN = 2  # Stored in place of a missing lifespan
+
 
 class MarketEventOperation(enum.IntEnum):
     AMEND = 0
@@ -41,30 +68,55 @@ class MarketEventOperation(enum.IntEnum):
     Insert = INSERT
 
 
-class MarketEvent(object):
-    """A market event."""
-    __slots__ = ("time", "instrument", "operation", "order_id", "side", "volume", "price", "lifespan")
+# A market event is a tuple of time, instrument, operation, order id, side,
+# volume, price and lifespan. The time is as given in the market data file
+# and NO_SIDE or NO_LIFESPAN stand in for a missing side or lifespan.
+MarketEvent = Tuple[float, int, int, int, int, int, int, int]
+
+# Enumeration members by value, for orders made from market events
+INSTRUMENTS = tuple(Instrument)
+LIFESPANS = (Lifespan.FILL_AND_KILL, Lifespan.GOOD_FOR_DAY)
+SIDES = (Side.SELL, Side.BUY)
+
+
+def compile_market_data(source: str, destination: str) -> int:
+    """Convert a market data CSV file into the compiled market data format.
 
-    def __init__(self, time: float, instrument: Instrument, operation: MarketEventOperation, order_id: int,
-                 side: Optional[Side], volume: int, price: int, lifespan: Optional[Lifespan]):
-        """Initialise a new instance of the MarketEvent class."""
-        self.time: float = time
-        self.instrument: Instrument = instrument
-        self.operation: MarketEventOperation = operation
-        self.order_id: int = order_id
-        self.side: Optional[Side] = side
-        self.volume: int = volume
-        self.price: int = price
-        self.lifespan: Optional[Lifespan] = lifespan
+    Return the number of market events written.
+    """
+    pack = MARKET_DATA_RECORD.pack
+    count: int = 0
+
+    with open(source, newline="") as market_data, open(destination, "wb") as compiled:
+        compiled.write(MARKET_DATA_HEADER.pack(COMPILED_MARKET_DATA_MAGIC, 0))
+        csv_reader = csv.reader(market_data)
+        next(csv_reader)  # Skip header row
+        for row in csv_reader:
+            # time, instrument, operation, order_id, side, volume, price, lifespan
+            compiled.write(pack(float(row[0]), int(row[1]), MarketEventOperation[row[2]], int(row[3]),
+                                Side[row[4]] if row[4] else NO_SIDE, int(float(row[5])) if row[5] else 0,
+                                int(float(row[6]) * INPUT_SCALING) if row[6] else 0,
+                                Lifespan[row[7]] if row[7] else NO_LIFESPAN))
+            count += 1
+        compiled.seek(0)
+        compiled.write(MARKET_DATA_HEADER.pack(COMPILED_MARKET_DATA_MAGIC, count))
+
+    return count
 
 
 class MarketEventsReader(IOrderListener):
     """A processor of market events read from a file."""
 
     def __init__(self, filename: str, loop: asyncio.AbstractEventLoop, future_book: OrderBook, etf_book: OrderBook,
-                 match_events: MatchEvents):
+                 match_events: MatchEvents, start_time: float = 0.0, chunk_size: int = MARKET_EVENT_CHUNK_SIZE):
         """Initialise a new instance of the MarketEvents class.
+
+        Market events are timed relative to the given start time, so that
+        events before it have negative times and can be folded into the
+        order books when the market opens. The reader thread hands market
+        events over in chunks of the given size.
         """
+        self.chunk_size: int = chunk_size
         self.etf_book: OrderBook = etf_book
         self.etf_orders: Dict[int, Order] = dict()
         self.event_loop: asyncio.AbstractEventLoop = loop
@@ -74,15 +126,66 @@ class MarketEventsReader(IOrderListener):
         self.logger: logging.Logger = logging.getLogger("MARKET_EVENTS")
         self.match_events: MatchEvents = match_events
         self.queue: queue.Queue = queue.Queue(MARKET_EVENT_QUEUE_SIZE)
+        self.next_market_event: Callable[[], Optional[MarketEvent]] = self.queued_events().__next__
         self.reader_task: Optional[threading.Thread] = None
+        self.start_time: float = start_time
 
         # Prime the event pump with a no-op event
-        self.next_event: Optional[MarketEvent] = MarketEvent(0.0, Instrument.FUTURE, MarketEventOperation.CANCEL, 0,
-                                                             Side.BUY, 0, 0, Lifespan.FILL_AND_KILL)
+        self.next_event: Optional[MarketEvent] = (start_time, Instrument.FUTURE, MarketEventOperation.CANCEL, 0,
+                                                  NO_SIDE, 0, 0, NO_LIFESPAN)
 
         # Allow other objects to get a callback when the reader task is complete
         self.task_complete: List[Callable] = list()
 
+    def fold_market_events(self) -> None:
+        """Fold all market events that precede the start time into the order books.
+
+        The events are applied in a single pass without listener callbacks or
+        match events, and the orders left resting in the order books are then
+        reported as one snapshot. This must be called before the first call
+        to process_market_events.
+        """
+        books = (self.future_book, self.etf_book)
+        orders = (self.future_orders, self.etf_orders)
+        count: int = 0
+
+        for book in books:
+            book.begin_bulk_load()
+
+        next_market_event = self.next_market_event
+        start_time: float = self.start_time
+        evt: Optional[MarketEvent] = next_market_event()
+        while evt and evt[0] < start_time:
+            _, instrument, operation, order_id, side, volume, price, lifespan = evt
+            count += 1
+            if operation == MarketEventOperation.INSERT:
+                order = Order(order_id, INSTRUMENTS[instrument], LIFESPANS[lifespan], SIDES[side], price, volume)
+                books[instrument].insert(0.0, order)
+                if order.remaining_volume > 0:
+                    orders[instrument][order_id] = order
+            elif order_id in orders[instrument]:
+                order = orders[instrument][order_id]
+                if order.remaining_volume > 0:
+                    if operation == MarketEventOperation.CANCEL:
+                        books[instrument].cancel(0.0, order)
+                    elif volume < 0:
+                        books[instrument].amend(0.0, order, order.volume + volume)
+                if order.remaining_volume == 0:
+                    del orders[instrument][order_id]
+            evt = next_market_event()
+        self.next_event = evt
+
+        for book, resting in zip(books, orders):
+            book.end_bulk_load()
+            for order_id in [i for i, o in resting.items() if o.remaining_volume == 0]:
+                del resting[order_id]
+            for order in resting.values():
+                order.listener = self
+            self.match_events.snapshot(0.0, "", resting.values())
+
+        self.logger.info("folded %d market events into the order books: future_orders=%d etf_orders=%d", count,
+                         len(self.future_orders), len(self.etf_orders))
+
     # IOrderListener callbacks
 
     def on_order_amended(self, now: float, order: Order, volume_removed: int) -> None:
@@ -123,60 +226,106 @@ class MarketEventsReader(IOrderListener):
 
     def process_market_events(self, elapsed_time: float) -> None:
         """Process market events from the queue."""
-        evt: MarketEvent = self.next_event
+        next_market_event = self.next_market_event
+        start_time: float = self.start_time
+        evt: Optional[MarketEvent] = self.next_event
 
-        while evt and evt.time < elapsed_time:
-            if evt.instrument == Instrument.FUTURE:
+        while evt and evt[0] - start_time < elapsed_time:
+            tm, instrument, operation, order_id, side, volume, price, lifespan = evt
+            now: float = tm - start_time
+            if instrument == Instrument.FUTURE:
                 orders = self.future_orders
                 book = self.future_book
             else:
                 orders = self.etf_orders
                 book = self.etf_book
 
-            if evt.operation == MarketEventOperation.INSERT:
-                order = Order(evt.order_id, evt.instrument, evt.lifespan, evt.side, evt.price, evt.volume, self)
-                self.match_events.insert(evt.time, "", order.client_order_id, order.instrument, order.side,
+            if operation == MarketEventOperation.INSERT:
+                order = Order(order_id, INSTRUMENTS[instrument], LIFESPANS[lifespan], SIDES[side], price, volume,
+                              self)
+                self.match_events.insert(now, "", order.client_order_id, order.instrument, order.side,
                                          abs(order.volume), order.price, order.lifespan)
-                book.insert(evt.time, order)
-            elif evt.order_id in orders:
-                order = orders[evt.order_id]
-                if evt.operation == MarketEventOperation.CANCEL:
-                    book.cancel(evt.time, order)
-                elif evt.volume < 0:
-                    # evt.operation must be MarketEventOperation.AMEND
-                    book.amend(evt.time, order, order.volume + evt.volume)
+                book.insert(now, order)
+            elif order_id in orders:
+                order = orders[order_id]
+                if operation == MarketEventOperation.CANCEL:
+                    book.cancel(now, order)
+                elif volume < 0:
+                    # operation must be MarketEventOperation.AMEND
+                    book.amend(now, order, order.volume + volume)
 
-            evt = self.queue.get()
+            evt = next_market_event()
 
         self.next_event = evt
         if evt is None:
             for c in self.task_complete:
                 c(self)
 
+    def next_event_time(self) -> Optional[float]:
+        """Return the time of the next market event relative to the start time, or None if there are no more."""
+        return self.next_event[0] - self.start_time if self.next_event is not None else None
+
+    def queued_events(self) -> Iterator[Optional[MarketEvent]]:
+        """Yield the market events placed in the queue by the reader thread followed by None."""
+        for chunk in iter(self.queue.get, None):
+            yield from chunk
+        yield None
+
     def reader(self, market_data: TextIO) -> None:
-        """Read the market data file and place order events in the queue."""
+        """Read the market data file and place chunks of order events in the queue."""
         fifo = self.queue
+        chunk_size: int = self.chunk_size
+        chunk: List[MarketEvent] = list()
 
         with market_data:
             csv_reader = csv.reader(market_data)
             next(csv_reader)  # Skip header row
             for row in csv_reader:
                 # time, instrument, operation, order_id, side, volume, price, lifespan
-                fifo.put(MarketEvent(float(row[0]), Instrument(int(row[1])), MarketEventOperation[row[2]],
-                                     int(row[3]), Side[row[4]] if row[4] else None,
-                                     int(float(row[5])) if row[5] else 0, int(float(row[6]) * INPUT_SCALING) if row[6] else 0,
-                                     Lifespan[row[7]] if row[7] else None))
+                chunk.append((float(row[0]), Instrument(int(row[1])), MarketEventOperation[row[2]], int(row[3]),
+                              Side[row[4]] if row[4] else NO_SIDE, int(float(row[5])) if row[5] else 0,
+                              int(float(row[6]) * INPUT_SCALING) if row[6] else 0,
+                              Lifespan[row[7]] if row[7] else NO_LIFESPAN))
+                if len(chunk) == chunk_size:
+                    fifo.put(chunk)
+                    chunk = list()
+            if chunk:
+                fifo.put(chunk)
             fifo.put(None)
 
         self.event_loop.call_soon_threadsafe(self.on_reader_done, csv_reader.line_num - 1)
 
+    def compiled_reader(self, market_data: mmap.mmap) -> Iterator[Optional[MarketEvent]]:
+        """Yield the market events in a memory mapped compiled market data file followed by None.
+
+        The records are yielded just as they are unpacked, without any
+        conversion.
+        """
+        _, count = MARKET_DATA_HEADER.unpack_from(market_data)
+        with memoryview(market_data) as view:
+            records = view[MARKET_DATA_HEADER.size:MARKET_DATA_HEADER.size + count * MARKET_DATA_RECORD.size]
+            yield from MARKET_DATA_RECORD.iter_unpack(records)
+            records.release()
+        market_data.close()
+
+        self.on_reader_done(count)
+        yield None
+
     def start(self):
-        """Start the market events reader thread"""
+        """Start the market events reader thread, or map the market data file if it is compiled"""
+        compiled: Optional[mmap.mmap] = None
         try:
-            market_data = open(self.filename)
+            with open(self.filename, "rb") as market_data:
+                if market_data.read(len(COMPILED_MARKET_DATA_MAGIC)) == COMPILED_MARKET_DATA_MAGIC:
+                    compiled = mmap.mmap(market_data.fileno(), 0, access=mmap.ACCESS_READ)
+            if compiled is None:
+                market_data = open(self.filename)
         except OSError as e:
             self.logger.error("failed to open market data file: filename='%s'" % self.filename, exc_info=e)
             raise
+
+        if compiled is not None:
+            self.next_market_event = self.compiled_reader(compiled).__next__
         else:
             self.reader_task = threading.Thread(target=self.reader, args=(market_data,), daemon=True, name="reader")
             self.reader_task.start()
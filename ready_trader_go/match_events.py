@@ -22,7 +22,7 @@ import logging
 import queue
 import threading
 
-from typing import Any, Callable, List, Optional, TextIO, Union
+from typing import Any, Callable, Iterable, List, Optional, TextIO, Union
 
 from .types import Instrument, Lifespan, Side
 
@@ -33,6 +33,7 @@ class MatchEventOperation(enum.IntEnum):
     INSERT = 2
     HEDGE = 3
     TRADE = 4
+    REPLACE = 5
 
 
 class MatchEvent:
@@ -112,6 +113,27 @@ class MatchEvents:
         for callback in self.event_occurred:
             callback(event)
 
+    def replace(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, volume: int,
+                price: int, lifespan: Lifespan) -> None:
+        """Create a new replace event, giving the order's new price and remaining volume."""
+        event = MatchEvent(now, name, MatchEventOperation.REPLACE, order_id, instrument, side, volume, price,
+                           lifespan, None)
+        for callback in self.event_occurred:
+            callback(event)
+
+    def snapshot(self, now: float, name: str, orders: Iterable[Any]) -> None:
+        """Create an insert event for each of the given resting orders.
+
+        This describes an order book that was loaded in bulk, without any of
+        the events that led up to it.
+        """
+        callbacks = self.event_occurred
+        for order in orders:
+            event = MatchEvent(now, name, MatchEventOperation.INSERT, order.client_order_id, order.instrument,
+                               order.side, order.remaining_volume, order.price, order.lifespan, None)
+            for callback in callbacks:
+                callback(event)
+
 
 class MatchEventsWriter:
     """A processor of match events that it writes to a file."""
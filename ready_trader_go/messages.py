@@ -18,9 +18,10 @@
 import asyncio
 import enum
 import logging
+import operator
 import struct
 
-from typing import Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
 
 import ready_trader_go.order_book as order_book
 
@@ -37,6 +38,12 @@ class MessageType(enum.IntEnum):
     LOGIN = 7
     ORDER_FILLED = 8
     ORDER_STATUS = 9
+    ORDER_BATCH = 12
+    REPLACE_ORDER = 13
+    CANCEL_ALL_ORDERS = 14
+    CANCEL_ALL_STATUS = 15
+    MESSAGE_BUDGET = 16
+    SNAPSHOT_REQUEST = 17
 
     # Information messages
     ORDER_BOOK_UPDATE = 10
@@ -57,13 +64,20 @@ HEADER = struct.Struct("!HB")  # Length, message type
 # Auto-trader to matching engine messages
 AMEND_MESSAGE = struct.Struct("!II")  # Client order id and new volume
 CANCEL_MESSAGE = struct.Struct("!I")  # Client order id
+CANCEL_ALL_MESSAGE = struct.Struct("!B")  # Side, or ALL_SIDES
 HEDGE_MESSAGE = struct.Struct("!IBII")  # Client order id, side, price, volume
 INSERT_MESSAGE = struct.Struct("!IBIIB")  # Client order id, side, price, volume and lifespan
 LOGIN_MESSAGE = struct.Struct("!50s50s")  # Name, secret
+ORDER_BATCH_HEADER = struct.Struct("!B")  # Number of entries
+ORDER_BATCH_ENTRY = struct.Struct("!BIBIIB")  # Message type, client order id, side, price, volume and lifespan
+REPLACE_MESSAGE = struct.Struct("!III")  # Client order id, new price and new volume
+SNAPSHOT_REQUEST_MESSAGE = struct.Struct("!")  # No fields
 
 # Matching engine to auto-trader messages
+CANCEL_ALL_STATUS_MESSAGE = struct.Struct("!BII")  # Side, number of orders and volume cancelled
 ERROR_MESSAGE = struct.Struct("!I50s")  # message
 HEDGE_FILLED_MESSAGE = struct.Struct("!III")  # Client order id, price, volume
+MESSAGE_BUDGET_MESSAGE = struct.Struct("!IIIdd")  # Received, counted, limit, reset in & interval (event loop secs)
 ORDER_BOOK_HEADER = struct.Struct("!BI")  # Instrument and sequence number
 ORDER_BOOK_MESSAGE = struct.Struct("!%dI" % (4 * order_book.TOP_LEVEL_COUNT))  # Prices & volumes for best bids & asks
 ORDER_FILLED_MESSAGE = struct.Struct("!III")  # Client order id, price, volume
@@ -88,12 +102,18 @@ HEADER_SIZE: int = HEADER.size
 
 AMEND_MESSAGE_SIZE: int = HEADER.size + AMEND_MESSAGE.size
 CANCEL_MESSAGE_SIZE: int = HEADER.size + CANCEL_MESSAGE.size
+CANCEL_ALL_MESSAGE_SIZE: int = HEADER.size + CANCEL_ALL_MESSAGE.size
 HEDGE_MESSAGE_SIZE: int = HEADER.size + HEDGE_MESSAGE.size
 INSERT_MESSAGE_SIZE: int = HEADER.size + INSERT_MESSAGE.size
 LOGIN_MESSAGE_SIZE: int = HEADER.size + LOGIN_MESSAGE.size
+ORDER_BATCH_HEADER_SIZE: int = HEADER.size + ORDER_BATCH_HEADER.size
+REPLACE_MESSAGE_SIZE: int = HEADER.size + REPLACE_MESSAGE.size
+SNAPSHOT_REQUEST_MESSAGE_SIZE: int = HEADER.size + SNAPSHOT_REQUEST_MESSAGE.size
 
+CANCEL_ALL_STATUS_MESSAGE_SIZE: int = HEADER.size + CANCEL_ALL_STATUS_MESSAGE.size
 ERROR_MESSAGE_SIZE: int = HEADER.size + ERROR_MESSAGE.size
 HEDGE_FILLED_MESSAGE_SIZE: int = HEADER.size + HEDGE_FILLED_MESSAGE.size
+MESSAGE_BUDGET_MESSAGE_SIZE: int = HEADER.size + MESSAGE_BUDGET_MESSAGE.size
 ORDER_BOOK_HEADER_SIZE: int = HEADER.size + ORDER_BOOK_HEADER.size
 ORDER_BOOK_MESSAGE_SIZE: int = ORDER_BOOK_HEADER_SIZE + ORDER_BOOK_MESSAGE.size
 ORDER_FILLED_MESSAGE_SIZE: int = HEADER.size + ORDER_FILLED_MESSAGE.size
@@ -108,23 +128,72 @@ HEDGE_EVENT_MESSAGE_SIZE: int = HEADER.size + HEDGE_EVENT_MESSAGE.size
 TRADE_EVENT_MESSAGE_SIZE: int = HEADER.size + TRADE_EVENT_MESSAGE.size
 LOGIN_EVENT_MESSAGE_SIZE: int = HEADER.size + LOGIN_EVENT_MESSAGE.size
 
+# Side given in a cancel all orders message to cancel the orders on both sides
+ALL_SIDES: int = 255
 
-class Connection(asyncio.Protocol):
-    """A stream-based network connection."""
+# Maximum number of requests in an order batch message
+MAXIMUM_ORDER_BATCH_SIZE: int = 32
+
+# Length given in a message table for messages whose length varies, which are checked by a validator instead
+VARIABLE_LENGTH: int = 0
+
+# Receive buffers can hold the longest possible message
+RECEIVE_BUFFER_SIZE: int = 1 << 16
+RECEIVE_BUFFER_MINIMUM_SPACE: int = 4096
+
+
+class Connection(asyncio.BufferedProtocol):
+    """A stream-based network connection.
+
+    Data is received straight into a reusable buffer and each message is
+    decoded where it lies; only the start of a partly received message is
+    ever moved, and then only when the buffer is nearly full.
+
+    Data queued with the write method is gathered up and handed to the
+    transport in one go at the end of the current iteration of the event
+    loop, in the order it was queued.
+    """
 
     def __init__(self):
         """Initialize a new instance of the Connection class."""
+        self._buffer: bytearray = bytearray(RECEIVE_BUFFER_SIZE)
         self._closing: bool = False
-        self._data: bytes = b""
         self._file_number: int = 0
         self._connection_transport: Optional[asyncio.Transport] = None
+        self._outgoing: bytearray = bytearray()
+        self._read_offset: int = 0
+        self._view: memoryview = memoryview(self._buffer)
+        self._write_offset: int = 0
 
         self.__logger = logging.getLogger("CONNECTION")
 
+    def buffer_updated(self, nbytes: int) -> None:
+        """Called when data has been received into the buffer."""
+        self._write_offset += nbytes
+
+        buffer: bytearray = self._buffer
+        upto: int = self._read_offset
+        data_length: int = self._write_offset
+
+        while not self._closing and upto <= data_length - HEADER_SIZE:
+            length, typ = HEADER.unpack_from(buffer, upto)
+            if upto + length > data_length:
+                break
+
+            self.on_message(typ, buffer, upto + HEADER_SIZE, length)
+
+            upto += length
+
+        if upto == data_length:
+            self._read_offset = self._write_offset = 0
+        else:
+            self._read_offset = upto
+
     def close(self):
         """Close the connection."""
         self._closing = True
         if self._connection_transport is not None and not self._connection_transport.is_closing():
+            self.flush()
             self._connection_transport.close()
 
     def connection_lost(self, exc: Optional[Exception]) -> None:
@@ -134,36 +203,35 @@ class Connection(asyncio.Protocol):
         else:
             self.__logger.info("fd=%d connection lost", self._file_number)
         self._connection_transport = None
+        self._outgoing.clear()
 
     def connection_made(self, transport: asyncio.transports.BaseTransport) -> None:
         """Callback when a connection has been established."""
         sock = transport.get_extra_info("socket")
         if sock is not None:
             self._file_number = sock.fileno()
-        self.__logger.info("fd=%d connection established: peer=%s:%d", self._file_number,
-                           *(transport.get_extra_info("peername") or ("unknown", 0)))
+        peer_name = transport.get_extra_info("peername")
+        if type(peer_name) is tuple:
+            peer_name = "%s:%d" % peer_name[:2]
+        self.__logger.info("fd=%d connection established: peer=%s", self._file_number, peer_name or "unknown")
         self._connection_transport = transport
 
-    def data_received(self, data: bytes) -> None:
-        """Called when data is received."""
-        if self._data:
-            self._data += data
-        else:
-            self._data = data
-
-        upto: int = 0
-        data_length: int = len(self._data)
-
-        while not self._closing and upto < data_length - HEADER_SIZE:
-            length, typ = HEADER.unpack_from(self._data, upto)
-            if upto + length > data_length:
-                break
-
-            self.on_message(typ, self._data, upto + HEADER_SIZE, length)
-
-            upto += length
-
-        self._data = self._data[upto:]
+    def flush(self) -> None:
+        """Hand any queued data to the transport."""
+        if self._outgoing:
+            # The transport may hold on to the data, so give it the buffer and start a new one
+            outgoing, self._outgoing = self._outgoing, bytearray()
+            if self._connection_transport is not None:
+                self._connection_transport.write(outgoing)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        """Return the free part of the receive buffer."""
+        if self._read_offset and len(self._buffer) - self._write_offset < RECEIVE_BUFFER_MINIMUM_SPACE:
+            # Move the start of a partly received message to the front of the buffer
+            pending: int = self._write_offset - self._read_offset
+            self._buffer[:pending] = self._buffer[self._read_offset:self._write_offset]
+            self._read_offset, self._write_offset = 0, pending
+        return self._view[self._write_offset:]
 
     def on_message(self, typ: int, data: bytes, start: int, length: int) -> None:
         """Callback when an individual message has been received."""
@@ -172,6 +240,12 @@ class Connection(asyncio.Protocol):
         """Send a message."""
         self._connection_transport.write(HEADER.pack(length, typ) + data)
 
+    def write(self, data: Union[bytearray, bytes]) -> None:
+        """Queue data to be sent at the end of the current iteration of the event loop."""
+        if not self._outgoing:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self._outgoing += data
+
 
 class Subscription(asyncio.DatagramProtocol):
     """A packet-based network receiver."""
@@ -197,6 +271,10 @@ class Subscription(asyncio.DatagramProtocol):
         """Callback when the datagram receiver is established."""
         self._receiver_transport = transport
 
+    def datagrams_lost(self, count: int) -> None:
+        """Callback when the datagram receiver finds it has missed some datagrams."""
+        self.__logger.warning("lost %d datagrams", count)
+
     def datagram_received(self, data: bytes, address: Tuple[str, int]) -> None:
         """Callback when a datagram is received."""
         if len(data) < HEADER_SIZE:
@@ -213,3 +291,77 @@ class Subscription(asyncio.DatagramProtocol):
 
     def on_datagram(self, typ: int, data: bytes, start: int, length: int) -> None:
         """Callback when a datagram is received."""
+
+
+# A function that checks the length of a message of variable length, given the buffer, offset and length
+LengthValidator = Callable[[Any, int, int], bool]
+
+# A message handler entry: expected message length, unpacker, handler and length validator
+MessageHandler = Tuple[int, Callable[[Any, int], Any], Callable[..., None], Optional[LengthValidator]]
+
+
+class MessageTable:
+    """A table of the messages a connection handles.
+
+    Each entry gives a message type, the expected length of messages of that
+    type, a function to decode them from a buffer at a given offset and the
+    name of the method that handles them, which may be a dotted name such as
+    "competitor.on_amend_message". For messages whose length varies, the
+    length is instead a function that is given the buffer, offset and length
+    of each message and returns True if the length is valid. A table is
+    built once for each connection class and bound to the object whose
+    methods handle the messages when the connection is created.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[MessageType, Union[int, LengthValidator], Callable[[Any, int], Any],
+                                               str]]):
+        """Initialise a new instance of the MessageTable class."""
+        self.entries: Tuple[Tuple[MessageType, Union[int, LengthValidator], Callable[[Any, int], Any], str],
+                            ...] = tuple(entries)
+
+    def bind(self, target: Any) -> Dict[int, MessageHandler]:
+        """Return a dispatch table of the given target's handlers keyed by message type."""
+        return {typ: (length, unpack, operator.attrgetter(name)(target), None) if isinstance(length, int)
+                else (VARIABLE_LENGTH, unpack, operator.attrgetter(name)(target), length)
+                for typ, length, unpack, name in self.entries}
+
+
+def has_valid_length(handler: MessageHandler, data: Any, start: int, length: int) -> bool:
+    """Return True if a message with the given length is valid for the given handler."""
+    return handler[0] == length or (handler[0] == VARIABLE_LENGTH and handler[3](data, start, length))
+
+
+def unpack_book_message(data: Any, start: int) -> Tuple[int, int, Tuple[int, ...], Tuple[int, ...],
+                                                      Tuple[int, ...], Tuple[int, ...]]:
+    """Decode an order book update or trade ticks message, which share a layout."""
+    instrument, sequence_number = ORDER_BOOK_HEADER.unpack_from(data, start)
+    start += ORDER_BOOK_HEADER.size
+    return (instrument, sequence_number, BOOK_PART.unpack_from(data, start),
+            BOOK_PART.unpack_from(data, start + BOOK_PART.size),
+            BOOK_PART.unpack_from(data, start + 2 * BOOK_PART.size),
+            BOOK_PART.unpack_from(data, start + 3 * BOOK_PART.size))
+
+
+def unpack_error_message(data: Any, start: int) -> Tuple[int, bytes]:
+    """Decode an error message."""
+    client_order_id, error_message = ERROR_MESSAGE.unpack_from(data, start)
+    return client_order_id, error_message.rstrip(b"\x00")
+
+
+def unpack_login_event_message(data: Any, start: int) -> Tuple[str, int]:
+    """Decode a login event message."""
+    name, competitor_id = LOGIN_EVENT_MESSAGE.unpack_from(data, start)
+    return name.rstrip(b"\0").decode(), competitor_id
+
+
+def unpack_order_batch_message(data: Any, start: int) -> Tuple[int, Iterator[Tuple[int, int, int, int, int, int]]]:
+    """Decode an order batch message into the number of entries and an iterator over them."""
+    count: int = data[start]
+    start += ORDER_BATCH_HEADER.size
+    return count, ORDER_BATCH_ENTRY.iter_unpack(memoryview(data)[start:start + count * ORDER_BATCH_ENTRY.size])
+
+
+def valid_order_batch_length(data: Any, start: int, length: int) -> bool:
+    """Return True if an order batch message has a valid length for the number of entries it holds."""
+    return (length > ORDER_BATCH_HEADER_SIZE and data[start] <= MAXIMUM_ORDER_BATCH_SIZE
+            and length == ORDER_BATCH_HEADER_SIZE + data[start] * ORDER_BATCH_ENTRY.size)
@@ -18,7 +18,7 @@
 from bisect import bisect, insort_left
 import collections
 
-from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from .types import Instrument, Lifespan, Side
 
@@ -26,6 +26,8 @@ from .types import Instrument, Lifespan, Side
 MINIMUM_BID = 1
 MAXIMUM_ASK = 2 ** 31 - 1
 TOP_LEVEL_COUNT = 5
+LADDER_INITIAL_CAPACITY = 1024
+LADDER_MAXIMUM_CAPACITY = 1 << 14
 
 
 class IOrderListener(object):
@@ -41,6 +43,10 @@ class IOrderListener(object):
         """Called when a good-for-day order is placed in the order book."""
         pass
 
+    def on_order_replaced(self, now: float, order, old_price: int, old_remaining_volume: int) -> None:
+        """Called when the order is given a new price or volume and loses its priority."""
+        pass
+
     def on_order_filled(self, now: float, order, price: int, volume: int, fee: int) -> None:
         """Called when the order is partially or completely filled."""
         pass
@@ -48,8 +54,8 @@ class IOrderListener(object):
 
 class Order(object):
     """A request to buy or sell at a given price."""
-    __slots__ = ("client_order_id", "instrument", "lifespan", "listener", "price", "remaining_volume", "side",
-                 "total_fees", "volume")
+    __slots__ = ("client_order_id", "instrument", "lifespan", "listener", "next_order", "prev_order", "price",
+                 "remaining_volume", "side", "total_fees", "volume")
 
     def __init__(self, client_order_id: int, instrument: Instrument, lifespan: Lifespan, side: Side, price: int,
                  volume: int, listener: Optional[IOrderListener] = None):
@@ -63,6 +69,8 @@ class Order(object):
         self.total_fees: int = 0
         self.volume: int = volume
         self.listener: IOrderListener = listener
+        self.next_order: Optional[Order] = None
+        self.prev_order: Optional[Order] = None
 
     def __str__(self):
         """Return a string containing a description of this order object."""
@@ -73,6 +81,49 @@ class Order(object):
         return s % args
 
 
+class OrderQueue(object):
+    """The orders at a price level in time priority.
+
+    The queue is an intrusive doubly-linked list threaded through the orders
+    themselves, so that any order can be removed in constant time.
+    """
+    __slots__ = ("first", "last")
+
+    def __init__(self):
+        """Initialise a new instance of the OrderQueue class."""
+        self.first: Optional[Order] = None
+        self.last: Optional[Order] = None
+
+    def __iter__(self):
+        """Return an iterator over the orders in this queue."""
+        order = self.first
+        while order is not None:
+            yield order
+            order = order.next_order
+
+    def append(self, order: Order) -> None:
+        """Add an order to the back of this queue."""
+        order.prev_order = self.last
+        order.next_order = None
+        if self.last is None:
+            self.first = order
+        else:
+            self.last.next_order = order
+        self.last = order
+
+    def remove(self, order: Order) -> None:
+        """Remove an order from this queue."""
+        if order.prev_order is None:
+            self.first = order.next_order
+        else:
+            order.prev_order.next_order = order.next_order
+        if order.next_order is None:
+            self.last = order.prev_order
+        else:
+            order.next_order.prev_order = order.prev_order
+        order.next_order = order.prev_order = None
+
+
 class OrderBook(object):
     """A collection of orders arranged by the price-time priority principle."""
 
@@ -82,13 +133,19 @@ class OrderBook(object):
         self.maker_fee: float = maker_fee
         self.taker_fee: float = taker_fee
 
+        self.__ask_limit: int = MAXIMUM_ASK
         self.__ask_prices: List[int] = []
         self.__ask_ticks: Dict[int, int] = collections.defaultdict(int)
+        self.__bid_limit: int = 0
         self.__bid_prices: List[int] = []
         self.__bid_ticks: Dict[int, int] = collections.defaultdict(int)
+        self.__bulk_load_signals: Optional[Tuple[List[Callable[[Any], None]], Dict[int, int], Dict[int, int]]] = None
         self.__last_traded_price: Optional[int] = None
-        self.__levels: Dict[int, Deque[Order]] = {}
+        self.__levels: Dict[int, OrderQueue] = {}
+        self.__top_levels: Tuple[int, ...] = (0,) * (4 * TOP_LEVEL_COUNT)
+        self.__top_levels_changed: bool = False
         self.__total_volumes: Dict[int, int] = {}
+        self.__version: int = 0
 
         # Signals
         self.trade_occurred: List[Callable[[Any], None]] = list()
@@ -109,12 +166,26 @@ class OrderBook(object):
         if order.remaining_volume > 0:
             fill_volume = order.volume - order.remaining_volume
             diff = order.volume - (fill_volume if new_volume < fill_volume else new_volume)
+            if diff == order.remaining_volume:
+                self.__unlink(order)
             self.remove_volume_from_level(order.price, diff, order.side)
             order.volume -= diff
             order.remaining_volume -= diff
             if order.listener:
                 order.listener.on_order_amended(now, order, diff)
 
+    def begin_bulk_load(self) -> None:
+        """Start loading orders into this order book in bulk.
+
+        Until end_bulk_load is called, trades are neither signalled through
+        trade_occurred nor reported as trade ticks. Orders loaded in bulk
+        should not have a listener.
+        """
+        self.__bulk_load_signals = (self.trade_occurred, self.__ask_ticks, self.__bid_ticks)
+        self.trade_occurred = list()
+        self.__ask_ticks = collections.defaultdict(int)
+        self.__bid_ticks = collections.defaultdict(int)
+
     def best_ask(self) -> Optional[int]:
         """Return the current best ask price, or None if there are no ask orders."""
         return -self.__ask_prices[-1] if self.__ask_prices else None
@@ -126,12 +197,18 @@ class OrderBook(object):
     def cancel(self, now: float, order: Order) -> None:
         """Cancel an order in this order book."""
         if order.remaining_volume > 0:
+            self.__unlink(order)
             self.remove_volume_from_level(order.price, order.remaining_volume, order.side)
             remaining = order.remaining_volume
             order.remaining_volume = 0
             if order.listener:
                 order.listener.on_order_cancelled(now, order, remaining)
 
+    def end_bulk_load(self) -> None:
+        """Finish loading orders into this order book in bulk."""
+        self.trade_occurred, self.__ask_ticks, self.__bid_ticks = self.__bulk_load_signals
+        self.__bulk_load_signals = None
+
     def insert(self, now: float, order: Order) -> None:
         """Insert a new order into this order book."""
         if order.side == Side.SELL and self.__bid_prices and order.price <= self.__bid_prices[-1]:
@@ -160,10 +237,19 @@ class OrderBook(object):
 
     def place(self, now: float, order: Order) -> None:
         """Place an order that does not match any existing order in this order book."""
+        self.__rest(order)
+        if order.listener:
+            order.listener.on_order_placed(now, order)
+
+    def __rest(self, order: Order) -> None:
+        """Add an order to the back of the queue at its price level."""
         price = order.price
 
+        if price <= self.__ask_limit if order.side == Side.SELL else price >= self.__bid_limit:
+            self.__on_top_level_changed(order.side)
+
         if price not in self.__levels:
-            self.__levels[price] = collections.deque()
+            self.__levels[price] = OrderQueue()
             self.__total_volumes[price] = 0
             if order.side == Side.SELL:
                 insort_left(self.__ask_prices, -price)
@@ -173,10 +259,40 @@ class OrderBook(object):
         self.__levels[price].append(order)
         self.__total_volumes[price] += order.remaining_volume
 
-        if order.listener:
-            order.listener.on_order_placed(now, order)
+    def __on_top_level_changed(self, side: Side) -> None:
+        """Note that one of the top levels on the given side may have changed."""
+        self.__top_levels_changed = True
+        if side == Side.SELL:
+            self.__ask_limit = MAXIMUM_ASK
+        else:
+            self.__bid_limit = 0
+
+    def __refresh_top_levels(self) -> None:
+        """Rebuild the top levels snapshot and bump the version if it has changed."""
+        ask_prices = [0] * TOP_LEVEL_COUNT
+        ask_volumes = [0] * TOP_LEVEL_COUNT
+        bid_prices = [0] * TOP_LEVEL_COUNT
+        bid_volumes = [0] * TOP_LEVEL_COUNT
+        self.top_levels(ask_prices, ask_volumes, bid_prices, bid_volumes)
+
+        top_levels = (*ask_prices, *ask_volumes, *bid_prices, *bid_volumes)
+        if top_levels != self.__top_levels:
+            self.__top_levels = top_levels
+            self.__version += 1
+
+        # Changes to levels beyond these limits cannot affect the top levels
+        self.__ask_limit = ask_prices[-1] or MAXIMUM_ASK
+        self.__bid_limit = bid_prices[-1]
+        self.__top_levels_changed = False
+
+    def __unlink(self, order: Order) -> None:
+        """Remove a resting order from the queue at its price level."""
+        self.__levels[order.price].remove(order)
 
     def remove_volume_from_level(self, price: int, volume: int, side: Side) -> None:
+        if price <= self.__ask_limit if side == Side.SELL else price >= self.__bid_limit:
+            self.__on_top_level_changed(side)
+
         if self.__total_volumes[price] == volume:
             del self.__levels[price]
             del self.__total_volumes[price]
@@ -187,6 +303,38 @@ class OrderBook(object):
         else:
             self.__total_volumes[price] -= volume
 
+    def replace(self, now: float, order: Order, new_price: int, new_volume: int) -> None:
+        """Replace an order in this order book with one at a new price and volume.
+
+        The new volume includes any volume already filled, as for an amend.
+        If only the volume is reduced, the order is amended and keeps its
+        place in the queue; otherwise it goes to the back of the queue at
+        the new price, trading first with any orders it now matches.
+        """
+        if order.remaining_volume > 0:
+            fill_volume = order.volume - order.remaining_volume
+            if (new_price == order.price and new_volume <= order.volume) or new_volume <= fill_volume:
+                self.amend(now, order, new_volume)
+                return
+
+            old_price = order.price
+            old_remaining_volume = order.remaining_volume
+            self.__unlink(order)
+            self.remove_volume_from_level(old_price, old_remaining_volume, order.side)
+            order.price = new_price
+            order.volume = new_volume
+            order.remaining_volume = new_volume - fill_volume
+            if order.listener:
+                order.listener.on_order_replaced(now, order, old_price, old_remaining_volume)
+
+            if order.side == Side.SELL and self.__bid_prices and new_price <= self.__bid_prices[-1]:
+                self.trade_ask(now, order)
+            elif order.side == Side.BUY and self.__ask_prices and new_price >= -self.__ask_prices[-1]:
+                self.trade_bid(now, order)
+
+            if order.remaining_volume > 0:
+                self.__rest(order)
+
     def top_levels(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
                    bid_volumes: List[int]) -> None:
         """Populate the supplied lists with the top levels for this book."""
@@ -212,6 +360,23 @@ class OrderBook(object):
             bid_prices[i] = bid_volumes[i] = 0
             i += 1
 
+    def top_levels_snapshot(self) -> Tuple[int, ...]:
+        """Return the ask prices, ask volumes, bid prices and bid volumes of
+        the top levels for this book as a single tuple.
+
+        The snapshot is only rebuilt when the top levels have changed, so the
+        same tuple is returned for as long as top_levels_version is unchanged.
+        """
+        if self.__top_levels_changed:
+            self.__refresh_top_levels()
+        return self.__top_levels
+
+    def top_levels_version(self) -> int:
+        """Return a number that increases each time the top levels of this book change."""
+        if self.__top_levels_changed:
+            self.__refresh_top_levels()
+        return self.__version
+
     def trade_ask(self, now: float, order: Order) -> None:
         """Check to see if any existing bid orders match the specified ask order."""
         best_bid = self.__bid_prices[-1]
@@ -242,20 +407,22 @@ class OrderBook(object):
 
     def trade_level(self, now: float, order: Order, best_price: int) -> None:
         """Match the specified order with existing orders at the given level."""
+        self.__on_top_level_changed(Side.SELL if order.side == Side.BUY else Side.BUY)
+
         remaining: int = order.remaining_volume
-        order_queue: Deque[Order] = self.__levels[best_price]
+        order_queue: OrderQueue = self.__levels[best_price]
         total_volume: int = self.__total_volumes[best_price]
 
         while remaining > 0 and total_volume > 0:
-            while order_queue[0].remaining_volume == 0:
-                order_queue.popleft()
-            passive: Order = order_queue[0]
+            passive: Order = order_queue.first
             volume: int = remaining if remaining < passive.remaining_volume else passive.remaining_volume
             fee: int = round(best_price * volume * self.maker_fee)
             total_volume -= volume
             remaining -= volume
             passive.remaining_volume -= volume
             passive.total_fees += fee
+            if passive.remaining_volume == 0:
+                order_queue.remove(passive)
             if passive.listener:
                 passive.listener.on_order_filled(now, passive, best_price, volume, fee)
 
@@ -327,3 +494,609 @@ class OrderBook(object):
                 i -= 1
 
         return total_volume, total_value // total_volume if total_volume > 0 else 0
+
+
+class LadderOrderBook(object):
+    """A collection of orders arranged by the price-time priority principle.
+
+    Price levels near the touch are held in preallocated arrays indexed by
+    their offset, in ticks, from a base price, so creating or removing a
+    level does not shift a sorted list. The best bid and best ask in the
+    arrays are tracked as indices and the arrays are re-centred, or grown up
+    to a maximum capacity, when a price falls outside of their range. Levels
+    that cannot be placed in the arrays, because they are too far from the
+    touch or their price is not a multiple of the tick size, are kept in
+    sorted lists as they are by the OrderBook class.
+    """
+
+    def __init__(self, instrument: Instrument, maker_fee: float, taker_fee: float, tick_size: int = 1,
+                 capacity: int = LADDER_INITIAL_CAPACITY):
+        """Initialise a new instance of the LadderOrderBook class."""
+        self.instrument: Instrument = instrument
+        self.maker_fee: float = maker_fee
+        self.taker_fee: float = taker_fee
+        self.tick_size: int = tick_size
+
+        self.__ask_count: int = 0
+        self.__ask_limit: int = MAXIMUM_ASK
+        self.__ask_ticks: Dict[int, int] = collections.defaultdict(int)
+        self.__base: int = 0
+        self.__best_ask: int = 0
+        self.__best_bid: int = 0
+        self.__bid_count: int = 0
+        self.__bid_limit: int = 0
+        self.__bid_ticks: Dict[int, int] = collections.defaultdict(int)
+        self.__bulk_load_signals: Optional[Tuple[List[Callable[[Any], None]], Dict[int, int], Dict[int, int]]] = None
+        self.__capacity: int = min(capacity, LADDER_MAXIMUM_CAPACITY)
+        self.__last_traded_price: Optional[int] = None
+        self.__levels: List[Optional[OrderQueue]] = [None] * self.__capacity
+        self.__outlying_ask_prices: List[int] = []
+        self.__outlying_bid_prices: List[int] = []
+        self.__outlying_levels: Dict[int, OrderQueue] = {}
+        self.__outlying_volumes: Dict[int, int] = {}
+        self.__top_levels: Tuple[int, ...] = (0,) * (4 * TOP_LEVEL_COUNT)
+        self.__top_levels_changed: bool = False
+        self.__total_volumes: List[int] = [0] * self.__capacity
+        self.__version: int = 0
+
+        # Signals
+        self.trade_occurred: List[Callable[[Any], None]] = list()
+
+    def __str__(self):
+        """Return a string representation of this order book."""
+        ask_prices = [0] * TOP_LEVEL_COUNT
+        ask_volumes = [0] * TOP_LEVEL_COUNT
+        bid_prices = [0] * TOP_LEVEL_COUNT
+        bid_volumes = [0] * TOP_LEVEL_COUNT
+        self.top_levels(ask_prices, ask_volumes, bid_prices, bid_volumes)
+        return ("BidVol\tPrice\tAskVol\n"
+                + "\n".join("\t%dc\t%6d" % (p, v) for p, v in zip(reversed(ask_prices), reversed(ask_volumes)) if p)
+                + "\n" + "\n".join("%6d\t%dc" % (v, p) for p, v in zip(bid_prices, bid_volumes) if p))
+
+    def amend(self, now: float, order: Order, new_volume: int) -> None:
+        """Amend an order in this order book by decreasing its volume."""
+        if order.remaining_volume > 0:
+            fill_volume = order.volume - order.remaining_volume
+            diff = order.volume - (fill_volume if new_volume < fill_volume else new_volume)
+            if diff == order.remaining_volume:
+                self.__unlink(order)
+            self.remove_volume_from_level(order.price, diff, order.side)
+            order.volume -= diff
+            order.remaining_volume -= diff
+            if order.listener:
+                order.listener.on_order_amended(now, order, diff)
+
+    def begin_bulk_load(self) -> None:
+        """Start loading orders into this order book in bulk.
+
+        Until end_bulk_load is called, trades are neither signalled through
+        trade_occurred nor reported as trade ticks. Orders loaded in bulk
+        should not have a listener.
+        """
+        self.__bulk_load_signals = (self.trade_occurred, self.__ask_ticks, self.__bid_ticks)
+        self.trade_occurred = list()
+        self.__ask_ticks = collections.defaultdict(int)
+        self.__bid_ticks = collections.defaultdict(int)
+
+    def best_ask(self) -> Optional[int]:
+        """Return the current best ask price, or None if there are no ask orders."""
+        if self.__outlying_ask_prices:
+            outlying: int = -self.__outlying_ask_prices[-1]
+            if self.__ask_count:
+                best: int = self.__base + self.__best_ask * self.tick_size
+                return best if best < outlying else outlying
+            return outlying
+        return self.__base + self.__best_ask * self.tick_size if self.__ask_count else None
+
+    def best_bid(self) -> Optional[int]:
+        """Return the current best bid price, or None if there are no bid orders."""
+        if self.__outlying_bid_prices:
+            outlying: int = self.__outlying_bid_prices[-1]
+            if self.__bid_count:
+                best: int = self.__base + self.__best_bid * self.tick_size
+                return best if best > outlying else outlying
+            return outlying
+        return self.__base + self.__best_bid * self.tick_size if self.__bid_count else None
+
+    def cancel(self, now: float, order: Order) -> None:
+        """Cancel an order in this order book."""
+        if order.remaining_volume > 0:
+            self.__unlink(order)
+            self.remove_volume_from_level(order.price, order.remaining_volume, order.side)
+            remaining = order.remaining_volume
+            order.remaining_volume = 0
+            if order.listener:
+                order.listener.on_order_cancelled(now, order, remaining)
+
+    def end_bulk_load(self) -> None:
+        """Finish loading orders into this order book in bulk."""
+        self.trade_occurred, self.__ask_ticks, self.__bid_ticks = self.__bulk_load_signals
+        self.__bulk_load_signals = None
+
+    def __index(self, price: int) -> int:
+        """Return the index of the given price in the ladder, or -1 if the price has no place in it."""
+        offset: int = price - self.__base
+        if offset % self.tick_size == 0:
+            i: int = offset // self.tick_size
+            if 0 <= i < self.__capacity:
+                return i
+        return -1
+
+    def insert(self, now: float, order: Order) -> None:
+        """Insert a new order into this order book."""
+        if order.side == Side.SELL:
+            best_bid = self.best_bid()
+            if best_bid is not None and order.price <= best_bid:
+                self.trade_ask(now, order)
+        else:
+            best_ask = self.best_ask()
+            if best_ask is not None and order.price >= best_ask:
+                self.trade_bid(now, order)
+
+        if order.remaining_volume > 0:
+            if order.lifespan == Lifespan.FILL_AND_KILL:
+                remaining = order.remaining_volume
+                order.remaining_volume = 0
+                if order.listener:
+                    order.listener.on_order_cancelled(now, order, remaining)
+            else:
+                self.place(now, order)
+
+    def __iter_levels(self, side: Side) -> Iterator[Tuple[int, int]]:
+        """Yield the price and total volume of each level on the given side, best first."""
+        base: int = self.__base
+        levels = self.__levels
+        tick_size: int = self.tick_size
+        total_volumes = self.__total_volumes
+        outlying_volumes = self.__outlying_volumes
+
+        if side == Side.SELL:
+            i, n, step, sign, outlying = self.__best_ask, self.__ask_count, 1, -1, self.__outlying_ask_prices
+        else:
+            i, n, step, sign, outlying = self.__best_bid, self.__bid_count, -1, 1, self.__outlying_bid_prices
+
+        k: int = len(outlying) - 1
+        while n or k >= 0:
+            if n:
+                while levels[i] is None:
+                    i += step
+                price: int = base + i * tick_size
+                if k < 0 or (price < -outlying[k] if side == Side.SELL else price > outlying[k]):
+                    yield price, total_volumes[i]
+                    i += step
+                    n -= 1
+                    continue
+            price = sign * outlying[k]
+            yield price, outlying_volumes[price]
+            k -= 1
+
+    def last_traded_price(self) -> Optional[int]:
+        """Return the last traded price."""
+        return self.__last_traded_price
+
+    def midpoint_price(self) -> Optional[float]:
+        """Return the midpoint price."""
+        best_bid = self.best_bid()
+        best_ask = self.best_ask()
+        if best_bid is not None and best_ask is not None:
+            return (best_bid + best_ask) / 2.0
+        return None
+
+    def place(self, now: float, order: Order) -> None:
+        """Place an order that does not match any existing order in this order book."""
+        self.__rest(order)
+        if order.listener:
+            order.listener.on_order_placed(now, order)
+
+    def __rest(self, order: Order) -> None:
+        """Add an order to the back of the queue at its price level."""
+        price = order.price
+
+        if price <= self.__ask_limit if order.side == Side.SELL else price >= self.__bid_limit:
+            self.__on_top_level_changed(order.side)
+
+        i = self.__index(price)
+        if i < 0 and price % self.tick_size == 0 and price not in self.__outlying_levels:
+            self.__make_room(price, order.side)
+            i = self.__index(price)
+
+        if i < 0:
+            order_queue = self.__outlying_levels.get(price)
+            if order_queue is None:
+                order_queue = self.__add_outlying_level(price, order.side, OrderQueue(), 0)
+            order_queue.append(order)
+            self.__outlying_volumes[price] += order.remaining_volume
+            return
+
+        order_queue = self.__levels[i]
+        if order_queue is None:
+            order_queue = self.__levels[i] = OrderQueue()
+            if order.side == Side.SELL:
+                if self.__ask_count == 0 or i < self.__best_ask:
+                    self.__best_ask = i
+                self.__ask_count += 1
+            else:
+                if self.__bid_count == 0 or i > self.__best_bid:
+                    self.__best_bid = i
+                self.__bid_count += 1
+
+        order_queue.append(order)
+        self.__total_volumes[i] += order.remaining_volume
+
+    def __add_outlying_level(self, price: int, side: Side, order_queue: OrderQueue, volume: int) -> OrderQueue:
+        """Add a price level that has no place in the ladder."""
+        self.__outlying_levels[price] = order_queue
+        self.__outlying_volumes[price] = volume
+        if side == Side.SELL:
+            insort_left(self.__outlying_ask_prices, -price)
+        else:
+            insort_left(self.__outlying_bid_prices, price)
+        return order_queue
+
+    def __on_top_level_changed(self, side: Side) -> None:
+        """Note that one of the top levels on the given side may have changed."""
+        self.__top_levels_changed = True
+        if side == Side.SELL:
+            self.__ask_limit = MAXIMUM_ASK
+        else:
+            self.__bid_limit = 0
+
+    def __refresh_top_levels(self) -> None:
+        """Rebuild the top levels snapshot and bump the version if it has changed."""
+        ask_prices = [0] * TOP_LEVEL_COUNT
+        ask_volumes = [0] * TOP_LEVEL_COUNT
+        bid_prices = [0] * TOP_LEVEL_COUNT
+        bid_volumes = [0] * TOP_LEVEL_COUNT
+        self.top_levels(ask_prices, ask_volumes, bid_prices, bid_volumes)
+
+        top_levels = (*ask_prices, *ask_volumes, *bid_prices, *bid_volumes)
+        if top_levels != self.__top_levels:
+            self.__top_levels = top_levels
+            self.__version += 1
+
+        # Changes to levels beyond these limits cannot affect the top levels
+        self.__ask_limit = ask_prices[-1] or MAXIMUM_ASK
+        self.__bid_limit = bid_prices[-1]
+        self.__top_levels_changed = False
+
+    def __unlink(self, order: Order) -> None:
+        """Remove a resting order from the queue at its price level."""
+        i = self.__index(order.price)
+        if i >= 0:
+            self.__levels[i].remove(order)
+        else:
+            self.__outlying_levels[order.price].remove(order)
+
+    def remove_volume_from_level(self, price: int, volume: int, side: Side) -> None:
+        if price <= self.__ask_limit if side == Side.SELL else price >= self.__bid_limit:
+            self.__on_top_level_changed(side)
+
+        i = self.__index(price)
+        if i >= 0:
+            if self.__total_volumes[i] == volume:
+                self.__remove_level(price, side)
+            else:
+                self.__total_volumes[i] -= volume
+        elif self.__outlying_volumes[price] == volume:
+            self.__remove_level(price, side)
+        else:
+            self.__outlying_volumes[price] -= volume
+
+    def __remove_level(self, price: int, side: Side) -> None:
+        """Remove the price level at the given price and move the best price if necessary."""
+        i = self.__index(price)
+        if i < 0:
+            self.__remove_outlying_level(price, side)
+            return
+
+        levels = self.__levels
+        levels[i] = None
+        self.__total_volumes[i] = 0
+        if side == Side.SELL:
+            self.__ask_count -= 1
+            if self.__ask_count and i == self.__best_ask:
+                i += 1
+                while levels[i] is None:
+                    i += 1
+                self.__best_ask = i
+        else:
+            self.__bid_count -= 1
+            if self.__bid_count and i == self.__best_bid:
+                i -= 1
+                while levels[i] is None:
+                    i -= 1
+                self.__best_bid = i
+
+    def __remove_outlying_level(self, price: int, side: Side) -> None:
+        """Remove the outlying price level at the given price."""
+        del self.__outlying_levels[price]
+        del self.__outlying_volumes[price]
+        if side == Side.SELL:
+            self.__outlying_ask_prices.pop(bisect(self.__outlying_ask_prices, -price) - 1)
+        else:
+            self.__outlying_bid_prices.pop(bisect(self.__outlying_bid_prices, price) - 1)
+
+    def __make_room(self, price: int, side: Side) -> None:
+        """Re-centre, and grow if required, the price ladder so that it includes the given price.
+
+        A price too far from the touch to share a ladder of the maximum
+        capacity with it is left out of a ladder that already covers the
+        touch, so that an order far from the market never makes the ladder
+        bigger than its maximum capacity. If the ladder cannot cover both the
+        given price and the levels already in it, it is centred on the touch.
+        """
+        tick_size: int = self.tick_size
+        levels = self.__levels
+
+        best_ask = self.best_ask()
+        best_bid = self.best_bid()
+        if side == Side.SELL and (best_ask is None or price < best_ask):
+            best_ask = price
+        elif side == Side.BUY and (best_bid is None or price > best_bid):
+            best_bid = price
+        if best_ask is not None and best_bid is not None:
+            touch: int = (best_ask + best_bid) // 2
+        else:
+            touch = best_bid if best_ask is None else best_ask
+
+        half_span: int = (LADDER_MAXIMUM_CAPACITY // 2) * tick_size
+        if abs(price - touch) >= half_span and self.__index(touch - touch % tick_size) >= 0:
+            return
+
+        low_price = high_price = price
+        if self.__ask_count or self.__bid_count:
+            first = 0
+            while levels[first] is None:
+                first += 1
+            last = self.__capacity - 1
+            while levels[last] is None:
+                last -= 1
+            low_price = min(low_price, self.__base + first * tick_size)
+            high_price = max(high_price, self.__base + last * tick_size)
+
+        span: int = (high_price - low_price) // tick_size + 1
+        if 2 * span <= LADDER_MAXIMUM_CAPACITY:
+            capacity: int = self.__capacity
+            while capacity < 2 * span:
+                capacity *= 2
+            middle: int = (low_price + high_price) // 2
+        else:
+            capacity = LADDER_MAXIMUM_CAPACITY
+            middle = touch
+
+        self.__move_ladder(middle - middle % tick_size - (capacity // 2) * tick_size, capacity)
+
+    def __move_ladder(self, base: int, capacity: int) -> None:
+        """Give the price ladder a new base price and capacity.
+
+        Levels that fall outside of the new ladder become outlying levels and
+        outlying levels that fall inside it are moved into the ladder.
+        """
+        tick_size: int = self.tick_size
+        old_base: int = self.__base
+        old_levels = self.__levels
+        old_volumes = self.__total_volumes
+
+        self.__base = base
+        self.__capacity = capacity
+        self.__levels = levels = [None] * capacity
+        self.__total_volumes = total_volumes = [0] * capacity
+
+        for i, order_queue in enumerate(old_levels):
+            if order_queue is not None:
+                price: int = old_base + i * tick_size
+                j: int = self.__index(price)
+                if j >= 0:
+                    levels[j] = order_queue
+                    total_volumes[j] = old_volumes[i]
+                else:
+                    self.__add_outlying_level(price, order_queue.first.side, order_queue, old_volumes[i])
+
+        for price in tuple(self.__outlying_levels):
+            j = self.__index(price)
+            if j >= 0:
+                levels[j] = self.__outlying_levels[price]
+                total_volumes[j] = self.__outlying_volumes[price]
+                self.__remove_outlying_level(price, levels[j].first.side)
+
+        self.__ask_count = self.__bid_count = 0
+        for i, order_queue in enumerate(levels):
+            if order_queue is not None:
+                if order_queue.first.side == Side.SELL:
+                    if self.__ask_count == 0:
+                        self.__best_ask = i
+                    self.__ask_count += 1
+                else:
+                    self.__best_bid = i
+                    self.__bid_count += 1
+
+    def replace(self, now: float, order: Order, new_price: int, new_volume: int) -> None:
+        """Replace an order in this order book with one at a new price and volume.
+
+        The new volume includes any volume already filled, as for an amend.
+        If only the volume is reduced, the order is amended and keeps its
+        place in the queue; otherwise it goes to the back of the queue at
+        the new price, trading first with any orders it now matches.
+        """
+        if order.remaining_volume > 0:
+            fill_volume = order.volume - order.remaining_volume
+            if (new_price == order.price and new_volume <= order.volume) or new_volume <= fill_volume:
+                self.amend(now, order, new_volume)
+                return
+
+            old_price = order.price
+            old_remaining_volume = order.remaining_volume
+            self.__unlink(order)
+            self.remove_volume_from_level(old_price, old_remaining_volume, order.side)
+            order.price = new_price
+            order.volume = new_volume
+            order.remaining_volume = new_volume - fill_volume
+            if order.listener:
+                order.listener.on_order_replaced(now, order, old_price, old_remaining_volume)
+
+            if order.side == Side.SELL:
+                best_bid = self.best_bid()
+                if best_bid is not None and new_price <= best_bid:
+                    self.trade_ask(now, order)
+            else:
+                best_ask = self.best_ask()
+                if best_ask is not None and new_price >= best_ask:
+                    self.trade_bid(now, order)
+
+            if order.remaining_volume > 0:
+                self.__rest(order)
+
+    def top_levels(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                   bid_volumes: List[int]) -> None:
+        """Populate the supplied lists with the top levels for this book."""
+        for prices, volumes, side in ((ask_prices, ask_volumes, Side.SELL), (bid_prices, bid_volumes, Side.BUY)):
+            levels = self.__iter_levels(side)
+            for i in range(TOP_LEVEL_COUNT):
+                prices[i], volumes[i] = next(levels, (0, 0))
+
+    def top_levels_snapshot(self) -> Tuple[int, ...]:
+        """Return the ask prices, ask volumes, bid prices and bid volumes of
+        the top levels for this book as a single tuple.
+
+        The snapshot is only rebuilt when the top levels have changed, so the
+        same tuple is returned for as long as top_levels_version is unchanged.
+        """
+        if self.__top_levels_changed:
+            self.__refresh_top_levels()
+        return self.__top_levels
+
+    def top_levels_version(self) -> int:
+        """Return a number that increases each time the top levels of this book change."""
+        if self.__top_levels_changed:
+            self.__refresh_top_levels()
+        return self.__version
+
+    def trade_ask(self, now: float, order: Order) -> None:
+        """Check to see if any existing bid orders match the specified ask order."""
+        while order.remaining_volume > 0:
+            best_bid = self.best_bid()
+            if best_bid is None or best_bid < order.price:
+                break
+            if self.trade_level(now, order, best_bid) == 0:
+                self.__remove_level(best_bid, Side.BUY)
+
+    def trade_bid(self, now: float, order: Order) -> None:
+        """Check to see if any existing ask orders match the specified bid order."""
+        while order.remaining_volume > 0:
+            best_ask = self.best_ask()
+            if best_ask is None or best_ask > order.price:
+                break
+            if self.trade_level(now, order, best_ask) == 0:
+                self.__remove_level(best_ask, Side.SELL)
+
+    def trade_level(self, now: float, order: Order, best_price: int) -> int:
+        """Match the specified order with existing orders at the given level.
+
+        Return the volume left at the level.
+        """
+        self.__on_top_level_changed(Side.SELL if order.side == Side.BUY else Side.BUY)
+
+        i: int = self.__index(best_price)
+        remaining: int = order.remaining_volume
+        if i >= 0:
+            order_queue: OrderQueue = self.__levels[i]
+            total_volume: int = self.__total_volumes[i]
+        else:
+            order_queue = self.__outlying_levels[best_price]
+            total_volume = self.__outlying_volumes[best_price]
+
+        while remaining > 0 and total_volume > 0:
+            passive: Order = order_queue.first
+            volume: int = remaining if remaining < passive.remaining_volume else passive.remaining_volume
+            fee: int = round(best_price * volume * self.maker_fee)
+            total_volume -= volume
+            remaining -= volume
+            passive.remaining_volume -= volume
+            passive.total_fees += fee
+            if passive.remaining_volume == 0:
+                order_queue.remove(passive)
+            if passive.listener:
+                passive.listener.on_order_filled(now, passive, best_price, volume, fee)
+
+        if i >= 0:
+            self.__total_volumes[i] = total_volume
+        else:
+            self.__outlying_volumes[best_price] = total_volume
+        traded_volume_at_this_level: int = order.remaining_volume - remaining
+
+        if order.side == Side.BUY:
+            self.__ask_ticks[best_price] += traded_volume_at_this_level
+        else:
+            self.__bid_ticks[best_price] += traded_volume_at_this_level
+
+        fee: int = round(best_price * traded_volume_at_this_level * self.taker_fee)
+        order.remaining_volume = remaining
+        order.total_fees += fee
+        if order.listener:
+            order.listener.on_order_filled(now, order, best_price, traded_volume_at_this_level, fee)
+
+        self.__last_traded_price = best_price
+        for callback in self.trade_occurred:
+            callback(self)
+
+        return total_volume
+
+    def trade_ticks(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                    bid_volumes: List[int]) -> bool:
+        """Return True and populate the lists if there have been trades."""
+        if self.__ask_ticks or self.__bid_ticks:
+            prices = sorted(self.__ask_ticks.keys())[:TOP_LEVEL_COUNT]
+            volumes = tuple(self.__ask_ticks[p] for p in prices)
+            ask_prices[:] = prices + [0] * (TOP_LEVEL_COUNT - len(prices))
+            ask_volumes[:] = volumes + (0,) * (TOP_LEVEL_COUNT - len(volumes))
+
+            prices = sorted(self.__bid_ticks.keys(), reverse=True)[:TOP_LEVEL_COUNT]
+            volumes = tuple(self.__bid_ticks[p] for p in prices)
+            bid_prices[:] = prices + [0] * (TOP_LEVEL_COUNT - len(prices))
+            bid_volumes[:] = volumes + (0,) * (TOP_LEVEL_COUNT - len(volumes))
+
+            self.__ask_ticks.clear()
+            self.__bid_ticks.clear()
+
+            return True
+
+        return False
+
+    def try_trade(self, side: Side, limit_price: int, volume: int) -> Tuple[int, int]:
+        """Return the volume that would trade and the average price per lot for
+        the requested trade without changing the order book.
+        """
+        total_volume: int = 0
+        total_value: int = 0
+
+        for price, available in self.__iter_levels(Side.BUY if side == Side.ASK else Side.SELL):
+            if total_volume >= volume or ((price < limit_price) if side == Side.ASK else (price > limit_price)):
+                break
+            required: int = volume - total_volume
+            weight: int = required if required <= available else available
+            total_volume += weight
+            total_value += weight * price
+
+        return total_volume, total_value // total_volume if total_volume > 0 else 0
+
+
+class OrderBookFactory:
+    """A factory class for order books."""
+
+    def __init__(self, typ: str, tick_size: float):
+        """Initialise a new instance of the OrderBookFactory class."""
+        if typ not in ("list", "ladder"):
+            raise ValueError("type must be either 'list' or 'ladder'")
+        self.__typ: str = typ
+        self.__tick_size: int = int(tick_size * 100.0)  # convert tick size to cents
+
+    @property
+    def typ(self):
+        """Return the type for this order book factory."""
+        return self.__typ
+
+    def create(self, instrument: Instrument, maker_fee: float, taker_fee: float):
+        """Return a new order book for the given instrument."""
+        if self.__typ == "ladder":
+            return LadderOrderBook(instrument, maker_fee, taker_fee, self.__tick_size)
+        return OrderBook(instrument, maker_fee, taker_fee)
@@ -16,35 +16,193 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
+import errno
+import logging
 import mmap
 import os
 import struct
+import time
 
-from typing import Coroutine, Optional, Tuple, Union
+from typing import Coroutine, Dict, Optional, Tuple, Union
 
 BUFFER_SIZE = 8192
-FRAME_HEADER_SIZE = 8
+FRAME_HEADER = struct.Struct("!IdQ")  # Payload length, publication time and sequence number
+FRAME_HEADER_SIZE = 24
 FRAME_SIZE = 128
 MAXIMUM_PAYLOAD_LENGTH = FRAME_SIZE - FRAME_HEADER_SIZE
 
+# Subscribers waiting to be woken have a named pipe in the directory named after the buffer plus this suffix
+WAKEUP_DIRECTORY_SUFFIX = ".wakeup"
+
+# How often a publisher looks for new subscribers waiting to be woken, even if the directory seems unchanged
+WAKEUP_SCAN_INTERVAL = 1.0
+
+# Default number of polls before a subscriber backs off and the longest it backs off for
+BACKOFF_SPIN_COUNT = 100
+INITIAL_BACKOFF = 0.00005
+MAXIMUM_BACKOFF = 0.001
+
+
+class WaitStatistics:
+    """Wake latencies of a subscriber: how long after each frame was published the subscriber noticed it."""
+
+    def __init__(self):
+        """Initialise a new instance of the WaitStatistics class."""
+        self.count: int = 0
+        self.maximum: float = 0.0
+        self.total: float = 0.0
+
+    def __str__(self) -> str:
+        return "wakes=%d mean_latency=%.1fus max_latency=%.1fus" % (self.count, self.mean() * 1e6,
+                                                                      self.maximum * 1e6)
+
+    def mean(self) -> float:
+        """Return the mean wake latency."""
+        return self.total / self.count if self.count else 0.0
+
+    def record(self, latency: float) -> None:
+        """Record the wake latency of a frame."""
+        self.count += 1
+        self.total += latency
+        if latency > self.maximum:
+            self.maximum = latency
+
+
+class SpinWait:
+    """Wait for a frame by checking for it on every iteration of the event loop.
+
+    This gives the lowest wake latency, but keeps a processor core busy even
+    when nothing is being published.
+    """
+
+    def __init__(self):
+        """Initialise a new instance of the SpinWait class."""
+        self.statistics: WaitStatistics = WaitStatistics()
+
+    def close(self) -> None:
+        """Release any resources held by this wait strategy."""
+
+    async def wait(self, buffer: Union[mmap.mmap, memoryview], pos: int) -> None:
+        """Return once the frame at the given position has been published."""
+        while buffer[pos] == 0:
+            await asyncio.sleep(0.0)
+
+
+class BackoffWait(SpinWait):
+    """Wait for a frame by spinning for a while and then checking less and less often.
+
+    Once the given number of checks has found nothing, the interval between
+    checks doubles each time, from the initial backoff up to the maximum
+    backoff, which bounds the wake latency while the market is quiet.
+    """
+
+    def __init__(self, spin_count: int = BACKOFF_SPIN_COUNT, initial_backoff: float = INITIAL_BACKOFF,
+                 maximum_backoff: float = MAXIMUM_BACKOFF):
+        """Initialise a new instance of the BackoffWait class."""
+        super().__init__()
+        self.initial_backoff: float = min(initial_backoff, maximum_backoff)
+        self.maximum_backoff: float = maximum_backoff
+        self.spin_count: int = spin_count
+
+    async def wait(self, buffer: Union[mmap.mmap, memoryview], pos: int) -> None:
+        """Return once the frame at the given position has been published."""
+        spins: int = 0
+        backoff: float = self.initial_backoff
+        while buffer[pos] == 0:
+            if spins < self.spin_count:
+                spins += 1
+                await asyncio.sleep(0.0)
+            else:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2.0, self.maximum_backoff)
+
+
+class WakeupWait(SpinWait):
+    """Wait for a frame by sleeping until the publisher writes to a named pipe.
+
+    The pipe is created in the given directory, where the publisher finds it
+    and writes a byte to it after publishing each frame. Waiting costs no
+    processor time at all, but each wake up takes a few system calls.
+    """
+
+    def __init__(self, directory: str):
+        """Initialise a new instance of the WakeupWait class."""
+        super().__init__()
+        os.makedirs(directory, exist_ok=True)
+        self.path: str = os.path.join(directory, "%d-%d" % (os.getpid(), id(self)))
+        os.mkfifo(self.path)
+
+        self.__event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__fileno: int = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        # Holding the write end open stops the pipe reading as closed whenever the publisher closes its end
+        self.__keep_open_fileno: int = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        self.__waiter: Optional[asyncio.Future] = None
+
+    def close(self) -> None:
+        """Stop listening for wake ups and remove the named pipe."""
+        if self.__fileno >= 0:
+            if self.__event_loop is not None and not self.__event_loop.is_closed():
+                self.__event_loop.remove_reader(self.__fileno)
+            os.close(self.__fileno)
+            os.close(self.__keep_open_fileno)
+            self.__fileno = self.__keep_open_fileno = -1
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __on_readable(self) -> None:
+        """Callback when the publisher has written to the pipe."""
+        try:
+            while os.read(self.__fileno, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        if self.__waiter is not None and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
+    async def wait(self, buffer: Union[mmap.mmap, memoryview], pos: int) -> None:
+        """Return once the frame at the given position has been published."""
+        if self.__event_loop is None:
+            self.__event_loop = asyncio.get_running_loop()
+            self.__event_loop.add_reader(self.__fileno, self.__on_readable)
+        while buffer[pos] == 0:
+            self.__waiter = self.__event_loop.create_future()
+            await self.__waiter
+        self.__waiter = None
+
 
 class Publisher(asyncio.WriteTransport):
     """Publisher side of a datagram transport based on shared memory.
 
     Transport is achieved through the use of memory mapped files or shared
     memory blocks. There must be an interval between writes to permit
-    subscribers to read the data before it is overwritten.
+    subscribers to read the data before it is overwritten. Each frame
+    carries a sequence number, one more than that of the frame before it,
+    so that a subscriber that falls behind can tell how much it has missed.
+    If a wake up directory is given, every subscriber with a named pipe in
+    it is woken after each write. Until a subscriber has been found there,
+    the directory is only looked at once every scan interval, so publishing
+    costs no system calls when no subscriber wants to be woken.
     """
-    __slots__ = ("__pack_into", "_buffer", "_closed", "_pos")
+    __slots__ = ("__last_scan", "__pack_into", "__sequence", "__wakeup_directory", "__wakeup_filenos",
+                 "__wakeup_mtime", "__wakeup_seen", "_buffer", "_closed", "_pos")
 
-    def __init__(self, buffer: Union[mmap.mmap, memoryview], protocol: asyncio.BaseProtocol):
+    def __init__(self, buffer: Union[mmap.mmap, memoryview], protocol: asyncio.BaseProtocol,
+                 wakeup_directory: Optional[str] = None):
         super().__init__()
         self._buffer: Optional[Union[mmap.mmap, memoryview]] = buffer
         self._closed: bool = False
         self._pos: int = 0
         asyncio.get_event_loop().call_soon(protocol.connection_made, self)
 
-        self.__pack_into = struct.Struct("!I").pack_into
+        self.__last_scan: float = 0.0
+        self.__pack_into = FRAME_HEADER.pack_into
+        self.__sequence: int = 0
+        self.__wakeup_directory: Optional[str] = wakeup_directory
+        self.__wakeup_filenos: Dict[str, int] = dict()
+        self.__wakeup_mtime: int = 0
+        self.__wakeup_seen: bool = False
 
     def __del__(self):
         if not self._closed:
@@ -61,6 +219,64 @@ class Publisher(asyncio.WriteTransport):
     def close(self) -> None:
         """Close the publisher."""
         self._closed = True
+        for fileno in self.__wakeup_filenos.values():
+            os.close(fileno)
+        self.__wakeup_filenos.clear()
+
+    def __scan_wakeup_directory(self) -> None:
+        """Open the named pipe of each new subscriber in the wake up directory."""
+        try:
+            names = set(os.listdir(self.__wakeup_directory))
+        except OSError:
+            return
+        if names:
+            self.__wakeup_seen = True
+        for name in tuple(self.__wakeup_filenos):
+            if name not in names:
+                os.close(self.__wakeup_filenos.pop(name))
+        for name in names.difference(self.__wakeup_filenos):
+            path = os.path.join(self.__wakeup_directory, name)
+            try:
+                self.__wakeup_filenos[name] = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    # Nobody is reading the pipe, so its subscriber has gone
+                    self.__remove_wakeup_pipe(path)
+
+    def __remove_wakeup_pipe(self, path: str) -> None:
+        """Remove the named pipe of a subscriber that has gone."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __wake_subscribers(self) -> None:
+        """Write to the named pipe of every subscriber waiting to be woken."""
+        now: float = time.monotonic()
+        rescan: bool = now - self.__last_scan >= WAKEUP_SCAN_INTERVAL
+        if self.__wakeup_seen:
+            # Checking whether the directory has changed lets new subscribers be found straight away
+            try:
+                mtime: int = os.stat(self.__wakeup_directory).st_mtime_ns
+            except OSError:
+                # The directory has gone, so go back to looking for it once every scan interval
+                self.__wakeup_seen = False
+            else:
+                rescan = rescan or mtime != self.__wakeup_mtime
+                self.__wakeup_mtime = mtime
+        if rescan:
+            self.__last_scan = now
+            self.__scan_wakeup_directory()
+
+        for name, fileno in tuple(self.__wakeup_filenos.items()):
+            try:
+                os.write(fileno, b"\x01")
+            except BlockingIOError:
+                # The pipe is full, so the subscriber has wake ups it hasn't read yet
+                pass
+            except OSError:
+                os.close(self.__wakeup_filenos.pop(name))
+                self.__remove_wakeup_pipe(os.path.join(self.__wakeup_directory, name))
 
     def write(self, data: Union[bytearray, bytes, memoryview]) -> None:
         """Publish the provided data."""
@@ -70,23 +286,29 @@ class Publisher(asyncio.WriteTransport):
         if self._closed:
             return
 
-        # Each frame contains a spinlock (4 bytes), payload length (4 bytes)
-        # and payload (up to 120 bytes).
+        # Each frame contains a spinlock (4 bytes), payload length (4 bytes),
+        # publication time (8 bytes), sequence number (8 bytes) and payload
+        # (up to 104 bytes).
         pos = self._pos
-        self.__pack_into(self._buffer, pos + 4, len(data))
+        self.__pack_into(self._buffer, pos + 4, len(data), time.monotonic(), self.__sequence)
+        self.__sequence += 1
         start: int = pos + FRAME_HEADER_SIZE
         self._buffer[start:start + len(data)] = bytes(data)
         self._pos = (pos + FRAME_SIZE) & (BUFFER_SIZE - 1)
         self._buffer[self._pos] = 0
         self._buffer[pos] = 1
 
+        if self.__wakeup_directory:
+            self.__wake_subscribers()
+
 
 class MmapPublisher(Publisher):
     """A publisher based on a memory mapped file."""
     __slots__ = ("__fileno",)
 
-    def __init__(self, fileno: int, mm: mmap.mmap, protocol: asyncio.BaseProtocol):
-        super().__init__(mm, protocol)
+    def __init__(self, fileno: int, mm: mmap.mmap, protocol: asyncio.BaseProtocol,
+                 wakeup_directory: Optional[str] = None):
+        super().__init__(mm, protocol, wakeup_directory)
         self.__fileno: Optional[int] = fileno
 
     def close(self) -> None:
@@ -105,16 +327,24 @@ class Subscriber(asyncio.DatagramTransport):
 
     Transport is achieved through the use of memory mapped files or shared
     memory blocks. An interval between writes gives subscribers time to read
-    the data before it is overwritten and the subscriber polls the shared
+    the data before it is overwritten. How the subscriber waits for the next
+    frame is up to its wait strategy, which by default polls the shared
     memory in order to pick up changes as soon as possible.
+
+    A subscriber that falls so far behind that the publisher laps it (or
+    overwrites a frame while it is being read) skips ahead to the newest
+    frame and tells its protocol how many frames were lost by calling the
+    protocol's datagrams_lost method, if it has one.
     """
-    __slots__ = ("_task", "_closed", "_protocol")
+    __slots__ = ("_task", "_closed", "_protocol", "frames_lost", "wait_strategy")
 
     def __init__(self, buffer: Union[mmap.mmap, memoryview], from_addr: Tuple[str, int],
-                 protocol: asyncio.DatagramProtocol):
+                 protocol: asyncio.DatagramProtocol, wait_strategy: Optional[SpinWait] = None):
         super().__init__()
         self._closed: bool = False
         self._protocol: asyncio.DatagramProtocol = protocol
+        self.frames_lost: int = 0
+        self.wait_strategy: SpinWait = wait_strategy or SpinWait()
 
         coro: Coroutine = self._subscribe_worker(buffer, from_addr, protocol)
         self._task: asyncio.Task = asyncio.ensure_future(coro)
@@ -123,22 +353,69 @@ class Subscriber(asyncio.DatagramTransport):
                                 from_addr: Tuple[str, int],
                                 protocol: asyncio.DatagramProtocol) -> None:
         mask: int = BUFFER_SIZE - 1
-        unpack_from = struct.Struct("!I").unpack_from
+        unpack_from = FRAME_HEADER.unpack_from
+        statistics: WaitStatistics = self.wait_strategy.statistics
+        wait = self.wait_strategy.wait
+        datagrams_lost = getattr(protocol, "datagrams_lost", None)
         protocol.connection_made(self)
 
         try:
             pos: int = 0
+            expected: Optional[int] = None
             while not self._closed:
-                while buffer[pos] == 0:
-                    await asyncio.sleep(0.0)
-                length, = unpack_from(buffer, pos + 4)
+                woken: bool = buffer[pos] == 0
+                if woken:
+                    await wait(buffer, pos)
+                length, published, sequence = unpack_from(buffer, pos + 4)
+
+                if sequence != expected:
+                    if expected is None and sequence == 0:
+                        # Subscribed before anything was published
+                        expected = 0
+                    else:
+                        # Lapped by the publisher (or subscribed late), so skip ahead to the newest frame
+                        pos = self.__find_newest_frame(buffer)
+                        length, published, sequence = unpack_from(buffer, pos + 4)
+                        if expected is not None and sequence > expected:
+                            self.frames_lost += sequence - expected
+                            if datagrams_lost is not None:
+                                datagrams_lost(sequence - expected)
+                        woken = False
+
                 start: int = pos + FRAME_HEADER_SIZE
-                protocol.datagram_received(buffer[start:start + length], from_addr)
+                data = buffer[start:start + length]
+                if unpack_from(buffer, pos + 4)[2] != sequence:
+                    # Overwritten while it was being copied, so skip ahead on the next pass
+                    expected = sequence
+                    continue
+
+                if woken:
+                    statistics.record(time.monotonic() - published)
+                protocol.datagram_received(data, from_addr)
+                expected = sequence + 1
                 pos = (pos + FRAME_SIZE) & mask
         except asyncio.CancelledError:
             self._protocol.connection_lost(None)
         except Exception as e:
             self._protocol.connection_lost(e)
+        finally:
+            logging.getLogger("SUBSCRIBER").info("subscriber closed: wait_strategy=%s %s frames_lost=%d",
+                                                 type(self.wait_strategy).__name__, statistics, self.frames_lost)
+            self.wait_strategy.close()
+
+    @staticmethod
+    def __find_newest_frame(buffer: Union[mmap.mmap, memoryview]) -> int:
+        """Return the position of the published frame with the highest sequence number."""
+        unpack_from = FRAME_HEADER.unpack_from
+        newest_pos: int = 0
+        newest_sequence: int = -1
+        for pos in range(0, BUFFER_SIZE, FRAME_SIZE):
+            if buffer[pos] != 0:
+                sequence: int = unpack_from(buffer, pos + 4)[2]
+                if sequence > newest_sequence:
+                    newest_pos = pos
+                    newest_sequence = sequence
+        return newest_pos
 
     def abort(self) -> None:
         """Close the transport immediately."""
@@ -169,8 +446,8 @@ class MmapSubscriber(Subscriber):
     __slots__ = ("__fileno", "__mmap")
 
     def __init__(self, fileno: int, buffer: mmap.mmap, from_addr: Tuple[str, int],
-                 protocol: Optional[asyncio.DatagramProtocol] = None):
-        super().__init__(buffer, from_addr, protocol)
+                 protocol: Optional[asyncio.DatagramProtocol] = None, wait_strategy: Optional[SpinWait] = None):
+        super().__init__(buffer, from_addr, protocol, wait_strategy)
         self.__fileno: Optional[int] = fileno
         self.__mmap: Optional[mmap.mmap] = buffer
         self._task.add_done_callback(lambda _: self.__close_mmap())
@@ -188,12 +465,20 @@ class MmapSubscriber(Subscriber):
 
 
 class PublisherFactory:
-    """A factory class for Publisher instances."""
-    def __init__(self, typ: str, name: str):
+    """A factory class for Publisher instances.
+
+    If wakeup is True, publishers wake subscribers using the "wakeup" wait
+    strategy after each write. Otherwise publishing costs nothing extra,
+    and only the "spin" and "backoff" wait strategies can be used.
+    """
+    def __init__(self, typ: str, name: str, wakeup: bool = False):
         if typ not in ("mmap", "shm"):
             raise ValueError("type must be either 'mmap' or 'shm'")
+        if wakeup and not hasattr(os, "mkfifo"):
+            raise ValueError("waking up subscribers is not supported on this platform")
         self.__typ: str = typ
         self.__name: str = name
+        self.__wakeup: bool = wakeup
 
     @property
     def name(self):
@@ -211,17 +496,29 @@ class PublisherFactory:
             fileno = os.open(self.__name, os.O_CREAT | os.O_RDWR)
             os.write(fileno, b"\x00" * BUFFER_SIZE)
             buffer = mmap.mmap(fileno, BUFFER_SIZE, access=mmap.ACCESS_WRITE)
-            return MmapPublisher(fileno, buffer, protocol)
+            wakeup_directory = self.__name + WAKEUP_DIRECTORY_SUFFIX if self.__wakeup else None
+            return MmapPublisher(fileno, buffer, protocol, wakeup_directory)
         raise RuntimeError("PublisherFactory type was not 'mmap'")
 
 
 class SubscriberFactory:
-    """A factory class for Subscribers."""
-    def __init__(self, typ: str, name: str):
+    """A factory class for Subscribers.
+
+    The wait strategy is "spin", "backoff" (spinning before backing off for
+    up to the maximum backoff) or "wakeup" (sleeping until the publisher
+    writes to a named pipe).
+    """
+    def __init__(self, typ: str, name: str, wait_strategy: str = "spin", maximum_backoff: float = MAXIMUM_BACKOFF):
         if typ not in ("mmap", "shm"):
             raise ValueError("type must be either 'mmap' or 'shm'")
+        if wait_strategy not in ("spin", "backoff", "wakeup"):
+            raise ValueError("wait strategy must be either 'spin', 'backoff' or 'wakeup'")
+        if wait_strategy == "wakeup" and not hasattr(os, "mkfifo"):
+            raise ValueError("the 'wakeup' wait strategy is not supported on this platform")
+        self.__maximum_backoff: float = maximum_backoff
         self.__typ: str = typ
         self.__name: str = name
+        self.__wait_strategy: str = wait_strategy
 
     @property
     def name(self):
@@ -233,10 +530,18 @@ class SubscriberFactory:
         """Return the type for this subscriber factory."""
         return self.__typ
 
+    def __create_wait_strategy(self) -> SpinWait:
+        """Return a new wait strategy for a subscriber."""
+        if self.__wait_strategy == "backoff":
+            return BackoffWait(maximum_backoff=self.__maximum_backoff)
+        if self.__wait_strategy == "wakeup":
+            return WakeupWait(self.__name + WAKEUP_DIRECTORY_SUFFIX)
+        return SpinWait()
+
     def create(self, protocol: Optional[asyncio.DatagramProtocol] = None) -> Subscriber:
         """Return a new Subscriber instance."""
         if self.__typ == "mmap":
             fileno = os.open(self.__name, os.O_RDONLY)
             mm = mmap.mmap(fileno, BUFFER_SIZE, access=mmap.ACCESS_READ)
-            return MmapSubscriber(fileno, mm, (self.__name, fileno), protocol)
+            return MmapSubscriber(fileno, mm, (self.__name, fileno), protocol, self.__create_wait_strategy())
         raise RuntimeError("SubscriberFactory type was not 'mmap'")
@@ -0,0 +1,151 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import sys
+import sysconfig
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .market_data_cache import MarketDataCache
+
+# Cache entries are named <key>.json
+ENTRY_PATTERN = re.compile(r"^[0-9a-f]{64}\.json$")
+
+# Elements of the exchange configuration that do not affect the result of an in-process match
+IGNORED_ENGINE_KEYS = ("MarketDataChunkSize", "MatchEventsFile", "ScoreBoardFile")
+IGNORED_SECTIONS = ("Execution", "Hud", "Information", "MarketDataCache")
+
+# The exchange's own source files, which also determine the result of a match
+ENGINE_SOURCES = tuple(str(p) for p in sorted(pathlib.Path(__file__).parent.glob("*.py")))
+
+# Directories of the standard library and installed packages, whose modules are not hashed
+INSTALLED_PATHS = tuple(str(pathlib.Path(sysconfig.get_path(name)).resolve())
+                        for name in ("stdlib", "platstdlib", "purelib", "platlib"))
+
+
+class MatchResultCache:
+    """A cache of match results.
+
+    Entries are keyed by a hash of everything that determines the result of
+    a match: the source and configuration of each auto-trader, the source of
+    any modules they import from outside the standard library and installed
+    packages, the exchange's own source, the exchange configuration
+    (including the seed for the timers' jitter) and the contents of the
+    market data file. The least recently used entries are
+    evicted whenever the total size of the cache exceeds the maximum size.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        """Initialise a new instance of the MatchResultCache class."""
+        self.directory: pathlib.Path = pathlib.Path(directory)
+        self.logger: logging.Logger = logging.getLogger("RESULT_CACHE")
+        self.max_size: int = max_size
+
+    def evict(self, keep: pathlib.Path) -> None:
+        """Remove the least recently used entries, except for the one to keep, while the cache is too big."""
+        entries: List[Tuple[float, int, str]] = list()
+        for e in os.scandir(self.directory):
+            if ENTRY_PATTERN.match(e.name) and e.path != str(keep):
+                try:
+                    st = e.stat()
+                except OSError:
+                    # Another process may have evicted it already
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+
+        total_size: int = keep.stat().st_size + sum(e[1] for e in entries)
+        for mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning("failed to evict cache entry: filename='%s' error='%s'", path, e)
+            else:
+                self.logger.info("evicted cache entry: filename='%s'", path)
+                total_size -= size
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for the given key, or None if there isn't one."""
+        entry = self.directory / ("%s.json" % key)
+        try:
+            with entry.open() as f:
+                result = json.load(f)
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        self.logger.info("found cache entry: key=%s", key)
+        return result
+
+    @staticmethod
+    def loaded_sources(modules_before: Sequence[str]) -> List[str]:
+        """Return the source files of the modules loaded since the given modules were.
+
+        Modules of the standard library and of installed packages, and those
+        without a file, such as built-in modules, are left out.
+        """
+        before = set(modules_before)
+        sources: List[str] = list()
+        for name, module in list(sys.modules.items()):
+            filename = getattr(module, "__file__", None)
+            if name in before or not filename:
+                continue
+            if not str(pathlib.Path(filename).resolve()).startswith(INSTALLED_PATHS):
+                sources.append(filename)
+        return sources
+
+    @staticmethod
+    def make_key(exchange_config: Dict[str, Any], auto_traders: Sequence[Tuple[str, Dict[str, Any]]],
+                 sources: Sequence[str] = ()) -> str:
+        """Return the cache key for a match.
+
+        The auto-traders are given as pairs of the filename of an auto-trader's
+        source and its configuration. Any other source files they depend on,
+        such as those of the modules they import, are given separately.
+        """
+        sha = hashlib.sha256()
+        for filename, auto_trader_config in auto_traders:
+            sha.update(MarketDataCache.hash_file(pathlib.Path(filename)).encode())
+            sha.update(json.dumps(auto_trader_config, sort_keys=True).encode())
+
+        # Sort by content so that the key doesn't depend on the order or location of the files
+        for digest in sorted(MarketDataCache.hash_file(pathlib.Path(f)) for f in {*sources, *ENGINE_SOURCES}):
+            sha.update(digest.encode())
+
+        config = {k: v for k, v in exchange_config.items() if k not in IGNORED_SECTIONS}
+        engine = config["Engine"] = {k: v for k, v in config["Engine"].items() if k not in IGNORED_ENGINE_KEYS}
+        sha.update(json.dumps(config, sort_keys=True).encode())
+        sha.update(MarketDataCache.hash_file(pathlib.Path(engine["MarketDataFile"])).encode())
+        return sha.hexdigest()
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store the result for the given key."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry = self.directory / ("%s.json" % key)
+        temporary = entry.with_name("%s.%d.tmp" % (entry.name, os.getpid()))
+        with temporary.open("w") as f:
+            json.dump(result, f)
+        os.replace(temporary, entry)
+        self.logger.info("added cache entry: key=%s", key)
+        self.evict(entry)
@@ -0,0 +1,407 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import enum
+import errno
+import logging
+import mmap
+import os
+import struct
+
+from typing import Callable, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .competitor import CompetitorManager
+from .execution import ExecutionConnection
+from .limiter import FrequencyLimiterFactory
+from .pubsub import BUFFER_SIZE, FRAME_SIZE
+from .types import IController
+
+# Each ring file holds a control block, the request ring and then the response ring
+CONTROL_BLOCK_SIZE = 64
+CLIENT_STATE = 0
+SERVER_STATE = 1
+REQUEST_RING = CONTROL_BLOCK_SIZE
+RESPONSE_RING = CONTROL_BLOCK_SIZE + BUFFER_SIZE
+RING_FILE_SIZE = CONTROL_BLOCK_SIZE + 2 * BUFFER_SIZE
+
+# Ring frames are the same size as the information channel's, but with no publication time
+RING_FRAME_HEADER_SIZE = 8
+RING_MAXIMUM_PAYLOAD_LENGTH = FRAME_SIZE - RING_FRAME_HEADER_SIZE
+
+# The exchange holds a lock on this file for as long as it is running
+EXCHANGE_LOCK_NAME = "exchange.lock"
+RING_FILE_SUFFIX = ".ring"
+
+# How often each end checks that the other end is still running
+LIVENESS_CHECK_INTERVAL = 1.0
+
+
+class RingState(enum.IntEnum):
+    IDLE = 0
+    LISTENING = 1
+    CONNECTED = 2
+    CLOSED = 3
+
+
+class RingTransport(asyncio.Transport):
+    """One end of a stream transport based on a pair of rings in shared memory.
+
+    Each ring has a single producer and a single consumer. Data is written in
+    frames like the information channel's: a flag, a length and up to 120
+    bytes of payload. The producer sets a frame's flag once the frame
+    has been filled and the consumer clears it once the frame has been read,
+    so, unlike the information channel, nothing is overwritten before it has
+    been read: data that does not fit is held back until the consumer has
+    caught up. Nothing tells either end that there is data waiting, so the
+    poll method must be called regularly.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, buffer: mmap.mmap, incoming: int, outgoing: int,
+                 state: int, peer_state: int, protocol: asyncio.BufferedProtocol, peer_name: Tuple[str, int]):
+        """Initialise a new instance of the RingTransport class."""
+        super().__init__({"peername": peer_name})
+        self.__buffer: mmap.mmap = buffer
+        self.__closed: bool = False
+        self.__closing: bool = False
+        self.__event_loop: asyncio.AbstractEventLoop = loop
+        self.__incoming: int = incoming
+        self.__incoming_position: int = 0
+        self.__outgoing: int = outgoing
+        self.__outgoing_position: int = 0
+        self.__pack_into = struct.Struct("!I").pack_into
+        self.__peer_state: int = peer_state
+        self.__pending: bytearray = bytearray()
+        self.__protocol: asyncio.BufferedProtocol = protocol
+        self.__state: int = state
+        self.__unpack_from = struct.Struct("!I").unpack_from
+
+        buffer[state] = RingState.CONNECTED
+
+    @property
+    def closed(self) -> bool:
+        """Return True if this end of the transport has finished with the shared memory."""
+        return self.__closed
+
+    def abort(self) -> None:
+        """Close the transport immediately, discarding any data held back."""
+        self.__pending.clear()
+        self.__closing = True
+        self.__finish()
+
+    def can_write_eof(self) -> bool:
+        """Return False. Ring transports don't support writing EOF."""
+        return False
+
+    def close(self) -> None:
+        """Close the transport once any data held back has been sent."""
+        if not self.__closing:
+            self.__closing = True
+            self.__push()
+            if not self.__pending:
+                self.__finish()
+
+    def __finish(self) -> None:
+        """Tell the other end that this end is closed and notify the protocol."""
+        if not self.__closed:
+            self.__closed = True
+            self.__buffer[self.__state] = RingState.CLOSED
+            self.__event_loop.call_soon(self.__protocol.connection_lost, None)
+
+    def get_protocol(self) -> asyncio.BaseProtocol:
+        """Return the protocol at this end of the transport."""
+        return self.__protocol
+
+    def is_closing(self) -> bool:
+        """Return True if the transport is closing or is closed."""
+        return self.__closing
+
+    def poll(self) -> bool:
+        """Pass any data received to the protocol and send any data held back.
+
+        Return True if any data was received or sent.
+        """
+        if self.__closed:
+            return False
+
+        busy: bool = False
+        if self.__pending:
+            busy = self.__push()
+            if self.__closing and not self.__pending:
+                self.__finish()
+                return busy
+
+        buffer: mmap.mmap = self.__buffer
+        protocol: asyncio.BufferedProtocol = self.__protocol
+        position: int = self.__incoming_position
+        frame: int = self.__incoming + position
+        while buffer[frame] and not self.__closing:
+            length, = self.__unpack_from(buffer, frame + 4)
+            start: int = frame + RING_FRAME_HEADER_SIZE
+            while length:
+                view = protocol.get_buffer(length)
+                count: int = min(len(view), length)
+                view[:count] = buffer[start:start + count]
+                start += count
+                length -= count
+                protocol.buffer_updated(count)
+            buffer[frame] = 0
+            busy = True
+            position = (position + FRAME_SIZE) & (BUFFER_SIZE - 1)
+            frame = self.__incoming + position
+        self.__incoming_position = position
+
+        if not buffer[frame] and buffer[self.__peer_state] == RingState.CLOSED:
+            self.abort()
+
+        return busy
+
+    def __push(self) -> bool:
+        """Copy as much of the data held back as will fit into the outgoing ring, returning True if any did."""
+        buffer: mmap.mmap = self.__buffer
+        pending: bytearray = self.__pending
+        position: int = self.__outgoing_position
+        sent: int = 0
+        while sent < len(pending):
+            frame: int = self.__outgoing + position
+            if buffer[frame]:
+                break
+            length: int = min(len(pending) - sent, RING_MAXIMUM_PAYLOAD_LENGTH)
+            self.__pack_into(buffer, frame + 4, length)
+            start: int = frame + RING_FRAME_HEADER_SIZE
+            buffer[start:start + length] = pending[sent:sent + length]
+            buffer[frame] = 1
+            sent += length
+            position = (position + FRAME_SIZE) & (BUFFER_SIZE - 1)
+        self.__outgoing_position = position
+        del pending[:sent]
+        return sent != 0
+
+    def write(self, data: Union[bytearray, bytes, memoryview]) -> None:
+        """Send the provided data to the other end."""
+        if self.__closing:
+            return
+        self.__pending += data
+        self.__push()
+
+
+class RingSlot:
+    """A ring file that one auto-trader at a time may connect through."""
+
+    def __init__(self, filename: str, fileno: int, buffer: mmap.mmap):
+        """Initialise a new instance of the RingSlot class."""
+        self.buffer: mmap.mmap = buffer
+        self.connection: Optional[ExecutionConnection] = None
+        self.filename: str = filename
+        self.fileno: int = fileno
+        self.transport: Optional[RingTransport] = None
+
+    def reset(self) -> None:
+        """Clear the rings and listen for a new auto-trader."""
+        self.connection = self.transport = None
+        self.buffer[:] = bytes(RING_FILE_SIZE)
+        self.buffer[SERVER_STATE] = RingState.LISTENING
+
+
+class RingExecutionServer:
+    """An execution server for auto-traders connecting through rings in shared memory.
+
+    The server creates one ring file in the given directory for each
+    auto-trader that may take part in the match. An auto-trader connects by
+    locking a ring file that is listening, after which it logs in as usual.
+    The server polls the rings continuously, so this transport gives the
+    lowest latency at the cost of a processor core.
+    """
+
+    def __init__(self, path: str, slot_count: int, competitor_manager: CompetitorManager,
+                 limiter_factory: FrequencyLimiterFactory):
+        """Initialise a new instance of the RingExecutionServer class."""
+        self.controller: Optional[IController] = None
+        self.path: str = path
+        self.slot_count: int = slot_count
+
+        self.__closed: bool = False
+        self.__competitor_manager: CompetitorManager = competitor_manager
+        self.__limiter_factory: FrequencyLimiterFactory = limiter_factory
+        self.__liveness_handle: Optional[asyncio.TimerHandle] = None
+        self.__lock_fileno: Optional[int] = None
+        self.__logger = logging.getLogger("EXECUTION")
+        self.__slots: List[RingSlot] = list()
+        self.__task: Optional[asyncio.Task] = None
+
+    def __accept(self, index: int, slot: RingSlot) -> None:
+        """Connect an auto-trader that has locked the given slot."""
+        slot.connection = ExecutionConnection(self.__competitor_manager, self.__limiter_factory.create(),
+                                              self.controller)
+        slot.transport = RingTransport(asyncio.get_running_loop(), slot.buffer, REQUEST_RING, RESPONSE_RING,
+                                       SERVER_STATE, CLIENT_STATE, slot.connection, (self.path, index))
+        slot.connection.connection_made(slot.transport)
+
+    def __check_liveness(self) -> None:
+        """Close rings whose auto-trader has gone and listen on them again."""
+        for slot in self.__slots:
+            if slot.transport is None and slot.buffer[SERVER_STATE] == RingState.LISTENING:
+                continue
+            try:
+                fcntl.flock(slot.fileno, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # The auto-trader still holds the lock
+                continue
+            if slot.transport is not None and not slot.transport.closed:
+                self.__logger.info("auto-trader has gone: ring=%s", slot.filename)
+                slot.transport.abort()
+            slot.reset()
+            fcntl.flock(slot.fileno, fcntl.LOCK_UN)
+
+        self.__liveness_handle = asyncio.get_running_loop().call_later(LIVENESS_CHECK_INTERVAL,
+                                                                       self.__check_liveness)
+
+    def close(self) -> None:
+        """Close the server and its connections and release the ring files.
+
+        Connections through the rings cannot outlive the task that polls
+        them, so unlike the other execution servers, this one closes any
+        existing connections too.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        if self.__liveness_handle is not None:
+            self.__liveness_handle.cancel()
+            self.__liveness_handle = None
+
+        for slot in self.__slots:
+            if slot.transport is not None:
+                slot.transport.abort()
+            slot.buffer[SERVER_STATE] = RingState.CLOSED
+            slot.buffer.close()
+            os.close(slot.fileno)
+        self.__slots.clear()
+
+        # Releasing the lock tells any auto-trader still polling that the exchange has gone
+        if self.__lock_fileno is not None:
+            os.close(self.__lock_fileno)
+            self.__lock_fileno = None
+
+    async def __poll_worker(self) -> None:
+        """Poll every ring for as long as the server is running."""
+        while True:
+            busy: bool = False
+            for index, slot in enumerate(self.__slots):
+                if slot.transport is not None:
+                    busy = slot.transport.poll() or busy
+                elif (slot.buffer[CLIENT_STATE] == RingState.CONNECTED
+                      and slot.buffer[SERVER_STATE] == RingState.LISTENING):
+                    self.__accept(index, slot)
+            if not busy:
+                # Let an auto-trader sharing this processor run straight away
+                os.sched_yield()
+            await asyncio.sleep(0.0)
+
+    async def start(self) -> None:
+        """Create the ring files and start polling them."""
+        self.__logger.info("starting ring execution server: path=%s slots=%d", self.path, self.slot_count)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.__lock_fileno = os.open(os.path.join(self.path, EXCHANGE_LOCK_NAME), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(self.__lock_fileno, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise Exception("another exchange is using the execution rings in %s" % self.path)
+
+        for index in range(self.slot_count):
+            filename = os.path.join(self.path, "%d%s" % (index, RING_FILE_SUFFIX))
+            # Replace rather than reuse any old file, which an auto-trader may still have open
+            if os.path.exists(filename):
+                os.remove(filename)
+            fileno = os.open(filename, os.O_CREAT | os.O_RDWR)
+            os.write(fileno, bytes(RING_FILE_SIZE))
+            slot = RingSlot(filename, fileno, mmap.mmap(fileno, RING_FILE_SIZE, access=mmap.ACCESS_WRITE))
+            slot.reset()
+            self.__slots.append(slot)
+
+        loop = asyncio.get_running_loop()
+        self.__task = loop.create_task(self.__poll_worker())
+        self.__liveness_handle = loop.call_later(LIVENESS_CHECK_INTERVAL, self.__check_liveness)
+
+
+async def __client_worker(transport: RingTransport, fileno: int, buffer: mmap.mmap, lock_fileno: int) -> None:
+    """Poll the rings until the transport is closed, closing it if the exchange goes away."""
+    loop = asyncio.get_running_loop()
+    next_check: float = loop.time() + LIVENESS_CHECK_INTERVAL
+    try:
+        while not transport.closed:
+            if not transport.poll():
+                # Let the exchange, if it shares this processor, run straight away
+                os.sched_yield()
+            if loop.time() >= next_check:
+                next_check += LIVENESS_CHECK_INTERVAL
+                try:
+                    fcntl.flock(lock_fileno, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except OSError:
+                    pass
+                else:
+                    # Nobody holds the exchange's lock, so it has gone
+                    transport.abort()
+            await asyncio.sleep(0.0)
+    finally:
+        buffer.close()
+        os.close(fileno)
+        os.close(lock_fileno)
+
+
+async def create_ring_connection(protocol_factory: Callable[[], asyncio.BufferedProtocol],
+                                 path: str) -> Tuple[RingTransport, asyncio.BufferedProtocol]:
+    """Connect to an exchange through the first free ring file in the given directory."""
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "shared memory rings are not supported on this platform")
+
+    lock_fileno = os.open(os.path.join(path, EXCHANGE_LOCK_NAME), os.O_RDONLY)
+    names = sorted((n for n in os.listdir(path) if n.endswith(RING_FILE_SUFFIX)),
+                   key=lambda n: int(n[:-len(RING_FILE_SUFFIX)]))
+    for name in names:
+        fileno = os.open(os.path.join(path, name), os.O_RDWR)
+        try:
+            fcntl.flock(fileno, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            buffer = mmap.mmap(fileno, RING_FILE_SIZE, access=mmap.ACCESS_WRITE)
+        except (OSError, ValueError):
+            os.close(fileno)
+            continue
+        if buffer[SERVER_STATE] != RingState.LISTENING or buffer[CLIENT_STATE] != RingState.IDLE:
+            buffer.close()
+            os.close(fileno)
+            continue
+
+        loop = asyncio.get_running_loop()
+        protocol = protocol_factory()
+        transport = RingTransport(loop, buffer, RESPONSE_RING, REQUEST_RING, CLIENT_STATE, SERVER_STATE, protocol,
+                                  (path, int(name[:-len(RING_FILE_SUFFIX)])))
+        loop.create_task(__client_worker(transport, fileno, buffer, lock_fileno))
+        protocol.connection_made(transport)
+        return transport, protocol
+
+    os.close(lock_fileno)
+    raise OSError(errno.ECONNREFUSED, "no execution ring is free in %s" % path)
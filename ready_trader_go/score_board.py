@@ -81,7 +81,8 @@ class ScoreBoardWriter:
         """Destroy an instance of the MatchEvents class."""
         if not self.finished:
             self.queue.put(None)
-        self.writer_task.join()
+        if self.writer_task is not None:
+            self.writer_task.join()
 
     def breach(self, now: float, name: str, account: CompetitorAccount, etf_price: Optional[int],
                future_price: Optional[int]) -> None:
@@ -151,3 +152,23 @@ class ScoreBoardWriter:
         finally:
             if not self.event_loop.is_closed():
                 self.event_loop.call_soon_threadsafe(self.on_writer_done, count)
+
+
+class ScoreBoard(ScoreBoardWriter):
+    """A processor of score records that keeps them in memory."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        """Initialise a new instance of the ScoreBoard class."""
+        super().__init__("", loop)
+        self.records: List[ScoreRecord] = list()
+
+    def finish(self) -> None:
+        """Indicate the series of events is complete."""
+        if not self.finished:
+            self.finished = True
+            while not self.queue.empty():
+                self.records.append(self.queue.get_nowait())
+            self.event_loop.call_soon(self.on_writer_done, len(self.records))
+
+    def start(self):
+        """Start the score board."""
@@ -0,0 +1,218 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import collections
+import heapq
+import itertools
+
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .messages import ALL_SIDES, MessageType
+
+# Shortest time to wait before trying again to release requests, so that a
+# timer that fires a little early never leaves the scheduler spinning
+MINIMUM_RELEASE_DELAY = 0.001
+
+# Priority of each type of request that does not use a new client order id,
+# lowest first: requests that reduce risk go ahead of those that add to it.
+# Hedges and inserts use new client order ids, which the exchange requires to
+# increase, so they go last and in client order id order.
+REQUEST_PRIORITIES: Dict[int, int] = {
+    MessageType.AMEND_ORDER: 0,
+    MessageType.CANCEL_ALL_ORDERS: 0,
+    MessageType.CANCEL_ORDER: 0,
+    MessageType.REPLACE_ORDER: 1,
+}
+
+
+class Request(object):
+    """A request waiting to be sent."""
+    __slots__ = ("client_order_id", "dropped", "lifespan", "price", "side", "typ", "volume")
+
+    def __init__(self, typ: int, client_order_id: int, side: int, price: int, volume: int, lifespan: int):
+        """Initialise a new instance of the Request class."""
+        self.client_order_id: int = client_order_id
+        self.dropped: bool = False
+        self.lifespan: int = lifespan
+        self.price: int = price
+        self.side: int = side
+        self.typ: int = typ
+        self.volume: int = volume
+
+
+class SendScheduler(object):
+    """Queue requests and release them at a rate the message frequency limit allows.
+
+    Requests are released at the end of the current iteration of the event
+    loop, or later if need be, risk-reducing requests (cancels and amends)
+    first, each in the order they were made, then replaces and finally hedges
+    and inserts in client order id order, so that the exchange never sees a
+    client order id lower than one it has already seen. The rate is shaped
+    by a token bucket holding up to burst tokens and refilled so that no more
+    than limit requests can be released in any interval. Requests that are
+    superseded before they are sent are collapsed: an insert that is
+    cancelled is never sent and one that is amended or replaced is sent with
+    its new volume and price.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, limit: int, interval: float, burst: int,
+                 send: Callable[[int, int, int, int, int, int], None], can_send: Callable[[int], bool],
+                 on_dropped: Callable[[int], None]):
+        """Initialise a new instance of the SendScheduler class.
+
+        The send callback is given each request to send as its message type,
+        client order id, side, price, volume and lifespan. The can_send
+        callback may hold back requests for reasons of its own and the
+        on_dropped callback is given the client order id of each insert that
+        is dropped rather than sent.
+        """
+        if limit < 2:
+            raise ValueError("limit must be at least two, so that some requests can be spread over the interval")
+        if not (0 < burst < limit):
+            raise ValueError("burst must be greater than zero and less than the limit")
+
+        self.event_loop: asyncio.AbstractEventLoop = loop
+        self.released: int = 0
+
+        self.__burst: float = float(burst)
+        self.__can_send: Callable[[int], bool] = can_send
+        self.__last_client_order_id: int = -1
+        self.__last_refill: float = loop.time()
+        self.__on_dropped: Callable[[int], None] = on_dropped
+        self.__pending: Dict[int, Request] = dict()
+        self.__new_orders: List[Tuple[int, int, Request]] = list()
+        self.__sequence: Iterator[int] = itertools.count()
+        self.__queues: Tuple[Deque[Request], ...] = tuple(collections.deque() for _ in range(2))
+        self.__rate: float = (limit - burst) / interval
+        self.__release_handle: Optional[asyncio.Handle] = None
+        self.__send: Callable[[int, int, int, int, int, int], None] = send
+        self.__tokens: float = float(burst)
+
+    def add(self, typ: int, client_order_id: int, side: int, price: int, volume: int, lifespan: int) -> None:
+        """Queue a request, collapsing it into any request it supersedes."""
+        pending = self.__pending.get(client_order_id)
+
+        if typ == MessageType.CANCEL_ALL_ORDERS:
+            for request in tuple(self.__pending.values()):
+                if request.typ == MessageType.INSERT_ORDER and (side == ALL_SIDES or request.side == side):
+                    self.__drop(request)
+        elif pending is not None and typ != MessageType.HEDGE_ORDER and typ != MessageType.INSERT_ORDER:
+            if pending.typ == MessageType.CANCEL_ORDER:
+                # Nothing more can be done with an order that is to be cancelled
+                return
+            if typ == MessageType.CANCEL_ORDER:
+                self.__drop(pending)
+                if pending.typ == MessageType.INSERT_ORDER:
+                    return
+            else:
+                if pending.typ == MessageType.INSERT_ORDER:
+                    # An insert has no filled volume, so it is amended or replaced by changing its volume
+                    pending.volume = volume if typ == MessageType.REPLACE_ORDER else min(volume, pending.volume)
+                    if typ == MessageType.REPLACE_ORDER:
+                        pending.price = price
+                    if pending.volume <= 0:
+                        self.__drop(pending)
+                elif typ == MessageType.REPLACE_ORDER:
+                    pending.typ = MessageType.REPLACE_ORDER
+                    pending.price = price
+                    pending.volume = volume
+                else:
+                    # An amend can only reduce the volume of the amend or replace before it
+                    pending.volume = min(volume, pending.volume)
+                return
+
+        request = Request(typ, client_order_id, side, price, volume, lifespan)
+        if typ != MessageType.CANCEL_ALL_ORDERS and typ != MessageType.HEDGE_ORDER:
+            self.__pending[client_order_id] = request
+        if typ == MessageType.HEDGE_ORDER or typ == MessageType.INSERT_ORDER:
+            heapq.heappush(self.__new_orders, (client_order_id, next(self.__sequence), request))
+        else:
+            self.__queues[REQUEST_PRIORITIES[typ]].append(request)
+
+        if self.__release_handle is None:
+            self.__release_handle = self.event_loop.call_soon(self.release)
+
+    def __drop(self, request: Request) -> None:
+        """Drop a request that has not been sent."""
+        request.dropped = True
+        if self.__pending.get(request.client_order_id) is request:
+            del self.__pending[request.client_order_id]
+        if request.typ == MessageType.INSERT_ORDER:
+            self.event_loop.call_soon(self.__on_dropped, request.client_order_id)
+
+    def queued(self) -> int:
+        """Return the number of requests waiting to be sent."""
+        return (sum(1 for queue in self.__queues for request in queue if not request.dropped)
+                + sum(1 for _, _, request in self.__new_orders if not request.dropped))
+
+    def release(self) -> None:
+        """Send as many queued requests as the token bucket allows, most important first."""
+        self.__release_handle = None
+
+        now: float = self.event_loop.time()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__last_refill) * self.__rate)
+        self.__last_refill = now
+
+        for queue in self.__queues:
+            while queue:
+                request = queue[0]
+                if request.dropped:
+                    queue.popleft()
+                    continue
+                if not self.__release_one(request):
+                    return
+                queue.popleft()
+
+        new_orders = self.__new_orders
+        while new_orders:
+            request = new_orders[0][2]
+            if request.dropped:
+                heapq.heappop(new_orders)
+                continue
+
+            if request.client_order_id <= self.__last_client_order_id:
+                # A request with a later client order id has already been sent, so the exchange would reject this
+                heapq.heappop(new_orders)
+                self.__drop(request)
+                continue
+
+            if not self.__release_one(request):
+                return
+            heapq.heappop(new_orders)
+            self.__last_client_order_id = request.client_order_id
+
+    def __release_one(self, request: Request) -> bool:
+        """Send a request if the token bucket allows, otherwise try again later and return False."""
+        if self.__tokens < 1.0 or not self.__can_send(1):
+            self.__schedule_release()
+            return False
+
+        if self.__pending.get(request.client_order_id) is request:
+            del self.__pending[request.client_order_id]
+
+        self.__tokens -= 1.0
+        self.released += 1
+        self.__send(request.typ, request.client_order_id, request.side, request.price, request.volume,
+                    request.lifespan)
+        return True
+
+    def __schedule_release(self) -> None:
+        """Try again once there should be a token to spare."""
+        delay: float = (1.0 - self.__tokens) / self.__rate if self.__tokens < 1.0 else 1.0 / self.__rate
+        delay = max(delay, MINIMUM_RELEASE_DELAY)
+        self.__release_handle = self.event_loop.call_later(delay, self.release)
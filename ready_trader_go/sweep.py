@@ -0,0 +1,241 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import copy
+import csv
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import random
+import sys
+import traceback
+
+from typing import Any, Dict, List, Optional, Sequence, TextIO, Tuple
+
+from .exchange import simulate
+from .result_cache import MatchResultCache
+from .trader import set_parameters
+
+# Seed for the timers' jitter in matches where none is given, so that results can be cached
+DEFAULT_MATCH_SEED = 0
+
+# Default maximum size of the match result cache
+RESULT_CACHE_SIZE = 1 << 26
+
+# Columns of a score record that are reported in the summary
+SUMMARY_COLUMNS = ("BuyVolume", "SellVolume", "EtfPosition", "FuturePosition", "TotalFees", "AccountBalance",
+                   "ProfitOrLoss", "Status")
+SUMMARY_INDICES = (3, 4, 5, 6, 9, 10, 11, 12)
+
+
+def apply_settings(configs: Dict[str, Dict[str, Any]], settings: Dict[str, Any]) -> None:
+    """Apply the given settings to the given configurations.
+
+    Settings are named <configuration>.<key>[.<key>...], for example
+    "exchange.Engine.MarketDataFile" or "autotrader.Parameters.LOT_SIZE".
+    """
+    for name, value in settings.items():
+        config_name, *keys = name.split(".")
+        if config_name not in configs or not keys:
+            raise Exception("Unknown setting '%s'" % name)
+        obj = configs[config_name]
+        for key in keys[:-1]:
+            obj = obj.setdefault(key, dict())
+        obj[keys[-1]] = value
+
+
+def grid_search(parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return every combination of the given parameters' values."""
+    for name, values in parameters.items():
+        if type(values) is not list:
+            raise Exception("Parameter '%s' should be a list of values for a grid search" % name)
+    return [dict(zip(parameters, values)) for values in itertools.product(*parameters.values())]
+
+
+def random_search(parameters: Dict[str, Any], samples: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Return the given number of random combinations of the given parameters' values.
+
+    Each parameter is either a list of values to choose from or a JSON object
+    with "Min" and "Max" elements giving a range to draw values from (a range
+    of integers if both are integers).
+    """
+    result: List[Dict[str, Any]] = list()
+    for _ in range(samples):
+        settings: Dict[str, Any] = dict()
+        for name, values in parameters.items():
+            if type(values) is list:
+                settings[name] = rng.choice(values)
+            elif type(values) is dict and "Min" in values and "Max" in values:
+                if type(values["Min"]) is int and type(values["Max"]) is int:
+                    settings[name] = rng.randint(values["Min"], values["Max"])
+                else:
+                    settings[name] = rng.uniform(values["Min"], values["Max"])
+            else:
+                raise Exception("Parameter '%s' should be a list of values or a range" % name)
+        result.append(settings)
+    return result
+
+
+def run_match(number: int, exchange_config: Dict[str, Any],
+              auto_traders: Sequence[Tuple[pathlib.Path, Dict[str, Any]]], settings: Dict[str, Any],
+              directory: pathlib.Path, cache: Optional[MatchResultCache]) -> Tuple[int, List[tuple]]:
+    """Run one match of a sweep in this process.
+
+    The auto-traders are given as pairs of the path of an auto-trader's
+    source file and its configuration, which is named after the file. Return
+    the match number and the final score record of each team. If the same
+    match has been run before, its result is taken from the cache.
+    """
+    logging.basicConfig(filename=str(directory / ("match%d.log" % number)),
+                        format="%(asctime)s [%(levelname)-7s] [%(name)s] %(message)s", level=logging.INFO)
+
+    names = [path.stem for path, _ in auto_traders]
+    configs = {name: copy.deepcopy(config) for name, (_, config) in zip(names, auto_traders)}
+    configs["exchange"] = copy.deepcopy(exchange_config)
+    apply_settings(configs, settings)
+
+    exchange = configs["exchange"]
+    exchange["Engine"].setdefault("Seed", DEFAULT_MATCH_SEED)
+    exchange["Engine"]["MatchEventsFile"] = str(directory / ("match%d_events.csv" % number))
+    exchange["Traders"] = {configs[name]["TeamName"]: configs[name]["Secret"] for name in names}
+    if len(exchange["Traders"]) != len(auto_traders):
+        raise Exception("Each auto-trader in a sweep must have its own team name")
+
+    # Import the auto-traders first so that the cache key covers the modules they import too
+    for path, _ in auto_traders:
+        if str(path.parent) not in sys.path:
+            sys.path.insert(0, str(path.parent))
+    modules_before = list(sys.modules)
+    modules = [importlib.import_module(name) for name in names]
+
+    key: str = ""
+    if cache is not None:
+        key = cache.make_key(exchange, [(str(path), configs[name]) for name, (path, _) in zip(names, auto_traders)],
+                             cache.loaded_sources(modules_before))
+        result = cache.get(key)
+        if result is not None:
+            return number, [tuple(record) for record in result["Records"]]
+
+    classes = list()
+    for name, module in zip(names, modules):
+        set_parameters(module, configs[name].get("Parameters", {}))
+        classes.append(module.AutoTrader)
+
+    final_records: Dict[str, tuple] = dict()
+    for record in simulate(exchange, classes):
+        final_records[record.team] = tuple(record)
+
+    if cache is not None:
+        cache.put(key, {"Seed": exchange["Engine"]["Seed"],
+                        "Records": list(final_records.values()),
+                        "Summary": {team: dict(zip(SUMMARY_COLUMNS, (record[i] for i in SUMMARY_INDICES)))
+                                    for team, record in final_records.items()}})
+    return number, list(final_records.values())
+
+
+def write_summary(results: Sequence[Tuple[int, Dict[str, Any], List[tuple]]], setting_names: Sequence[str],
+                  summary_file: TextIO) -> None:
+    """Write one row for each team in each match as CSV."""
+    csv_writer = csv.writer(summary_file)
+    csv_writer.writerow(("Match", *setting_names, "Team", *SUMMARY_COLUMNS))
+    for number, settings, records in results:
+        for record in records:
+            csv_writer.writerow((number, *(settings[n] for n in setting_names), record[1],
+                                 *(record[i] for i in SUMMARY_INDICES)))
+
+
+def print_summary(results: Sequence[Tuple[int, Dict[str, Any], List[tuple]]], setting_names: Sequence[str]) -> None:
+    """Print a table of the results with the most profitable team first."""
+    header = ("Match", *setting_names, "Team", *SUMMARY_COLUMNS)
+    teams = sorted(((number, settings, record) for number, settings, records in results for record in records),
+                   key=lambda team: team[2][11], reverse=True)
+    rows = [(str(number), *(str(settings[n]) for n in setting_names), record[1],
+             *(str(record[i]) for i in SUMMARY_INDICES)) for number, settings, record in teams]
+    widths = [max([len(h)] + [len(row[i]) for row in rows]) for i, h in enumerate(header)]
+    print("  ".join(h.rjust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(c.rjust(w) for c, w in zip(row, widths)))
+
+
+def sweep(filename: pathlib.Path, samples: Optional[int], seed: Optional[int], processes: Optional[int],
+          directory: pathlib.Path, cache_directory: Optional[pathlib.Path] = None,
+          cache_size: int = RESULT_CACHE_SIZE) -> int:
+    """Run a match for each combination of settings described by a sweep file.
+
+    The sweep file is a JSON object with an "AutoTraders" element listing the
+    auto-trader modules to include in every match and a "Parameters" element
+    mapping setting names to the values to try. Every combination of values
+    is tried unless a number of samples is given, in which case that many
+    random combinations are tried instead. Results are cached in the cache
+    directory, if one is given, so that repeated matches are not run again.
+    Return the number of matches that failed.
+    """
+    with filename.open() as sweep_file:
+        spec = json.load(sweep_file)
+    if type(spec) is not dict or type(spec.get("AutoTraders")) is not list or type(spec.get("Parameters")) is not dict:
+        raise Exception("Sweep file should be a JSON object with 'AutoTraders' and 'Parameters' elements")
+
+    with open("exchange.json") as config:
+        exchange_config = json.load(config)
+    auto_traders: List[Tuple[pathlib.Path, Dict[str, Any]]] = list()
+    for auto_trader in spec["AutoTraders"]:
+        # Paths are relative to the current directory, like those in the exchange configuration
+        path = pathlib.Path(auto_trader).with_suffix(".py").resolve()
+        if not path.is_file():
+            raise Exception("Auto-trader '%s' is not a Python file" % auto_trader)
+        with path.with_suffix(".json").open() as config:
+            auto_traders.append((path, json.load(config)))
+    if len({path.stem for path, _ in auto_traders}) != len(auto_traders):
+        raise Exception("Each auto-trader in a sweep must have a different file name")
+
+    parameters: Dict[str, Any] = spec["Parameters"]
+    if samples is None:
+        combinations = grid_search(parameters)
+    else:
+        combinations = random_search(parameters, samples, random.Random(seed))
+
+    directory.mkdir(parents=True, exist_ok=True)
+    cache = MatchResultCache(str(cache_directory), cache_size) if cache_directory else None
+    print("running %d matches in %s" % (len(combinations), directory))
+
+    results: List[Tuple[int, Dict[str, Any], List[tuple]]] = list()
+    failures: int = 0
+    with multiprocessing.Pool(processes or os.cpu_count(), maxtasksperchild=1) as pool:
+        pending = [(number, settings, pool.apply_async(run_match, (number, exchange_config, auto_traders, settings,
+                                                                   directory, cache)))
+                   for number, settings in enumerate(combinations, 1)]
+        for number, settings, result in pending:
+            try:
+                _, records = result.get()
+            except Exception as e:
+                # The exception's cause carries the traceback from the worker process
+                print("match %d failed (see %s):" % (number, directory / ("match%d.log" % number)), file=sys.stderr)
+                traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+                failures += 1
+            else:
+                results.append((number, settings, records))
+
+    with (directory / "summary.csv").open("w", newline="") as summary_file:
+        write_summary(results, list(parameters), summary_file)
+    print_summary(results, list(parameters))
+    if failures:
+        print("%d of %d matches failed" % (failures, len(combinations)), file=sys.stderr)
+    return failures
@@ -17,21 +17,75 @@
 #     <https://www.gnu.org/licenses/>.
 import asyncio
 import logging
-import time
 import random
+import selectors
 
 from typing import Any, Callable, List, Optional
 
 
+class VirtualClockSelector(selectors.DefaultSelector):
+    """A selector that advances a virtual clock instead of waiting.
+
+    When nothing is ready, the selector does not block for the timeout the
+    event loop asks for but moves the clock forward by it instead, so the
+    event loop goes straight on to its next scheduled callback.
+    """
+
+    def __init__(self, advance: Callable[[float], None]):
+        """Initialise a new instance of the VirtualClockSelector class."""
+        super().__init__()
+        self.__advance: Callable[[float], None] = advance
+
+    def select(self, timeout: Optional[float] = None) -> list:
+        """Poll for I/O and, if nothing is ready, advance the clock by the timeout."""
+        if timeout is None:
+            return super().select(None)
+        events = super().select(0)
+        if not events and timeout > 0.0:
+            self.__advance(timeout)
+        return events
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """An event loop whose time is kept by a virtual clock.
+
+    The loop's time starts at zero and stands still while there is work to
+    do. When every ready callback has run it jumps to the time of the next
+    scheduled callback, so timers and delayed calls run as fast as the
+    callbacks can keep up. This only suits work that happens entirely
+    within the event loop, such as a match run with simulate(): the clock
+    does not wait for other processes, so it would run away from them.
+    """
+
+    def __init__(self):
+        """Initialise a new instance of the VirtualClockEventLoop class."""
+        self.__now: float = 0.0
+        super().__init__(VirtualClockSelector(self.__advance))
+
+    def __advance(self, interval: float) -> None:
+        """Move the virtual clock forward by the given interval."""
+        self.__now += interval
+
+    def time(self) -> float:
+        """Return the current virtual time."""
+        return self.__now
+
+
 class Timer:
     """A timer."""
 
-    def __init__(self, tick_interval: float, speed: float):
-        """Initialise a new instance of the timer class."""
+    def __init__(self, tick_interval: float, speed: float, rng: Optional[random.Random] = None):
+        """Initialise a new instance of the timer class.
+
+        Tick times are jittered with numbers drawn from the given random
+        number generator, so seeding it makes the jitter reproducible.
+        """
         self.__event_loop: Optional[asyncio.AbstractEventLoop] = None
         self.__logger: logging.Logger = logging.getLogger("TIMER")
+        self.__random: random.Random = rng or random.Random()
         self.__speed: float = speed
         self.__start_time: float = 0.0
+        self.__stopped: bool = False
         self.__tick_timer_handle: Optional[asyncio.TimerHandle] = None
         self.__tick_interval: float = tick_interval
 
@@ -42,14 +96,27 @@ class Timer:
 
     def advance(self) -> float:
         """Advance the timer."""
-        if self.__start_time:
-            now = (time.monotonic() - self.__start_time) * self.__speed
-            return now
+        # The event loop is only known once the timer has started, and its time may start from zero
+        if self.__event_loop is not None:
+            return (self.__event_loop.time() - self.__start_time) * self.__speed
         return 0.0
 
+    def event_loop_duration(self, duration: float) -> float:
+        """Return how many seconds of event loop time the given duration of timer time lasts."""
+        return duration / self.__speed
+
+    def call_at(self, when: float, callback: Callable[..., None], *args: Any) -> asyncio.TimerHandle:
+        """Schedule a callback for when the timer reaches the given time."""
+        return self.__event_loop.call_at(self.__start_time + when / self.__speed, callback, *args)
+
+    def cancel(self) -> None:
+        """Stop this timer without notifying anyone."""
+        if self.__tick_timer_handle:
+            self.__tick_timer_handle.cancel()
+
     def __on_timer_tick(self, tick_time: float, tick_number: int):
         """Called on each timer tick."""
-        now = (time.monotonic() - self.__start_time) * self.__speed
+        now = (self.__event_loop.time() - self.__start_time) * self.__speed
 
         # There may have been a delay, so work out which tick this really is
         # We also need to prevent "skipping" ticks backwards due to negative random jitter
@@ -61,11 +128,15 @@ class Timer:
         for callback in self.timer_ticked:
             callback(self, now, tick_number)
 
+        # One of the callbacks may have shut the timer down
+        if self.__stopped:
+            return
+
         tick_time += self.__tick_interval
 
         # Generate random jitter, which can be +/- 20% of standard tick interval
         limit = self.__tick_interval * 0.2
-        jitter = random.uniform(-limit, +limit) / self.__speed
+        jitter = self.__random.uniform(-limit, +limit) / self.__speed
 
         self.__tick_timer_handle = self.__event_loop.call_at(self.__start_time + jitter + tick_time/self.__speed,
                                                              self.__on_timer_tick, tick_time, tick_number + 1)
@@ -73,13 +144,16 @@ class Timer:
     def start(self) -> None:
         """Start this timer."""
         self.__event_loop = asyncio.get_running_loop()
-        self.__start_time = time.monotonic()
+        self.__start_time = self.__event_loop.time()
         for callback in self.timer_started:
             callback(self, self.__start_time)
         self.__on_timer_tick(0.0, 1)
 
     def shutdown(self, now: float, reason: str) -> None:
         """Shut down this timer."""
+        if self.__stopped:
+            return
+        self.__stopped = True
         self.__logger.info("shutting down the match: time=%.6f reason='%s'", now, reason)
         if self.__tick_timer_handle:
             self.__tick_timer_handle.cancel()
@@ -22,11 +22,13 @@ import os
 import socket
 import sys
 
+from types import ModuleType
 from typing import Any, Dict
 
 from .application import Application
 from .base_auto_trader import BaseAutoTrader
-from .pubsub import SubscriberFactory
+from .pubsub import MAXIMUM_BACKOFF, SubscriberFactory
+from .ring import create_ring_connection
 
 
 # From Python 3.8, the proactor event loop is used by default on Windows
@@ -58,10 +60,27 @@ def __config_validator(config):
     if any(k not in config for k in ("Execution", "Information", "TeamName", "Secret")):
         raise Exception("A required key is missing from the configuration")
 
-    __validate_json_object(config, "Execution", ("Host", "Port"), (str, int))
+    execution_type = config["Execution"].get("Type", "tcp") if type(config["Execution"]) is dict else "tcp"
+    if execution_type not in ("tcp", "unix", "ring"):
+        raise Exception("Type in Execution configuration should be either 'tcp', 'unix' or 'ring'")
+    if execution_type == "unix" and not hasattr(socket, "AF_UNIX"):
+        raise Exception("Unix domain sockets are not supported on this platform")
+    if execution_type == "ring" and sys.platform == "win32":
+        raise Exception("Shared memory rings are not supported on this platform")
+    if execution_type == "tcp":
+        __validate_json_object(config, "Execution", ("Host", "Port"), (str, int))
+        __validate_hostname(config, "Execution", "Host")
+    else:
+        __validate_json_object(config, "Execution", ("Path",), (str,))
     __validate_json_object(config, "Information", ("Type", "Name"), (str, str))
 
-    __validate_hostname(config, "Execution", "Host")
+    if config["Information"].get("WaitStrategy", "spin") not in ("spin", "backoff", "wakeup"):
+        raise Exception("WaitStrategy in Information configuration should be either 'spin', 'backoff' or 'wakeup'")
+    if config["Information"].get("WaitStrategy") == "wakeup" and not hasattr(os, "mkfifo"):
+        raise Exception("The 'wakeup' WaitStrategy is not supported on this platform")
+    if "MaximumBackoff" in config["Information"] and (type(config["Information"]["MaximumBackoff"]) is not float
+                                                      or config["Information"]["MaximumBackoff"] <= 0.0):
+        raise Exception("MaximumBackoff in Information configuration should be a positive number")
 
     if type(config["TeamName"]) is not str:
         raise Exception("TeamName has inappropriate type")
@@ -73,6 +92,9 @@ def __config_validator(config):
     if len(config["Secret"]) < 1 or len(config["Secret"]) > 50:
         raise Exception("Secret must be at least one, and no more than fifty, characters long")
 
+    if "Parameters" in config and type(config["Parameters"]) is not dict:
+        raise Exception("Parameters configuration should be a JSON object")
+
     return True
 
 
@@ -83,23 +105,38 @@ async def __start_autotrader(auto_trader: BaseAutoTrader, config: Dict[str, Any]
 
     exec_ = config["Execution"]
     try:
-        await loop.create_connection(lambda: auto_trader, exec_["Host"], exec_["Port"])
+        if exec_.get("Type", "tcp") == "unix":
+            await loop.create_unix_connection(lambda: auto_trader, exec_["Path"])
+        elif exec_.get("Type", "tcp") == "ring":
+            await create_ring_connection(lambda: auto_trader, exec_["Path"])
+        else:
+            await loop.create_connection(lambda: auto_trader, exec_["Host"], exec_["Port"])
     except OSError as e:
         logger.error("execution connection failed: %s", e.strerror)
         loop.stop()
         return
 
     info = config["Information"]
-    sub_factory = SubscriberFactory(info["Type"], info["Name"])
+    sub_factory = SubscriberFactory(info["Type"], info["Name"], info.get("WaitStrategy", "spin"),
+                                    info.get("MaximumBackoff", MAXIMUM_BACKOFF))
     sub_factory.create(auto_trader)
 
 
+def set_parameters(module: ModuleType, parameters: Dict[str, Any]) -> None:
+    """Override the module-level names of an auto-trader module with the given values."""
+    for name, value in parameters.items():
+        if not hasattr(module, name):
+            raise Exception("auto-trader module '%s' has no parameter named '%s'" % (module.__name__, name))
+        setattr(module, name, value)
+
+
 def main(name: str = "autotrader") -> None:
     """Import the 'AutoTrader' class from the named module and run it."""
     app = Application(name, __config_validator)
 
     sys.path.insert(0, os.getcwd())
     mod = importlib.import_module(name)
+    set_parameters(mod, app.config.get("Parameters", {}))
     auto_trader = mod.AutoTrader(app.event_loop, app.config["TeamName"], app.config["Secret"])
 
     app.event_loop.create_task(__start_autotrader(auto_trader, app.config, app.event_loop))
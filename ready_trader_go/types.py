@@ -17,6 +17,8 @@
 #     <https://www.gnu.org/licenses/>.
 import enum
 
+from typing import Iterable, Tuple
+
 
 class Instrument(enum.IntEnum):
     FUTURE = 0
@@ -52,6 +54,10 @@ class ICompetitor:
         """Called when an amend order request is received from the competitor."""
         raise NotImplementedError()
 
+    def on_cancel_all_message(self, now: float, side: int) -> None:
+        """Called when a cancel all orders request is received from the competitor."""
+        raise NotImplementedError()
+
     def on_cancel_message(self, now: float, client_order_id: int) -> None:
         """Called when a cancel order request is received from the competitor."""
         raise NotImplementedError()
@@ -65,18 +71,38 @@ class ICompetitor:
         """Called when an insert order request is received from the competitor."""
         raise NotImplementedError()
 
+    def on_order_batch_message(self, now: float, entries: Iterable[Tuple[int, int, int, int, int, int]]) -> None:
+        """Called when an order batch request is received from the competitor."""
+        raise NotImplementedError()
+
+    def on_replace_message(self, now: float, client_order_id: int, price: int, volume: int) -> None:
+        """Called when a replace order request is received from the competitor."""
+        raise NotImplementedError()
+
 
 class IController:
     def advance_time(self):
         """Return the current time after accounting for events."""
         raise NotImplementedError()
 
+    def event_loop_duration(self, duration: float) -> float:
+        """Return how many seconds of event loop time the given duration of match time lasts."""
+        raise NotImplementedError()
+
+    def information_snapshot(self) -> bytes:
+        """Return the order book update message last published for each instrument."""
+        raise NotImplementedError()
+
 
 class IExecutionConnection:
     def close(self):
         """Close the execution channel."""
         raise NotImplementedError()
 
+    def send_cancel_all_status(self, side: int, order_count: int, volume: int) -> None:
+        """Send a cancel all orders status message to the auto-trader."""
+        raise NotImplementedError()
+
     def send_error(self, client_order_id: int, error_message: bytes) -> None:
         """Send an error message to the auto-trader."""
         raise NotImplementedError()
@@ -24,6 +24,8 @@ import time
 import traceback
 
 import ready_trader_go.exchange
+import ready_trader_go.market_events
+import ready_trader_go.sweep
 import ready_trader_go.trader
 
 try:
@@ -52,6 +54,17 @@ def replay(args) -> None:
     hud_replay(path)
 
 
+def compile_market_data(args) -> None:
+    """Compile market data files."""
+    for path in args.filename:
+        if not path.is_file():
+            print("'%s' is not a regular file" % str(path), file=sys.stderr)
+            sys.exit(1)
+        destination = path.with_suffix(ready_trader_go.market_events.COMPILED_MARKET_DATA_SUFFIX)
+        count = ready_trader_go.market_events.compile_market_data(str(path), str(destination))
+        print("compiled %d market events from '%s' into '%s'" % (count, path, destination))
+
+
 def on_error(name: str, error: Exception) -> None:
     print("%s threw an exception: %s" % (name, error), file=sys.stderr)
     traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
@@ -93,6 +106,25 @@ def run(args) -> None:
             hud_main(args.host, args.port)
 
 
+def sweep(args) -> None:
+    """Run a match for each combination of settings in a sweep file."""
+    if not args.filename.is_file():
+        print("'%s' is not a regular file" % str(args.filename), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        failures = ready_trader_go.sweep.sweep(args.filename, args.samples, args.seed, args.processes,
+                                               args.directory,
+                                               None if args.no_cache else args.cache or args.directory / "cache",
+                                               args.cache_size)
+    except Exception as e:
+        on_error("The parameter sweep", e)
+        sys.exit(1)
+
+    if failures:
+        sys.exit(1)
+
+
 def main() -> None:
     """Process command line arguments and execute the given command."""
     parser = argparse.ArgumentParser(description="Ready Trader Go command line utility.")
@@ -120,6 +152,37 @@ def main() -> None:
                                type=pathlib.Path)
     replay_parser.set_defaults(func=replay)
 
+    compile_parser = subparsers.add_parser("compile", aliases=["co"],
+                                           description=("Compile market data files into a binary format that the "
+                                                        "exchange simulator can read without parsing."),
+                                           help="compile market data files")
+    compile_parser.add_argument("filename", nargs="+", type=pathlib.Path,
+                                help="names of the market data files to compile")
+    compile_parser.set_defaults(func=compile_market_data)
+
+    sweep_parser = subparsers.add_parser("sweep", aliases=["sw"],
+                                         description=("Run a Ready Trader Go match for each combination of "
+                                                      "auto-trader and exchange settings in a sweep file and "
+                                                      "summarise the results."),
+                                         help="run a parameter sweep")
+    sweep_parser.add_argument("--samples", type=int,
+                              help="number of random combinations to try (default every combination)")
+    sweep_parser.add_argument("--seed", type=int,
+                              help="seed for choosing random combinations")
+    sweep_parser.add_argument("--processes", type=int,
+                              help="number of matches to run at once (default the number of CPUs)")
+    sweep_parser.add_argument("--directory", default=pathlib.Path("sweep"), type=pathlib.Path,
+                              help="directory for the log, match events and summary files (default 'sweep')")
+    sweep_parser.add_argument("--cache", type=pathlib.Path,
+                              help="directory for cached match results (default 'cache' in the sweep directory)")
+    sweep_parser.add_argument("--cache-size", default=ready_trader_go.sweep.RESULT_CACHE_SIZE, type=int,
+                              help="maximum size in bytes of the match result cache (default %(default)s)")
+    sweep_parser.add_argument("--no-cache", action="store_true",
+                              help="run every match, even if its result has been cached")
+    sweep_parser.add_argument("filename", nargs="?", default=pathlib.Path("sweep.json"), type=pathlib.Path,
+                              help="name of the sweep file (default 'sweep.json')")
+    sweep_parser.set_defaults(func=sweep)
+
     args = parser.parse_args()
     args.func(args)
 
@@ -0,0 +1,167 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import os
+import socket
+import tempfile
+import unittest
+
+from ready_trader_go.execution import ExecutionConnection, ExecutionServer
+from ready_trader_go.limiter import FrequencyLimiter, FrequencyLimiterFactory
+from ready_trader_go.messages import (HEADER, HEADER_SIZE, INSERT_MESSAGE, LOGIN_MESSAGE, MESSAGE_BUDGET_MESSAGE,
+                                      ORDER_BATCH_ENTRY, ORDER_BATCH_HEADER, MessageType)
+from ready_trader_go.timer import Timer
+from ready_trader_go.types import IController
+
+
+class FixedTimeController(IController):
+    def __init__(self, now: float, speed: float):
+        self.now = now
+        self.timer = Timer(0.25, speed)
+
+    def advance_time(self):
+        return self.now
+
+    def event_loop_duration(self, duration: float) -> float:
+        return self.timer.event_loop_duration(duration)
+
+    def information_snapshot(self) -> bytes:
+        return b"snapshot"
+
+
+class RecordingCompetitor:
+    def __init__(self):
+        self.calls = list()
+
+    def __getattr__(self, name):
+        return lambda now, *args: self.calls.append((name, now) + args)
+
+    def on_order_batch_message(self, now, entries):
+        self.calls.append(("on_order_batch_message", now, list(entries)))
+
+
+class RecordingCompetitorManager:
+    def __init__(self):
+        self.competitor = RecordingCompetitor()
+
+    def login_competitor(self, name, secret, connection):
+        return self.competitor
+
+    def on_competitor_disconnect(self):
+        pass
+
+
+def message(typ: int, body: bytes) -> bytes:
+    return HEADER.pack(HEADER_SIZE + len(body), typ) + body
+
+
+class MessageDispatchTests(unittest.TestCase):
+    def dispatch(self, *messages):
+        async def receive():
+            manager = RecordingCompetitorManager()
+            connection = ExecutionConnection(manager, FrequencyLimiter(1.0, 50),
+                                             FixedTimeController(1.0, 1.0))
+            for m in (message(MessageType.LOGIN, LOGIN_MESSAGE.pack(b"TraderOne", b"secret")),) + messages:
+                connection.on_message(m[2], m, HEADER_SIZE, len(m))
+            connection.login_timeout.cancel()
+            return manager.competitor.calls, connection, bytes(connection._outgoing)
+
+        return asyncio.run(receive())
+
+    def test_fixed_length_messages_go_to_the_competitor(self):
+        calls, connection, _ = self.dispatch(message(MessageType.INSERT_ORDER, INSERT_MESSAGE.pack(1, 0, 100, 10, 1)))
+        self.assertEqual(calls, [("on_insert_message", 1.0, 1, 0, 100, 10, 1)])
+        self.assertFalse(connection.closing)
+
+    def test_order_batch_is_decoded_through_the_table(self):
+        entries = [(MessageType.INSERT_ORDER, 1, 0, 100, 10, 1), (MessageType.CANCEL_ORDER, 1, 0, 0, 0, 0)]
+        body = ORDER_BATCH_HEADER.pack(2) + b"".join(ORDER_BATCH_ENTRY.pack(*e) for e in entries)
+        calls, connection, _ = self.dispatch(message(MessageType.ORDER_BATCH, body))
+        self.assertEqual(calls, [("on_order_batch_message", 1.0, entries)])
+        self.assertEqual(connection.message_counts[MessageType.ORDER_BATCH], 1)
+
+    def test_each_request_in_an_order_batch_counts_towards_the_limit(self):
+        entries = [(MessageType.INSERT_ORDER, i, 0, 100, 1, 1) for i in range(1, 31)]
+        body = ORDER_BATCH_HEADER.pack(len(entries)) + b"".join(ORDER_BATCH_ENTRY.pack(*e) for e in entries)
+        calls, _, _ = self.dispatch(message(MessageType.ORDER_BATCH, body), message(MessageType.ORDER_BATCH, body))
+        self.assertEqual(calls, [("on_order_batch_message", 1.0, entries),
+                                 ("hard_breach", 1.0, 0, b"message frequency limit breached")])
+
+    def test_order_batch_with_the_wrong_length_closes_the_connection(self):
+        body = ORDER_BATCH_HEADER.pack(2) + ORDER_BATCH_ENTRY.pack(MessageType.INSERT_ORDER, 1, 0, 100, 10, 1)
+        calls, connection, _ = self.dispatch(message(MessageType.ORDER_BATCH, body))
+        self.assertEqual(calls, [])
+        self.assertTrue(connection.closing)
+
+    def test_snapshot_request_is_answered_on_the_execution_channel(self):
+        _, connection, outgoing = self.dispatch(message(MessageType.SNAPSHOT_REQUEST, b""))
+        self.assertEqual(outgoing, b"snapshot")
+        self.assertEqual(connection.message_counts[MessageType.SNAPSHOT_REQUEST], 1)
+
+
+class MessageBudgetTests(unittest.TestCase):
+    def test_budget_durations_are_in_event_loop_seconds(self):
+        async def report():
+            # One second of event loop time lasts six seconds of match time at a speed of six
+            limiter = FrequencyLimiter(6.0, 50, report_budget=True)
+            limiter.check_event(1.5)
+            connection = ExecutionConnection(None, limiter, FixedTimeController(3.0, 6.0))
+            connection.send_message_budget()
+            connection.login_timeout.cancel()
+            return MESSAGE_BUDGET_MESSAGE.unpack_from(connection._outgoing, HEADER_SIZE)
+
+        received, counted, limit, reset_in, interval = asyncio.run(report())
+        self.assertEqual((counted, limit), (1, 50))
+        self.assertAlmostEqual(reset_in, 0.75)
+        self.assertAlmostEqual(interval, 1.0)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are not supported on this platform")
+class UnixDomainSocketTests(unittest.TestCase):
+    def test_messages_are_received_through_a_unix_domain_socket(self):
+        async def wait_for_calls(manager, count):
+            for _ in range(100):
+                if len(manager.competitor.calls) >= count:
+                    break
+                await asyncio.sleep(0.01)
+
+        async def connect(path):
+            manager = RecordingCompetitorManager()
+            server = ExecutionServer("", 0, manager, FrequencyLimiterFactory(1.0, 50), path)
+            server.controller = FixedTimeController(1.0, 1.0)
+            await server.start()
+            try:
+                transport, _ = await asyncio.get_running_loop().create_unix_connection(asyncio.Protocol, path)
+                transport.write(message(MessageType.LOGIN, LOGIN_MESSAGE.pack(b"TraderOne", b"secret"))
+                                + message(MessageType.INSERT_ORDER, INSERT_MESSAGE.pack(1, 0, 100, 10, 1)))
+                await wait_for_calls(manager, 1)
+                transport.close()
+                await wait_for_calls(manager, 2)
+            finally:
+                server.close()
+            return manager.competitor.calls
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "exec.sock")
+            self.assertEqual(asyncio.run(connect(path)), [("on_insert_message", 1.0, 1, 0, 100, 10, 1),
+                                                          ("on_connection_lost", 1.0)])
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
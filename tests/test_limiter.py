@@ -0,0 +1,56 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import random
+import unittest
+
+from ready_trader_go.limiter import BucketedFrequencyLimiter, FrequencyLimiter
+
+
+class BucketedFrequencyLimiterTests(unittest.TestCase):
+    def assert_same_breaches(self, times, counts=None, interval=1.0, limit=50):
+        exact = FrequencyLimiter(interval, limit)
+        bucketed = BucketedFrequencyLimiter(interval, limit)
+        for i, now in enumerate(times):
+            count = counts[i] if counts else 1
+            self.assertEqual(bucketed.check_event(now, count), exact.check_event(now, count), "event %d" % i)
+            self.assertGreaterEqual(bucketed.value, min(exact.value, limit + 1))
+
+    def test_steady_rate_just_under_the_limit_never_breaches(self):
+        times = [i / 49.0 for i in range(2000)]
+        limiter = BucketedFrequencyLimiter(1.0, 50)
+        self.assertFalse(any(limiter.check_event(now) for now in times))
+        self.assert_same_breaches(times)
+
+    def test_steady_rate_just_over_the_limit_breaches(self):
+        self.assert_same_breaches([i / 51.0 for i in range(2000)])
+
+    def test_random_bursts_match_the_exact_limiter(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            now = 0.0
+            times = list()
+            counts = list()
+            for _ in range(3000):
+                now += rng.choice((0.0, 0.001, 0.01, 0.02, 0.05, 0.3))
+                times.append(now)
+                counts.append(rng.choice((1, 1, 1, 2, 5)))
+            self.assert_same_breaches(times, counts, interval=1.0, limit=rng.choice((2, 10, 50)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import unittest
+
+from ready_trader_go.loopback import LoopbackTransport
+from ready_trader_go.messages import CANCEL_MESSAGE, HEADER, HEADER_SIZE, Connection, MessageType
+
+
+class RecordingConnection(Connection):
+    """Records the client order id of each cancel message, keeping a view of the buffer it arrived in."""
+
+    def __init__(self):
+        super().__init__()
+        self.order_ids = list()
+        self.views = list()
+
+    def on_message(self, typ, data, start, length):
+        self.views.append(CANCEL_MESSAGE.iter_unpack(memoryview(data)[start:start + CANCEL_MESSAGE.size]))
+        self.order_ids.append(CANCEL_MESSAGE.unpack_from(data, start)[0])
+
+
+class LoopbackTransportTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.errors = list()
+        self.loop.set_exception_handler(lambda loop, context: self.errors.append(context))
+
+    def tearDown(self):
+        self.loop.close()
+
+    def send_cancel(self, connection, order_id):
+        connection._connection_transport.write(HEADER.pack(HEADER_SIZE + CANCEL_MESSAGE.size, MessageType.CANCEL_ORDER)
+                                               + CANCEL_MESSAGE.pack(order_id))
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def test_messages_are_delivered_once_while_the_protocol_holds_a_view(self):
+        sender, receiver = Connection(), RecordingConnection()
+        LoopbackTransport.create_pair(self.loop, sender, receiver, ("loopback", 0))
+        for order_id in range(1, 4):
+            self.send_cancel(sender, order_id)
+        self.assertEqual(receiver.order_ids, [1, 2, 3])
+        self.assertEqual(self.errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import os
+import pathlib
+import tempfile
+import unittest
+
+from ready_trader_go.market_data_cache import DEFAULT_CACHE_SUBDIRECTORY, MarketDataCache
+from ready_trader_go.market_events import COMPILED_MARKET_DATA_MAGIC
+
+MARKET_DATA = """Time,Instrument,Operation,OrderId,Side,Volume,Price,Lifespan,Fee
+0.0,0,Insert,1,B,10,100.0,G,0
+0.5,0,Cancel,1,,,,,0
+"""
+
+
+class MarketDataCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.data = pathlib.Path(self.temporary.name) / "data"
+        self.data.mkdir()
+        self.market_data = self.data / "md.csv"
+        self.market_data.write_text(MARKET_DATA)
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def test_entries_are_kept_out_of_the_data_directory_by_default(self):
+        entry = pathlib.Path(MarketDataCache("", 3600.0, 1 << 20).get(str(self.market_data)))
+        self.assertEqual(entry.parent, self.data / DEFAULT_CACHE_SUBDIRECTORY)
+        self.assertEqual(sorted(os.listdir(self.data)), [DEFAULT_CACHE_SUBDIRECTORY, "md.csv"])
+
+    def test_entry_is_reused_while_the_file_is_unchanged(self):
+        cache = MarketDataCache(os.path.join(self.temporary.name, "cache"), 3600.0, 1 << 20)
+        first = cache.get(str(self.market_data))
+        self.assertEqual(cache.get(str(self.market_data)), first)
+        self.assertEqual(os.listdir(os.path.join(self.temporary.name, "cache")), [os.path.basename(first)])
+
+    def test_entry_from_an_earlier_version_is_recompiled(self):
+        cache = MarketDataCache(os.path.join(self.temporary.name, "cache"), 3600.0, 1 << 20)
+        entry = pathlib.Path(cache.get(str(self.market_data)))
+        entry.write_bytes(b"RTGMD001" + entry.read_bytes()[len(COMPILED_MARKET_DATA_MAGIC):])
+        self.assertEqual(cache.get(str(self.market_data)), str(entry))
+        self.assertTrue(entry.read_bytes().startswith(COMPILED_MARKET_DATA_MAGIC))
+
+
+if __name__ == "__main__":
+    unittest.main()
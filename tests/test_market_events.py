@@ -0,0 +1,119 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+
+from ready_trader_go.market_events import NO_LIFESPAN, NO_SIDE, MarketEventsReader, compile_market_data
+from ready_trader_go.match_events import MatchEvents
+from ready_trader_go.order_book import OrderBook
+from ready_trader_go.types import Instrument
+
+
+def write_market_data(path: str, count: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("Time,Instrument,Operation,OrderId,Side,Volume,Price,Lifespan\n")
+        for i in range(1, count + 1):
+            t = i * 0.01
+            instrument = rng.randrange(2)
+            operation = rng.random()
+            if operation < 0.6 or i < 3:
+                f.write("%.3f,%d,Insert,%d,%s,%d,%.2f,%s\n" % (t, instrument, i, rng.choice("AB"),
+                                                               rng.randrange(1, 100), rng.randrange(9000, 11000),
+                                                               rng.choice("FG")))
+            elif operation < 0.8:
+                f.write("%.3f,%d,Cancel,%d,,,,\n" % (t, instrument, rng.randrange(1, i)))
+            else:
+                f.write("%.3f,%d,Amend,%d,,%d,,\n" % (t, instrument, rng.randrange(1, i), -rng.randrange(1, 10)))
+
+
+class MarketEventsReaderTests(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.temporary.name, "md.csv")
+        self.compiled = os.path.join(self.temporary.name, "md.bin")
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.temporary.cleanup()
+
+    def read_all(self, filename: str, start_time: float = 0.0, chunk_size: int = 7):
+        reader = MarketEventsReader(filename, self.loop, None, None, None, start_time, chunk_size)
+        reader.start()
+        events = list()
+        evt = reader.next_market_event()
+        while evt is not None:
+            events.append(evt)
+            evt = reader.next_market_event()
+        if reader.reader_task is not None:
+            reader.reader_task.join()
+        return events
+
+    def test_compiled_market_data_reads_the_same_events_as_csv(self):
+        write_market_data(self.csv, 1000)
+        self.assertEqual(compile_market_data(self.csv, self.compiled), 1000)
+        expected = self.read_all(self.csv)
+        self.assertEqual(len(expected), 1000)
+        self.assertEqual(self.read_all(self.compiled), expected)
+        self.assertTrue(all(type(e) is tuple for e in self.read_all(self.compiled)))
+        self.assertIn(NO_SIDE, (e[4] for e in expected))
+        self.assertIn(NO_LIFESPAN, (e[7] for e in expected))
+
+    def test_next_event_time_is_relative_to_the_start_time(self):
+        write_market_data(self.csv, 100)
+        compile_market_data(self.csv, self.compiled)
+        for filename in (self.csv, self.compiled):
+            reader = MarketEventsReader(filename, self.loop, OrderBook(Instrument.FUTURE, 0.0, 0.0),
+                                        OrderBook(Instrument.ETF, 0.0, 0.0), MatchEvents(), 0.5)
+            reader.start()
+            reader.fold_market_events()
+            self.assertAlmostEqual(reader.next_event_time(), 0.0)
+            reader.process_market_events(0.095)
+            self.assertAlmostEqual(reader.next_event_time(), 0.1)
+            if reader.reader_task is not None:
+                reader.reader_task.join()
+
+    def test_folding_gives_the_same_books_as_replaying(self):
+        write_market_data(self.csv, 2000, seed=2)
+        start_time = 12.345
+
+        books = list()
+        for fold in (True, False):
+            future_book = OrderBook(Instrument.FUTURE, 0.0, 0.0)
+            etf_book = OrderBook(Instrument.ETF, 0.0, 0.0)
+            reader = MarketEventsReader(self.csv, self.loop, future_book, etf_book, MatchEvents(),
+                                        start_time if fold else 0.0)
+            reader.start()
+            if fold:
+                reader.fold_market_events()
+            else:
+                reader.process_market_events(start_time)
+            books.append((future_book.top_levels_snapshot(), etf_book.top_levels_snapshot(),
+                          sorted(reader.future_orders), sorted(reader.etf_orders)))
+            reader.reader_task.join()
+
+        self.assertEqual(books[0], books[1])
+        self.assertTrue(books[0][2] and books[0][3])
+
+
+if __name__ == "__main__":
+    unittest.main()
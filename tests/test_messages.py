@@ -0,0 +1,113 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import random
+import unittest
+
+from ready_trader_go.messages import (HEADER, HEADER_SIZE, RECEIVE_BUFFER_MINIMUM_SPACE, RECEIVE_BUFFER_SIZE,
+                                      Connection)
+
+
+class RecordingConnection(Connection):
+    def __init__(self):
+        super().__init__()
+        self.received = list()
+
+    def on_message(self, typ, data, start, length):
+        self.received.append((typ, bytes(data[start:start + length - HEADER_SIZE])))
+
+    def receive(self, data: bytes) -> None:
+        """Feed data in through the buffered protocol interface, as the event loop would."""
+        while data:
+            buffer = self.get_buffer(len(data))
+            n = min(len(buffer), len(data))
+            buffer[:n] = data[:n]
+            self.buffer_updated(n)
+            data = data[n:]
+
+
+def message(typ: int, body: bytes) -> bytes:
+    return HEADER.pack(HEADER_SIZE + len(body), typ) + body
+
+
+class ConnectionReceiveTests(unittest.TestCase):
+    def test_messages_split_across_reads_are_reassembled(self):
+        messages = [(i % 200, bytes(range(i % 100))) for i in range(500)]
+        stream = b"".join(message(t, b) for t, b in messages)
+        rng = random.Random(1)
+        connection = RecordingConnection()
+        i = 0
+        while i < len(stream):
+            n = rng.randrange(1, 300)
+            connection.receive(stream[i:i + n])
+            i += n
+        self.assertEqual(connection.received, messages)
+
+    def test_partial_message_is_moved_to_the_front_when_the_buffer_fills(self):
+        body = b"x" * 1000
+        count = (RECEIVE_BUFFER_SIZE - RECEIVE_BUFFER_MINIMUM_SPACE) // len(message(1, body)) + 2
+        stream = b"".join(message(1, body) for _ in range(count))
+        connection = RecordingConnection()
+        # Stop each read part way through a message so that the read offset never returns to zero
+        for i in range(0, len(stream), 777):
+            connection.receive(stream[i:i + 777])
+        self.assertEqual(connection.received, [(1, body)] * count)
+        self.assertLess(connection._write_offset, RECEIVE_BUFFER_SIZE)
+
+
+class RecordingTransport(asyncio.Transport):
+    def __init__(self):
+        super().__init__()
+        self.writes = list()
+
+    def is_closing(self):
+        return False
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+
+class ConnectionWriteTests(unittest.TestCase):
+    def test_writes_in_one_iteration_are_handed_over_together(self):
+        async def write():
+            connection = Connection()
+            transport = connection._connection_transport = RecordingTransport()
+            connection.write(b"one")
+            connection.write(bytearray(b"two"))
+            self.assertEqual(transport.writes, [])
+            await asyncio.sleep(0)
+            connection.write(b"three")
+            await asyncio.sleep(0)
+            return transport.writes
+
+        self.assertEqual(asyncio.run(write()), [b"onetwo", b"three"])
+
+    def test_close_flushes_queued_writes(self):
+        async def close():
+            connection = Connection()
+            transport = connection._connection_transport = RecordingTransport()
+            transport.close = lambda: None
+            connection.write(b"last")
+            connection.close()
+            return transport.writes
+
+        self.assertEqual(asyncio.run(close()), [b"last"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,263 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import random
+import unittest
+
+from ready_trader_go.order_book import (TOP_LEVEL_COUNT, IOrderListener, LadderOrderBook, Order, OrderBook,
+                                        OrderBookFactory)
+from ready_trader_go.types import Instrument, Lifespan, Side
+
+MAKER_FEE = -0.0001
+TAKER_FEE = 0.0002
+
+
+class RecordingListener(IOrderListener):
+    def __init__(self, events):
+        self.events = events
+
+    def on_order_amended(self, now, order, volume_removed):
+        self.events.append(("amended", order.client_order_id, volume_removed))
+
+    def on_order_cancelled(self, now, order, volume_removed):
+        self.events.append(("cancelled", order.client_order_id, volume_removed))
+
+    def on_order_placed(self, now, order):
+        self.events.append(("placed", order.client_order_id))
+
+    def on_order_replaced(self, now, order, old_price, old_remaining_volume):
+        self.events.append(("replaced", order.client_order_id, old_price, old_remaining_volume))
+
+    def on_order_filled(self, now, order, price, volume, fee):
+        self.events.append(("filled", order.client_order_id, price, volume, fee))
+
+
+class ReferenceOrder:
+    def __init__(self, client_order_id, side, price, volume, lifespan):
+        self.client_order_id = client_order_id
+        self.lifespan = lifespan
+        self.price = price
+        self.remaining_volume = volume
+        self.sequence = 0
+        self.side = side
+        self.volume = volume
+
+
+class ReferenceBook:
+    """A deliberately simple order book that scans every resting order."""
+
+    def __init__(self):
+        self.events = list()
+        self.resting = list()
+        self.sequence = 0
+
+    def __match(self, order):
+        while order.remaining_volume > 0:
+            if order.side == Side.SELL:
+                candidates = [o for o in self.resting if o.side == Side.BUY and o.price >= order.price]
+                candidates.sort(key=lambda o: (-o.price, o.sequence))
+            else:
+                candidates = [o for o in self.resting if o.side == Side.SELL and o.price <= order.price]
+                candidates.sort(key=lambda o: (o.price, o.sequence))
+            if not candidates:
+                return
+            price = candidates[0].price
+            traded = 0
+            for passive in (o for o in candidates if o.price == price):
+                if order.remaining_volume - traded == 0:
+                    break
+                volume = min(order.remaining_volume - traded, passive.remaining_volume)
+                passive.remaining_volume -= volume
+                traded += volume
+                if passive.remaining_volume == 0:
+                    self.resting.remove(passive)
+                self.events.append(("filled", passive.client_order_id, price, volume,
+                                    round(price * volume * MAKER_FEE)))
+            order.remaining_volume -= traded
+            self.events.append(("filled", order.client_order_id, price, traded, round(price * traded * TAKER_FEE)))
+
+    def __rest(self, order):
+        self.sequence += 1
+        order.sequence = self.sequence
+        self.resting.append(order)
+
+    def amend(self, order, new_volume):
+        if order.remaining_volume > 0:
+            fill_volume = order.volume - order.remaining_volume
+            diff = order.volume - max(fill_volume, new_volume)
+            order.volume -= diff
+            order.remaining_volume -= diff
+            if order.remaining_volume == 0:
+                self.resting.remove(order)
+            self.events.append(("amended", order.client_order_id, diff))
+
+    def cancel(self, order):
+        if order.remaining_volume > 0:
+            self.resting.remove(order)
+            self.events.append(("cancelled", order.client_order_id, order.remaining_volume))
+            order.remaining_volume = 0
+
+    def insert(self, order):
+        self.__match(order)
+        if order.remaining_volume > 0:
+            if order.lifespan == Lifespan.FILL_AND_KILL:
+                self.events.append(("cancelled", order.client_order_id, order.remaining_volume))
+                order.remaining_volume = 0
+            else:
+                self.__rest(order)
+                self.events.append(("placed", order.client_order_id))
+
+    def replace(self, order, new_price, new_volume):
+        if order.remaining_volume > 0:
+            fill_volume = order.volume - order.remaining_volume
+            if (new_price == order.price and new_volume <= order.volume) or new_volume <= fill_volume:
+                self.amend(order, new_volume)
+                return
+            self.resting.remove(order)
+            self.events.append(("replaced", order.client_order_id, order.price, order.remaining_volume))
+            order.price = new_price
+            order.volume = new_volume
+            order.remaining_volume = new_volume - fill_volume
+            self.__match(order)
+            if order.remaining_volume > 0:
+                self.__rest(order)
+
+    def top_levels(self):
+        volumes = dict()
+        for o in self.resting:
+            volumes[(o.side, o.price)] = volumes.get((o.side, o.price), 0) + o.remaining_volume
+        asks = sorted((p, v) for (s, p), v in volumes.items() if s == Side.SELL)[:TOP_LEVEL_COUNT]
+        bids = sorted(((p, v) for (s, p), v in volumes.items() if s == Side.BUY), reverse=True)[:TOP_LEVEL_COUNT]
+        asks += [(0, 0)] * (TOP_LEVEL_COUNT - len(asks))
+        bids += [(0, 0)] * (TOP_LEVEL_COUNT - len(bids))
+        return (*(p for p, _ in asks), *(v for _, v in asks), *(p for p, _ in bids), *(v for _, v in bids))
+
+
+class OrderBookDifferentialTests(unittest.TestCase):
+    def create_book(self, maker_fee, taker_fee):
+        return OrderBook(Instrument.ETF, maker_fee, taker_fee)
+
+    def run_random_operations(self, seed, count=2000, tick_size=100, span=20, off_tick_chance=0.05):
+        rng = random.Random(seed)
+        events = list()
+        book = self.create_book(MAKER_FEE, TAKER_FEE)
+        reference = ReferenceBook()
+        listener = RecordingListener(events)
+        orders = dict()
+        mid = 10000 * tick_size
+        version = book.top_levels_version()
+        snapshot = book.top_levels_snapshot()
+
+        def random_price():
+            if rng.random() < off_tick_chance:
+                return mid + rng.randrange(-span * tick_size, span * tick_size)
+            if rng.random() < 0.02:
+                # Far from the touch
+                return mid + rng.choice((-1, 1)) * rng.randrange(1000, 5000) * tick_size
+            return mid + rng.randrange(-span, span + 1) * tick_size
+
+        live = list()
+        for client_order_id in range(1, count + 1):
+            operation = rng.random()
+            if operation < 0.45 or not live:
+                side = rng.choice((Side.BUY, Side.SELL))
+                price = random_price()
+                volume = rng.randrange(1, 20)
+                lifespan = Lifespan.FILL_AND_KILL if rng.random() < 0.2 else Lifespan.GOOD_FOR_DAY
+                order = Order(client_order_id, Instrument.ETF, lifespan, side, price, volume, listener)
+                expected = ReferenceOrder(client_order_id, side, price, volume, lifespan)
+                orders[client_order_id] = (order, expected)
+                live.append(client_order_id)
+                book.insert(0.0, order)
+                reference.insert(expected)
+            else:
+                order, expected = orders[rng.choice(live)]
+                if operation < 0.65:
+                    book.cancel(0.0, order)
+                    reference.cancel(expected)
+                elif operation < 0.8:
+                    new_volume = rng.randrange(0, order.volume + 1)
+                    book.amend(0.0, order, new_volume)
+                    reference.amend(expected, new_volume)
+                else:
+                    new_price = order.price if rng.random() < 0.3 else random_price()
+                    new_volume = rng.randrange(1, 30)
+                    book.replace(0.0, order, new_price, new_volume)
+                    reference.replace(expected, new_price, new_volume)
+
+            self.assertEqual(events, reference.events, "seed %d operation %d" % (seed, client_order_id))
+            events.clear()
+            reference.events.clear()
+            for i in tuple(live):
+                order, expected = orders[i]
+                self.assertEqual((order.price, order.volume, order.remaining_volume),
+                                 (expected.price, expected.volume, expected.remaining_volume))
+                if order.remaining_volume == 0:
+                    live.remove(i)
+
+            expected_levels = reference.top_levels()
+            self.assertEqual(book.top_levels_snapshot(), expected_levels)
+            if expected_levels != snapshot:
+                self.assertGreater(book.top_levels_version(), version)
+            else:
+                self.assertEqual(book.top_levels_version(), version)
+            version = book.top_levels_version()
+            snapshot = expected_levels
+
+            best_ask = expected_levels[0] or None
+            best_bid = expected_levels[2 * TOP_LEVEL_COUNT] or None
+            self.assertEqual((book.best_ask(), book.best_bid()), (best_ask, best_bid))
+
+    def test_random_operations_match_the_reference_book(self):
+        for seed in range(10):
+            self.run_random_operations(seed)
+
+    def test_random_operations_on_a_narrow_book(self):
+        for seed in range(10, 15):
+            self.run_random_operations(seed, span=3, off_tick_chance=0.2)
+
+    def test_bulk_load_matches_without_trade_ticks(self):
+        book = self.create_book(0.0, 0.0)
+        trades = list()
+        book.trade_occurred.append(trades.append)
+        book.begin_bulk_load()
+        book.insert(0.0, Order(1, Instrument.ETF, Lifespan.GOOD_FOR_DAY, Side.BUY, 100, 10))
+        book.insert(0.0, Order(2, Instrument.ETF, Lifespan.GOOD_FOR_DAY, Side.SELL, 100, 4))
+        book.end_bulk_load()
+        self.assertEqual(trades, [])
+        self.assertFalse(book.trade_ticks([0] * TOP_LEVEL_COUNT, [0] * TOP_LEVEL_COUNT, [0] * TOP_LEVEL_COUNT,
+                                          [0] * TOP_LEVEL_COUNT))
+        self.assertEqual(book.best_bid(), 100)
+        self.assertEqual(book.top_levels_snapshot()[3 * TOP_LEVEL_COUNT], 6)
+
+
+class LadderOrderBookDifferentialTests(OrderBookDifferentialTests):
+    def create_book(self, maker_fee, taker_fee):
+        # A small ladder is re-centred and grown often, and far prices fall outside of it
+        return LadderOrderBook(Instrument.ETF, maker_fee, taker_fee, 100, 16)
+
+    def test_factory_creates_the_configured_book(self):
+        self.assertIs(type(OrderBookFactory("list", 1.0).create(Instrument.ETF, 0.0, 0.0)), OrderBook)
+        book = OrderBookFactory("ladder", 1.0).create(Instrument.ETF, 0.0, 0.0)
+        self.assertIs(type(book), LadderOrderBook)
+        self.assertEqual(book.tick_size, 100)
+        with self.assertRaises(ValueError):
+            OrderBookFactory("tree", 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from ready_trader_go.pubsub import BUFFER_SIZE, FRAME_SIZE, Publisher, PublisherFactory, Subscriber, WakeupWait
+
+
+class RecordingProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.received = list()
+        self.lost = 0
+
+    def datagram_received(self, data, addr):
+        self.received.append(int(bytes(data)))
+
+    def datagrams_lost(self, count):
+        self.lost += count
+
+
+class PublisherSubscriberTests(unittest.TestCase):
+    def run_subscriber(self, batches):
+        async def run():
+            buffer = memoryview(bytearray(BUFFER_SIZE))
+            publisher = Publisher(buffer, asyncio.Protocol())
+            protocol = RecordingProtocol()
+            subscriber = Subscriber(buffer, ("", 0), protocol)
+            count = 0
+            try:
+                for batch in batches:
+                    for _ in range(batch):
+                        publisher.write(b"%d" % count)
+                        count += 1
+                    for _ in range(2 * BUFFER_SIZE // FRAME_SIZE):
+                        await asyncio.sleep(0)
+            finally:
+                subscriber.close()
+                publisher.close()
+                await asyncio.sleep(0)
+            return protocol, subscriber
+
+        return asyncio.run(run())
+
+    def test_subscriber_receives_every_frame_in_order(self):
+        protocol, subscriber = self.run_subscriber([1, 5, 20, 3] * 10)
+        self.assertEqual(protocol.received, list(range(290)))
+        self.assertEqual(protocol.lost, 0)
+        self.assertEqual(subscriber.frames_lost, 0)
+
+    def test_lapped_subscriber_skips_to_the_newest_frame(self):
+        frames = BUFFER_SIZE // FRAME_SIZE
+        protocol, subscriber = self.run_subscriber([1, 3 * frames + 10, 2])
+        last = 3 * frames + 10
+        self.assertEqual(protocol.received, [0, last, last + 1, last + 2])
+        self.assertEqual(protocol.lost, last - 1)
+        self.assertEqual(subscriber.frames_lost, protocol.lost)
+
+
+@unittest.skipUnless(hasattr(os, "mkfifo"), "named pipes are not supported on this platform")
+class PublisherWakeupTests(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temporary.name, "info.dat.wakeup")
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def publish(self, count: int, wait: bool = False):
+        async def run():
+            buffer = memoryview(bytearray(BUFFER_SIZE))
+            publisher = Publisher(buffer, asyncio.Protocol(), self.directory)
+            waiter = WakeupWait(self.directory) if wait else None
+            try:
+                if waiter is not None:
+                    task = asyncio.create_task(waiter.wait(buffer, 0))
+                    await asyncio.sleep(0)
+                for _ in range(count):
+                    publisher.write(b"data")
+                if waiter is not None:
+                    await asyncio.wait_for(task, 1.0)
+            finally:
+                publisher.close()
+                if waiter is not None:
+                    waiter.close()
+
+        asyncio.run(run())
+
+    def test_no_system_calls_without_subscribers(self):
+        with unittest.mock.patch("os.stat", wraps=os.stat) as stat, \
+                unittest.mock.patch("os.listdir", wraps=os.listdir) as listdir:
+            self.publish(1000)
+        self.assertEqual(stat.call_count, 0)
+        self.assertLessEqual(listdir.call_count, 1)
+
+    def test_waiting_subscriber_is_woken(self):
+        self.publish(1, wait=True)
+
+    def test_publishers_only_look_for_subscribers_to_wake_if_asked_to(self):
+        async def run(wakeup):
+            name = os.path.join(self.temporary.name, "info.dat")
+            os.makedirs(name + ".wakeup", exist_ok=True)
+            with unittest.mock.patch("os.stat", wraps=os.stat) as stat, \
+                    unittest.mock.patch("os.listdir", wraps=os.listdir) as listdir:
+                publisher = PublisherFactory("mmap", name, wakeup).create(asyncio.Protocol())
+                try:
+                    for _ in range(100):
+                        publisher.write(b"data")
+                finally:
+                    publisher.close()
+            return stat.call_count + listdir.call_count
+
+        self.assertEqual(asyncio.run(run(False)), 0)
+        self.assertGreater(asyncio.run(run(True)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
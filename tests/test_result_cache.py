@@ -0,0 +1,97 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import copy
+import os
+import pathlib
+import tempfile
+import unittest
+
+from ready_trader_go.result_cache import MatchResultCache
+
+
+class MatchResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.temporary.name)
+        self.market_data = self.root / "md.csv"
+        self.market_data.write_text("Time,Instrument,Operation,OrderId,Side,Volume,Price,Lifespan\n")
+        self.trader = self.root / "trader.py"
+        self.trader.write_text("VALUE = 1\n")
+        self.helper = self.root / "helper.py"
+        self.helper.write_text("HELPER = 1\n")
+        self.config = {"Engine": {"MarketDataFile": str(self.market_data), "Speed": 6.0,
+                                  "MatchEventsFile": "match_events.csv", "ScoreBoardFile": "score_board.csv"},
+                       "Execution": {"Host": "127.0.0.1", "Port": 12345},
+                       "Limits": {"PositionLimit": 100}}
+        self.traders = [(str(self.trader), {"TeamName": "TraderOne", "Secret": "secret"})]
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def key(self, config=None, traders=None, sources=None):
+        return MatchResultCache.make_key(config or self.config, traders or self.traders,
+                                         [str(self.helper)] if sources is None else sources)
+
+    def test_key_changes_with_everything_that_determines_the_result(self):
+        key = self.key()
+        self.assertEqual(self.key(), key)
+
+        config = copy.deepcopy(self.config)
+        config["Limits"]["PositionLimit"] = 50
+        self.assertNotEqual(self.key(config=config), key)
+
+        traders = [(str(self.trader), {"TeamName": "TraderTwo", "Secret": "secret"})]
+        self.assertNotEqual(self.key(traders=traders), key)
+        self.assertNotEqual(self.key(sources=[]), key)
+
+        self.helper.write_text("HELPER = 2\n")
+        self.assertNotEqual(self.key(), key)
+        self.helper.write_text("HELPER = 1\n")
+
+        self.trader.write_text("VALUE = 2\n")
+        self.assertNotEqual(self.key(), key)
+        self.trader.write_text("VALUE = 1\n")
+
+        self.market_data.write_text("Time\n")
+        self.assertNotEqual(self.key(), key)
+
+    def test_key_ignores_settings_that_do_not_affect_the_result(self):
+        key = self.key()
+        config = copy.deepcopy(self.config)
+        config["Engine"]["ScoreBoardFile"] = "elsewhere.csv"
+        config["Execution"]["Port"] = 54321
+        self.assertEqual(self.key(config=config), key)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        directory = self.root / "cache"
+        cache = MatchResultCache(str(directory), 0)
+        cache.put("a" * 64, {"TraderOne": 1})
+        self.assertEqual(cache.get("a" * 64), {"TraderOne": 1})
+
+        cache.max_size = 2 * (directory / ("a" * 64 + ".json")).stat().st_size
+        cache.put("b" * 64, {"TraderOne": 2})
+        os.utime(directory / ("b" * 64 + ".json"), (1, 1))
+        cache.get("a" * 64)
+        cache.put("c" * 64, {"TraderOne": 3})
+
+        self.assertEqual(sorted(os.listdir(directory)), ["a" * 64 + ".json", "c" * 64 + ".json"])
+        self.assertIsNone(cache.get("b" * 64))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import mmap
+import unittest
+
+from ready_trader_go.pubsub import BUFFER_SIZE
+from ready_trader_go.ring import (CLIENT_STATE, REQUEST_RING, RESPONSE_RING, RING_FILE_SIZE, SERVER_STATE,
+                                  RingTransport)
+
+
+class RecordingProtocol(asyncio.BufferedProtocol):
+    def __init__(self):
+        self.buffer = bytearray(50)
+        self.received = bytearray()
+        self.lost = False
+
+    def buffer_updated(self, nbytes):
+        self.received += self.buffer[:nbytes]
+
+    def connection_lost(self, exc):
+        self.lost = True
+
+    def get_buffer(self, sizehint):
+        return memoryview(self.buffer)
+
+
+class RingTransportTests(unittest.TestCase):
+    @staticmethod
+    def connect(exchange):
+        async def run():
+            buffer = mmap.mmap(-1, RING_FILE_SIZE)
+            loop = asyncio.get_running_loop()
+            client, server = RecordingProtocol(), RecordingProtocol()
+            ends = (RingTransport(loop, buffer, RESPONSE_RING, REQUEST_RING, CLIENT_STATE, SERVER_STATE, client,
+                                  ("ring", 0)),
+                    RingTransport(loop, buffer, REQUEST_RING, RESPONSE_RING, SERVER_STATE, CLIENT_STATE, server,
+                                  ("ring", 0)))
+            try:
+                return await exchange(ends, (client, server))
+            finally:
+                buffer.close()
+
+        return asyncio.run(run())
+
+    def test_data_that_does_not_fit_is_held_back_until_it_is_read(self):
+        data = bytes(i & 255 for i in range(3 * BUFFER_SIZE + 17))
+
+        async def exchange(ends, protocols):
+            client, server = ends
+            client.write(data)
+            server.write(b"reply")
+            while client.poll() | server.poll():
+                pass
+            return protocols
+
+        client, server = self.connect(exchange)
+        self.assertEqual(bytes(server.received), data)
+        self.assertEqual(bytes(client.received), b"reply")
+
+    def test_closing_one_end_closes_the_other_after_the_data_is_read(self):
+        async def exchange(ends, protocols):
+            client, server = ends
+            client.write(b"x" * (2 * BUFFER_SIZE))
+            client.close()
+            while client.poll() | server.poll():
+                pass
+            await asyncio.sleep(0)
+            return protocols, client.closed, server.closed
+
+        (client, server), client_closed, server_closed = self.connect(exchange)
+        self.assertEqual(bytes(server.received), b"x" * (2 * BUFFER_SIZE))
+        self.assertTrue(client_closed and server_closed)
+        self.assertTrue(client.lost and server.lost)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import asyncio
+import unittest
+
+from ready_trader_go.messages import MessageType
+from ready_trader_go.send_scheduler import SendScheduler
+from ready_trader_go.types import Lifespan, Side
+
+
+class SendSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.dropped = list()
+        self.requests = list()
+        self.sent = list()
+        self.scheduler = SendScheduler(self.loop, 50, 1.0, 25, self.send, lambda count: True, self.dropped.append)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def send(self, typ, client_order_id, side, price, volume, lifespan):
+        self.requests.append((typ, client_order_id, side, price, volume, lifespan))
+        self.sent.append((typ, client_order_id))
+
+    def run_once(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def test_hedge_queued_after_inserts_does_not_drop_them(self):
+        self.scheduler.add(MessageType.INSERT_ORDER, 1, Side.BID, 100, 10, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.INSERT_ORDER, 2, Side.ASK, 101, 10, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.HEDGE_ORDER, 3, Side.BID, 102, 5, Lifespan.FILL_AND_KILL)
+        self.run_once()
+        self.assertEqual(self.sent, [(MessageType.INSERT_ORDER, 1), (MessageType.INSERT_ORDER, 2),
+                                     (MessageType.HEDGE_ORDER, 3)])
+        self.assertEqual(self.dropped, [])
+
+    def test_cancels_and_amends_go_ahead_of_new_orders(self):
+        self.scheduler.add(MessageType.HEDGE_ORDER, 5, Side.ASK, 100, 5, Lifespan.FILL_AND_KILL)
+        self.scheduler.add(MessageType.INSERT_ORDER, 6, Side.BID, 99, 10, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.REPLACE_ORDER, 2, Side.BID, 98, 10, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.CANCEL_ORDER, 1, Side.BID, 0, 0, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.AMEND_ORDER, 3, Side.BID, 0, 4, Lifespan.GOOD_FOR_DAY)
+        self.run_once()
+        self.assertEqual(self.sent, [(MessageType.CANCEL_ORDER, 1), (MessageType.AMEND_ORDER, 3),
+                                     (MessageType.REPLACE_ORDER, 2), (MessageType.HEDGE_ORDER, 5),
+                                     (MessageType.INSERT_ORDER, 6)])
+
+    def test_new_orders_are_sent_in_client_order_id_order(self):
+        self.scheduler.add(MessageType.HEDGE_ORDER, 4, Side.BID, 100, 5, Lifespan.FILL_AND_KILL)
+        self.scheduler.add(MessageType.INSERT_ORDER, 3, Side.ASK, 101, 10, Lifespan.GOOD_FOR_DAY)
+        self.run_once()
+        self.assertEqual(self.sent, [(MessageType.INSERT_ORDER, 3), (MessageType.HEDGE_ORDER, 4)])
+
+    def test_insert_queued_after_a_later_id_was_sent_is_dropped(self):
+        self.scheduler.add(MessageType.HEDGE_ORDER, 4, Side.BID, 100, 5, Lifespan.FILL_AND_KILL)
+        self.run_once()
+        self.scheduler.add(MessageType.INSERT_ORDER, 3, Side.ASK, 101, 10, Lifespan.GOOD_FOR_DAY)
+        self.run_once()
+        self.assertEqual(self.sent, [(MessageType.HEDGE_ORDER, 4)])
+        self.assertEqual(self.dropped, [3])
+
+    def test_amend_after_a_replace_cannot_increase_its_volume(self):
+        self.scheduler.add(MessageType.REPLACE_ORDER, 1, Side.BID, 98, 5, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.AMEND_ORDER, 1, Side.BID, 0, 10, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.AMEND_ORDER, 2, Side.BID, 0, 4, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.AMEND_ORDER, 2, Side.BID, 0, 6, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.AMEND_ORDER, 3, Side.BID, 0, 4, Lifespan.GOOD_FOR_DAY)
+        self.scheduler.add(MessageType.REPLACE_ORDER, 3, Side.BID, 97, 8, Lifespan.GOOD_FOR_DAY)
+        self.run_once()
+        self.assertEqual(self.requests, [(MessageType.AMEND_ORDER, 2, Side.BID, 0, 4, Lifespan.GOOD_FOR_DAY),
+                                         (MessageType.REPLACE_ORDER, 3, Side.BID, 97, 8, Lifespan.GOOD_FOR_DAY),
+                                         (MessageType.REPLACE_ORDER, 1, Side.BID, 98, 5, Lifespan.GOOD_FOR_DAY)])
+
+
+if __name__ == "__main__":
+    unittest.main()
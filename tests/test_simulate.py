@@ -0,0 +1,122 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import copy
+import itertools
+import os
+import tempfile
+import unittest
+
+from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MINIMUM_BID, Side, simulate
+from ready_trader_go.messages import ALL_SIDES
+
+from .test_market_events import write_market_data
+
+
+class CrossingAutoTrader(BaseAutoTrader):
+    """Buys one lot of the ETF at the best ask until it is long five lots, hedging each fill."""
+
+    def __init__(self, loop, team_name, secret):
+        super().__init__(loop, team_name, secret)
+        self.order_ids = itertools.count(1)
+        self.position = 0
+
+    def on_order_book_update_message(self, instrument, sequence_number, ask_prices, ask_volumes, bid_prices,
+                                     bid_volumes):
+        if instrument == Instrument.ETF and ask_prices[0] and self.position < 5:
+            self.send_insert_order(next(self.order_ids), Side.BUY, ask_prices[0], 1, Lifespan.FILL_AND_KILL)
+
+    def on_order_filled_message(self, client_order_id, price, volume):
+        self.position += volume
+        self.send_hedge_order(next(self.order_ids), Side.SELL, MINIMUM_BID, volume)
+
+
+class CancellingAutoTrader(BaseAutoTrader):
+    """Rests orders away from the market, then cancels the bids and then everything that is left."""
+    statuses = dict()
+
+    def __init__(self, loop, team_name, secret):
+        super().__init__(loop, team_name, secret)
+        self.started = False
+
+    def on_order_book_update_message(self, instrument, sequence_number, ask_prices, ask_volumes, bid_prices,
+                                     bid_volumes):
+        if instrument == Instrument.ETF and bid_prices[0] and not self.started:
+            self.started = True
+            self.send_insert_order(1, Side.BUY, 100, 3, Lifespan.GOOD_FOR_DAY)
+            self.send_insert_order(2, Side.BUY, 200, 4, Lifespan.GOOD_FOR_DAY)
+            self.send_insert_order(3, Side.SELL, 1000000000, 5, Lifespan.GOOD_FOR_DAY)
+            self.send_cancel_all_orders(Side.BUY)
+
+    def on_cancel_all_status_message(self, side, order_count, volume):
+        self.statuses.setdefault(self.team_name, list()).append((side, order_count, volume))
+        if side == Side.BUY:
+            self.send_cancel_all_orders()
+
+
+class SimulateTests(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        market_data = os.path.join(self.temporary.name, "md.csv")
+        write_market_data(market_data, 2000)
+        self.config = {
+            "Engine": {"MarketDataFile": market_data, "MarketEventInterval": 0.05, "MarketOpenDelay": 5.0,
+                       "MatchEventsFile": os.path.join(self.temporary.name, "match_events.csv"),
+                       "ScoreBoardFile": os.path.join(self.temporary.name, "score_board.csv"),
+                       "Speed": 1.0, "TickInterval": 0.25, "Seed": 42},
+            "Execution": {"Host": "127.0.0.1", "Port": 12345},
+            "Fees": {"Maker": -0.0001, "Taker": 0.0002},
+            "Information": {"Type": "mmap", "Name": os.path.join(self.temporary.name, "info.dat")},
+            "Instrument": {"EtfClamp": 0.002, "TickSize": 1.00},
+            "Limits": {"ActiveOrderCountLimit": 10, "ActiveVolumeLimit": 200, "MessageFrequencyInterval": 1.0,
+                       "MessageFrequencyLimit": 50, "PositionLimit": 100},
+            "Traders": {"TraderOne": "secret", "TraderTwo": "secret"}}
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def simulate(self, auto_trader=CrossingAutoTrader, **engine):
+        config = copy.deepcopy(self.config)
+        config["Engine"].update(engine)
+        return [(r.team, r.operation, r.buy_volume, r.etf_position, r.future_position, r.profit_loss)
+                for r in simulate(config, [auto_trader, auto_trader])]
+
+    def test_match_runs_to_completion(self):
+        records = self.simulate()
+        self.assertTrue(records)
+        self.assertTrue(any(r[2] > 0 for r in records))
+        self.assertTrue(os.path.getsize(self.config["Engine"]["MatchEventsFile"]) > 0)
+
+    def test_match_with_the_same_seed_is_reproducible(self):
+        self.assertEqual(self.simulate(), self.simulate())
+
+    def test_ladder_order_book_gives_the_same_result(self):
+        self.assertEqual(self.simulate(OrderBook="ladder"), self.simulate(OrderBook="list"))
+
+    def test_event_driven_market_events(self):
+        records = self.simulate(MarketEventMode="event")
+        self.assertTrue(any(r[2] > 0 for r in records))
+
+    def test_cancel_all_orders_on_one_side_and_then_both(self):
+        CancellingAutoTrader.statuses = dict()
+        self.simulate(CancellingAutoTrader)
+        self.assertEqual(CancellingAutoTrader.statuses, {b"TraderOne": [(Side.BUY, 2, 7), (ALL_SIDES, 1, 5)],
+                                                         b"TraderTwo": [(Side.BUY, 2, 7), (ALL_SIDES, 1, 5)]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import contextlib
+import io
+import logging
+import pathlib
+import random
+import sys
+import tempfile
+import unittest
+
+from ready_trader_go.result_cache import MatchResultCache
+from ready_trader_go.sweep import apply_settings, grid_search, print_summary, random_search, run_match
+
+AUTO_TRADER_SOURCE = """from ready_trader_go import BaseAutoTrader as AutoTrader
+"""
+
+
+class SweepTests(unittest.TestCase):
+    def test_settings_are_applied_to_the_named_configuration(self):
+        configs = {"exchange": {"Engine": {"Speed": 1.0}}, "autotrader": {"TeamName": "TraderOne"}}
+        apply_settings(configs, {"exchange.Engine.Speed": 6.0, "autotrader.Parameters.LOT_SIZE": 20})
+        self.assertEqual(configs, {"exchange": {"Engine": {"Speed": 6.0}},
+                                   "autotrader": {"TeamName": "TraderOne", "Parameters": {"LOT_SIZE": 20}}})
+        with self.assertRaises(Exception):
+            apply_settings(configs, {"elsewhere.Speed": 1.0})
+        with self.assertRaises(Exception):
+            apply_settings(configs, {"exchange": 1.0})
+
+    def test_grid_search_covers_every_combination(self):
+        settings = grid_search({"a": [1, 2], "b": ["x", "y", "z"]})
+        self.assertEqual(len(settings), 6)
+        self.assertEqual({(s["a"], s["b"]) for s in settings}, {(a, b) for a in (1, 2) for b in "xyz"})
+        with self.assertRaises(Exception):
+            grid_search({"a": {"Min": 1, "Max": 2}})
+
+    def test_random_search_draws_from_lists_and_ranges(self):
+        settings = random_search({"a": [1, 2], "b": {"Min": 1, "Max": 3}, "c": {"Min": 0.5, "Max": 1.0}}, 50,
+                                 random.Random(1))
+        self.assertEqual(len(settings), 50)
+        for s in settings:
+            self.assertIn(s["a"], (1, 2))
+            self.assertIn(s["b"], (1, 2, 3))
+            self.assertTrue(0.5 <= s["c"] <= 1.0)
+        self.assertEqual(settings, random_search({"a": [1, 2], "b": {"Min": 1, "Max": 3},
+                                                  "c": {"Min": 0.5, "Max": 1.0}}, 50, random.Random(1)))
+        with self.assertRaises(Exception):
+            random_search({"a": 1}, 1, random.Random(1))
+
+    def test_summary_is_sorted_by_profit_or_loss(self):
+        results = [(1, {"a": 1}, [(0.0, "One", 0, 0, 0, 0, 0, 0, 0, 0, 0, -5, "")]),
+                   (2, {"a": 2}, [(0.0, "Two", 0, 0, 0, 0, 0, 0, 0, 0, 0, 10, ""),
+                                  (0.0, "Three", 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, "")])]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_summary(results, ["a"])
+        header, *rows = output.getvalue().splitlines()
+        self.assertEqual(len(header.split()), len(rows[0].split()) + 1)
+        self.assertEqual([row.split()[2] for row in rows], ["Two", "Three", "One"])
+
+
+class RunMatchTests(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = pathlib.Path(self.temporary.name)
+        self.auto_trader = self.directory / "traders" / "sweep_test_trader.py"
+        self.auto_trader.parent.mkdir()
+        self.auto_trader.write_text(AUTO_TRADER_SOURCE)
+        market_data = self.directory / "md.csv"
+        market_data.write_text("Time,Instrument,Operation,OrderId,Side,Volume,Price,Lifespan,Fee\n")
+        self.exchange_config = {"Engine": {"MarketDataFile": str(market_data)}}
+        self.handlers = list(logging.getLogger().handlers)
+
+    def tearDown(self):
+        for handler in logging.getLogger().handlers[len(self.handlers):]:
+            logging.getLogger().removeHandler(handler)
+            handler.close()
+        sys.modules.pop(self.auto_trader.stem, None)
+        if str(self.auto_trader.parent) in sys.path:
+            sys.path.remove(str(self.auto_trader.parent))
+        self.temporary.cleanup()
+
+    def test_auto_trader_is_loaded_and_hashed_from_its_own_directory(self):
+        config = {"TeamName": "TraderOne", "Secret": "secret"}
+        exchange_config = dict(self.exchange_config, Traders={"TraderOne": "secret"})
+        exchange_config["Engine"] = dict(exchange_config["Engine"], Seed=0,
+                                         MatchEventsFile=str(self.directory / "match1_events.csv"))
+        cache = MatchResultCache(str(self.directory / "cache"), 1 << 20)
+        key = cache.make_key(exchange_config, [(str(self.auto_trader), config)], [str(self.auto_trader)])
+        cache.put(key, {"Records": [[0.0, "TraderOne"]]})
+
+        number, records = run_match(1, self.exchange_config, [(self.auto_trader, config)], {}, self.directory, cache)
+        self.assertEqual((number, records), (1, [(0.0, "TraderOne")]))
+        self.assertEqual(sys.modules[self.auto_trader.stem].__file__, str(self.auto_trader))
+
+
+if __name__ == "__main__":
+    unittest.main()